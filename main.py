@@ -1,7 +1,12 @@
 import plasma
 from plasma import plasma2040
-from pimoroni import Button, RGBLED
+from pimoroni import Button, RGBLED, Analog
+import hashlib
+import os
+import select
+import struct
 import time
+import micropython
 import math
 from random import randrange, uniform, choice
 
@@ -17,8 +22,64 @@ user_sw = Button(plasma2040.USER_SW)
 button_a = Button(plasma2040.BUTTON_A)
 button_b = Button(plasma2040.BUTTON_B)
 
+# Colour order of your LED strip (RGB, GRB, BRG...), mine shows true colours with RGB
+COLOR_ORDER = "RGB"
+
+# Gamma applied to every channel at the output stage (1.0 disables correction)
+GAMMA = 2.2
+
+# Global brightness applied at the output stage (0.0 - 1.0)
+BRIGHTNESS = 1.0
+
+# Current budget for the strip in milliamps, frames estimated above it are dimmed
+POWER_BUDGET_MA = 2000
+MA_PER_CHANNEL = 20  # Current of one fully lit colour channel
+MA_IDLE_PER_LED = 1  # Quiescent current of one dark LED
+
+# Use the onboard current sense to correct the estimate (closed loop)
+USE_CURRENT_SENSE = False
+CURRENT_SENSE_INTERVAL = 30  # Frames between current sense readings
+POWER_SCALE_STEPS = 16  # The limiter dims in steps of 1/16, so its output table rarely changes
+POWER_BLOCK_LEDS = 16  # LEDs per block when bounding the gamma corrected current of a frame
+
+# Memory budgets for baked periods of deterministic effects, in bytes
+BAKE_RAM_BUDGET = 48 * 1024
+BAKE_FLASH_BUDGET = 512 * 1024  # 0 disables baking to flash
+BAKE_DIR = "/bake"
+BAKE_SOURCE = "/main.py"  # Flash bakes are dropped whenever this file changes
+
+# Pre-rendered animation played back by effect_78, see README for the format
+ANIMATION_FILE = "/animation.pfx"
+ANIMATION_MAGIC = b"PFX1"
+ANIMATION_HEADER = "<4sHH3s"  # Magic, LED count, FPS, colour order of the frames
+PLAYBACK_CHUNK_BYTES = 4096  # Frames are read from flash in chunks of about this size
+
+# Compressed frame sequences share the header, then every frame is a keyframe or a delta of RLE spans
+FRAME_SEQUENCE_MAGIC = b"PFXZ"
+FRAME_HEADER = "<BH"  # Flags, payload length
+FRAME_KEY = 0x01  # Frame starts from black instead of the previous frame
+SPAN_HEADER = "<HH"  # Start LED, LED count with SPAN_RUN set for runs of one colour
+SPAN_RUN = 0x8000
+
+# Stream frames from a host over USB serial as TPM2 style packets, needs tpm2.py on the board too
+SERIAL_STREAMING = True  # Without tpm2.py the board just runs its local effects
+STREAM_TIMEOUT = 2000  # Milliseconds without a frame before going back to the local effects
+
+# Receive DDP and E1.31 (sACN) frames over Wi-Fi, Plasma 2040 W only
+UDP_RECEIVER = False
+WIFI_SSID = ""
+WIFI_PASSWORD = ""
+DDP_PORT = 4048
+E131_PORT = 5568
+E131_UNIVERSE = 1  # Universe holding the first pixel
+E131_PIXELS_PER_UNIVERSE = 170  # 510 of the 512 DMX channels in each universe
+
+# Set to True to run the benchmarks instead of the effects
+BENCHMARK = False
+
 # Pick LED type
-led_strip = plasma.WS2812(NUM_LEDS, 0, 0, plasma2040.DAT)  # WS2812 / NeoPixel™ LEDs
+# The driver is left in RGB order, the framebuffer reorders channels itself
+led_strip = plasma.WS2812(NUM_LEDS, 0, 0, plasma2040.DAT, color_order=plasma.COLOR_ORDER_RGB)  # WS2812 / NeoPixel™ LEDs
 
 # Timeout duration in milliseconds (e.g., 10000 ms = 10 seconds)
 TIMEOUT_DURATION = 20000
@@ -51,6 +112,1033 @@ def hsv_to_rgb(h, s, v):
     if i == 5:
         return v, p, q
 
+def build_gamma_lut(gamma):
+    """Builds a 256-entry table mapping linear channel values to gamma corrected ones."""
+    return bytes(int(((i / 255) ** gamma) * 255 + 0.5) for i in range(256))
+
+def build_gamma_ratios(lut):
+    """Builds a table of the most lut raises any value up to each index, as a ratio in 1/256.
+
+    For a gamma of 1 or more this is just lut[i] / i, for gammas below 1 the dim values set it.
+    """
+    ratios = [0]
+    ratio = 0
+    for i in range(1, 256):
+        ratio = max(ratio, (lut[i] * 256 + i - 1) // i)
+        ratios.append(ratio)
+    return ratios
+
+class FastRandom:
+    """Xorshift generator on a pair of 16-bit words, period 2**32 - 1.
+
+    Every value stays a small int, so drawing numbers allocates nothing on MicroPython.
+    """
+
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = randrange(1, 1 << 30)
+        self.x = seed & 0xFFFF or 1
+        self.y = seed >> 16 & 0xFFFF or 1
+
+    def next16(self):
+        """Returns the next random number in 0-65535."""
+        t = (self.x ^ (self.x << 5)) & 0xFFFF
+        self.x = y = self.y
+        self.y = y = (y ^ (y >> 1)) ^ (t ^ (t >> 3))
+        return y
+
+    def fill(self, buffer):
+        """Fills a bytearray with random bytes, two per step."""
+        x = self.x
+        y = self.y
+        end = len(buffer)
+        for j in range(0, end - 1, 2):
+            t = (x ^ (x << 5)) & 0xFFFF
+            x = y
+            y = (y ^ (y >> 1)) ^ (t ^ (t >> 3))
+            buffer[j] = y & 0xFF
+            buffer[j + 1] = y >> 8
+        if end & 1:
+            t = (x ^ (x << 5)) & 0xFFFF
+            x = y
+            y = (y ^ (y >> 1)) ^ (t ^ (t >> 3))
+            buffer[end - 1] = y & 0xFF
+        self.x = x
+        self.y = y
+
+    def below(self, n):
+        """Returns a random number in 0 to n - 1, for n up to 65536."""
+        return self.next16() * n >> 16
+
+    def uniform(self, a, b):
+        return a + (b - a) * self.next16() / 65536
+
+def chance_threshold(p):
+    """Returns the byte threshold a random byte falls under with probability p."""
+    return int(p * 256 + 0.5)
+
+def byte_range(byte, low, high):
+    """Maps a random byte onto low to high."""
+    return low + (high - low) * byte / 256
+
+fast_random = FastRandom()
+
+class SparseSampler:
+    """Picks the items an event with probability p hits, drawing the geometric gap between hits.
+
+    A frame costs one draw per hit, about p * n, instead of one roll for each of n items.
+    """
+
+    def __init__(self, p):
+        self.set_probability(p)
+
+    def set_probability(self, p):
+        """Changes the hit probability, e.g. to a per-frame chance that follows the frame time."""
+        self.p = p
+        self.log_miss = math.log(1 - p) if 0 < p < 1 else 0
+
+    def gap(self):
+        """Returns the number of misses before the next hit."""
+        return int(math.log((fast_random.next16() + 1) / 65537) / self.log_miss)
+
+    def indices(self, n):
+        """Yields the indices below n hit this frame, in order."""
+        if self.p <= 0:
+            return
+        if self.p >= 1:
+            yield from range(n)
+            return
+        i = self.gap()
+        while i < n:
+            yield i
+            i += 1 + self.gap()
+
+class EffectInterrupted(Exception):
+    """Raised from a frame commit to stop the running effect, e.g. when a host starts streaming."""
+
+class FrameBuffer:
+    """Canonical RGB framebuffer, gamma corrected and reordered once at the output stage."""
+
+    def __init__(self, num_leds, driver, color_order=COLOR_ORDER, gamma=GAMMA,
+                 brightness=BRIGHTNESS, power_budget_ma=POWER_BUDGET_MA, current_sense=None):
+        self.num_leds = num_leds
+        self.driver = driver
+        self.pixels = bytearray(num_leds * 3)  # R, G, B per LED
+        self.gamma_lut = build_gamma_lut(gamma)
+        self.gamma_ratios = build_gamma_ratios(self.gamma_lut)
+        self.output_lut = self.gamma_lut
+        self.output_scale = 256  # Scale the output LUT was built for
+        self.output_luts = {}  # Output scale -> LUT, so the limiter's steps are built once
+        self.dirty_start = 0  # Range of LEDs changed since the last commit
+        self.dirty_end = num_leds
+        self.set_color_order(color_order)
+        self.set_brightness(brightness)
+        self.power_budget_ma = power_budget_ma
+        self.current_sense = current_sense
+        self.current_correction = 1.0  # Measured / estimated current
+        self.estimated_ma = 0
+        self.shown_ma = None  # Uncorrected estimate of the frame on the strip, for the current sense
+        self.frame_count = 0
+        self.poll_input = None  # Called on every commit, returns True to interrupt the effect
+
+    def set_color_order(self, color_order):
+        """Maps each output channel of the strip to its offset in a canonical RGB pixel."""
+        self.order = tuple("RGB".index(c) for c in color_order.upper())
+
+    def set_rgb(self, i, r, g, b):
+        """Sets LED i to a canonical RGB colour, clamping each channel to 0-255."""
+        r = 0 if r < 0 else 255 if r > 255 else int(r)
+        g = 0 if g < 0 else 255 if g > 255 else int(g)
+        b = 0 if b < 0 else 255 if b > 255 else int(b)
+        j = i * 3
+        pixels = self.pixels
+        if pixels[j] != r or pixels[j + 1] != g or pixels[j + 2] != b:
+            pixels[j] = r
+            pixels[j + 1] = g
+            pixels[j + 2] = b
+            if i < self.dirty_start:
+                self.dirty_start = i
+            if i >= self.dirty_end:
+                self.dirty_end = i + 1
+
+    def set_hsv(self, i, h, s, v):
+        """Sets LED i from HSV, with hue wrapping and saturation/value clamped to 0-1."""
+        s = 0.0 if s < 0 else 1.0 if s > 1 else s
+        v = 0.0 if v < 0 else 1.0 if v > 1 else v
+        r, g, b = hsv_to_rgb(h % 1.0, s, v)
+        self.set_rgb(i, r, g, b)
+
+    def mark_dirty(self, start=0, end=None):
+        """Marks LEDs start to end as changed, for code writing to pixels directly."""
+        if end is None or end > self.num_leds:
+            end = self.num_leds
+        if start < 0:
+            start = 0
+        if start >= end:
+            return
+        if start < self.dirty_start:
+            self.dirty_start = start
+        if end > self.dirty_end:
+            self.dirty_end = end
+
+    def is_dirty(self):
+        return self.dirty_start < self.dirty_end
+
+    def set_brightness(self, brightness):
+        """Sets the global brightness (0.0 - 1.0) applied at the output stage."""
+        brightness = 0.0 if brightness < 0 else 1.0 if brightness > 1 else brightness
+        self.brightness_scale = int(brightness * 256)
+        self.mark_dirty()
+
+    def estimate_current_ma(self, total):
+        """Estimates the strip current for the summed output channel values of a frame."""
+        return (total * MA_PER_CHANNEL // 255 + self.num_leds * MA_IDLE_PER_LED) * self.current_correction
+
+    def gamma_total(self):
+        """Bounds the summed gamma corrected channel values of the frame with a sum() and max() per block.
+
+        No value in a block is raised by more than gamma_ratios[max], so that times the block's raw
+        sum is at most its corrected sum.
+        """
+        ratios = self.gamma_ratios
+        view = memoryview(self.pixels)
+        size = POWER_BLOCK_LEDS * 3
+        total = 0
+        for a in range(0, len(view), size):
+            block = view[a:a + size]
+            top = max(block)
+            if top:
+                total += (sum(block) * ratios[top] + 255) >> 8
+        return total
+
+    def power_scale(self, measure=False):
+        """Returns the 0-256 output scale that keeps the frame within the power budget.
+
+        With measure, the uncorrected estimate of the frame is kept in shown_ma for the next current
+        sense reading, which is taken while this frame is on the strip.
+        """
+        scale = self.brightness_scale
+        idle_ma = self.num_leds * MA_IDLE_PER_LED
+        # No value is raised by more than gamma_ratios[255], so the raw sum gives a cheap upper bound
+        total = ((sum(self.pixels) * self.gamma_ratios[255] + 255) >> 8) * scale >> 8
+        estimated_ma = self.estimate_current_ma(total)
+        if measure or estimated_ma > self.power_budget_ma:
+            total = self.gamma_total() * scale >> 8
+            estimated_ma = self.estimate_current_ma(total)
+            if total and estimated_ma > self.power_budget_ma:
+                dimmed = int(scale * (self.power_budget_ma - idle_ma) / (estimated_ma - idle_ma))
+                # Round down to a whole step, staying within the budget, but never down to black
+                step = 256 // POWER_SCALE_STEPS
+                dimmed = max(step, dimmed // step * step)
+                total = total * dimmed // scale
+                scale = dimmed
+                estimated_ma = self.estimate_current_ma(total)
+        self.shown_ma = total * MA_PER_CHANNEL // 255 + idle_ma if measure else None
+        self.estimated_ma = estimated_ma
+        return max(0, scale)
+
+    def update_current_correction(self):
+        """Corrects the current estimate from the onboard current sense.
+
+        The reading is taken before a new frame goes out, so it is compared with the estimate kept
+        for the frame still on the strip. Frames shown without one are not measured.
+        """
+        estimated_ma = self.shown_ma
+        if estimated_ma is None or estimated_ma < 100:
+            return  # No estimate, or too little load to measure reliably
+        measured_ma = self.current_sense.read_current() * 1000
+        correction = 0.75 * self.current_correction + 0.25 * (measured_ma / estimated_ma)
+        self.current_correction = 0.5 if correction < 0.5 else 2.0 if correction > 2.0 else correction
+
+    def get_rgb(self, i):
+        j = i * 3
+        return self.pixels[j], self.pixels[j + 1], self.pixels[j + 2]
+
+    def clear(self):
+        for j in range(len(self.pixels)):
+            self.pixels[j] = 0
+        self.mark_dirty()
+
+    def show(self):
+        """Writes the changed LEDs to the strip in one pass through the gamma table and channel order.
+
+        Returns False without touching the strip when nothing changed since the last commit.
+        """
+        if self.poll_input and self.poll_input():
+            raise EffectInterrupted()
+
+        self.frame_count += 1
+        if self.current_sense and self.frame_count % CURRENT_SENSE_INTERVAL == 0:
+            self.update_current_correction()
+        start, end = self.dirty_start, self.dirty_end
+        if start >= end:
+            return False
+
+        # Estimate the frame going out precisely if the next commit measures it
+        measure = self.current_sense and (self.frame_count + 1) % CURRENT_SENSE_INTERVAL == 0
+        scale = self.power_scale(measure)
+        if scale != self.output_scale:
+            lut = self.output_luts.get(scale)
+            if lut is None:
+                gamma_lut = self.gamma_lut
+                lut = bytes((gamma_lut[i] * scale) >> 8 for i in range(256)) if scale < 256 else gamma_lut
+                if len(self.output_luts) > POWER_SCALE_STEPS + 1:
+                    self.output_luts.clear()  # Brightness changes left stale tables
+                self.output_luts[scale] = lut
+            self.output_lut = lut
+            self.output_scale = scale
+            start, end = 0, self.num_leds  # Every LED changes with the scale
+
+        pixels = self.pixels
+        lut = self.output_lut
+        o0, o1, o2 = self.order
+        set_rgb = self.driver.set_rgb
+        j = start * 3
+        for i in range(start, end):
+            set_rgb(i, lut[pixels[j + o0]], lut[pixels[j + o1]], lut[pixels[j + o2]])
+            j += 3
+
+        self.dirty_start = self.num_leds
+        self.dirty_end = 0
+        return True
+
+# Onboard current sense, used to close the loop on the power limiter
+current_sense = Analog(plasma2040.CURRENT_SENSE, plasma2040.ADC_GAIN, plasma2040.SHUNT_RESISTOR) if USE_CURRENT_SENSE else None
+
+framebuffer = FrameBuffer(NUM_LEDS, led_strip, current_sense=current_sense)
+
+class NullStrip:
+    """Stands in for the LED driver when benchmarking strips longer than the one attached."""
+
+    def set_rgb(self, i, r, g, b):
+        pass
+
+class EffectContext:
+    """Frame timing handed to segment effects, so they animate by elapsed time instead of by frame."""
+
+    MAX_DT = 0.25  # Longest step in seconds, so a stall doesn't make objects jump across the strip
+
+    def __init__(self):
+        self.reset(time.ticks_ms())
+
+    def reset(self, now, frame_ms=0):
+        """Restarts the clock at now, with the first frame as if frame_ms had passed."""
+        self.start = now
+        self.last = time.ticks_add(now, -frame_ms)
+        self.t_ms = 0  # Milliseconds since the effect started
+        self.prev_t_ms = -1
+        self.dt = 0.0  # Seconds since the previous frame
+        self.frame = 0
+
+    def tick(self, now):
+        """Advances the clock to the frame at now (in ticks_ms)."""
+        dt = time.ticks_diff(now, self.last) / 1000
+        self.dt = dt if dt < self.MAX_DT else self.MAX_DT
+        self.prev_t_ms = self.t_ms if self.frame else -1
+        self.t_ms = time.ticks_diff(now, self.start)
+        self.last = now
+        self.frame += 1
+
+    def move(self, position, velocity):
+        """Returns position moved at velocity (units per second) over this frame."""
+        return position + velocity * self.dt
+
+    def accelerate(self, position, velocity, acceleration):
+        """Returns position and velocity after this frame under constant acceleration."""
+        dt = self.dt
+        return position + (velocity + 0.5 * acceleration * dt) * dt, velocity + acceleration * dt
+
+    def decay(self, value, factor_per_second):
+        """Returns value decayed by factor_per_second over this frame."""
+        return value * factor_per_second ** self.dt
+
+    def chance(self, rate_per_second):
+        """Returns the probability of an event happening rate_per_second times a second over this frame."""
+        return 1 - math.exp(-rate_per_second * self.dt)
+
+    def fade_scale(self, factor_per_second):
+        """Returns the 0-256 multiplier that fades a byte by factor_per_second over this frame."""
+        return int(256 * factor_per_second ** self.dt)
+
+    def every(self, interval_ms):
+        """Returns how many multiples of interval_ms passed this frame, the first frame counts as one."""
+        return self.t_ms // interval_ms - self.prev_t_ms // interval_ms
+
+class Segment:
+    """A range of LEDs on a shared framebuffer, running its own effect instance at its own frame rate.
+
+    Effects draw into the segment with indices 0 to num_leds - 1, straight into the shared pixels.
+    A segment effect is a class taking the LED count, whose render(canvas, context) draws one frame
+    and advances by context.dt, the time since its previous frame. Effects with a compute_fps below
+    the segment's frame rate are rendered as keyframes at that rate and interpolated in between.
+    """
+
+    def __init__(self, start, length, effect_class, fps, target=None):
+        self.target = target or framebuffer
+        # Clamped to the target, a segment past its end is empty instead of marking LEDs beyond it
+        self.start = start = max(0, min(start, self.target.num_leds))
+        self.num_leds = max(0, min(length, self.target.num_leds - start))
+        # Window onto the shared pixels, effects writing to it must call mark_dirty()
+        self.pixels = memoryview(self.target.pixels)[start * 3:(start + self.num_leds) * 3]
+        effect = effect_class(self.num_leds)
+        compute_fps = getattr(effect, "compute_fps", fps)
+        if compute_fps < fps:
+            effect = KeyframeInterpolator(self.num_leds, effect, compute_fps)
+        self.effect = effect
+        self.context = EffectContext()
+        self.frame_ms = 1000 // fps
+        self.next_frame = 0
+
+    def set_rgb(self, i, r, g, b):
+        self.target.set_rgb(self.start + i, r, g, b)
+
+    def set_hsv(self, i, h, s, v):
+        self.target.set_hsv(self.start + i, h, s, v)
+
+    def get_rgb(self, i):
+        return self.target.get_rgb(self.start + i)
+
+    def mark_dirty(self, start=0, end=None):
+        if end is None:
+            end = self.num_leds
+        self.target.mark_dirty(self.start + start, self.start + end)
+
+    def clear(self):
+        pixels = self.pixels
+        for j in range(len(pixels)):
+            pixels[j] = 0
+        self.mark_dirty()
+
+def play_segments(segments, duration):
+    """Renders every segment whose next frame is due, then commits the shared framebuffer once.
+
+    Only the segments that drew a frame are written out, through the framebuffer's dirty range.
+    Segments without LEDs, e.g. from a layout longer than the strip, are skipped.
+    """
+    segments = [segment for segment in segments if segment.num_leds]
+    if not segments:
+        return
+    start_time = now = time.ticks_ms()
+    for segment in segments:
+        segment.next_frame = now
+        segment.context.reset(now, segment.frame_ms)
+
+    while time.ticks_diff(now, start_time) < duration and read_buttons():
+        for segment in segments:
+            if time.ticks_diff(segment.next_frame, now) <= 0:
+                segment.context.tick(now)
+                segment.effect.render(segment, segment.context)
+                segment.next_frame = time.ticks_add(segment.next_frame, segment.frame_ms)
+                if time.ticks_diff(segment.next_frame, now) <= 0:
+                    segment.next_frame = time.ticks_add(now, segment.frame_ms)  # Fell behind, skip frames
+        framebuffer.show()
+
+        now = time.ticks_ms()
+        wait = min(time.ticks_diff(segment.next_frame, now) for segment in segments)
+        if wait > 0:
+            time.sleep_ms(wait)
+            now = time.ticks_ms()
+
+def play_frame_effect(effect_class, fps, hsv_values):
+    """Runs a segment effect on the whole strip for TIMEOUT_DURATION."""
+    play_segments([Segment(0, NUM_LEDS, effect_class, fps)], TIMEOUT_DURATION)
+    return hsv_values
+
+BLEND_MODES = ("add", "max", "multiply", "alpha")
+
+def blend_pixels(dst, src, mode, alpha=256):
+    """Blends src over dst in place with integer math, alpha (0-256) is only used by the alpha mode."""
+    if mode == "add":
+        for j in range(len(dst)):
+            v = dst[j] + src[j]
+            dst[j] = v if v < 256 else 255
+    elif mode == "max":
+        for j in range(len(dst)):
+            if src[j] > dst[j]:
+                dst[j] = src[j]
+    elif mode == "multiply":
+        for j in range(len(dst)):
+            dst[j] = (dst[j] * src[j] + 255) >> 8
+    else:
+        for j in range(len(dst)):
+            d = dst[j]
+            dst[j] = d + ((src[j] - d) * alpha >> 8)
+
+class Compositor:
+    """Segment effect rendering effect layers into their own buffers and blending them bottom to top.
+
+    layers is a list of (effect class, blend mode, opacity 0.0 - 1.0); the bottom layer's mode is ignored
+    and opacity only applies to alpha layers.
+    """
+
+    def __init__(self, num_leds, layers):
+        self.layers = []
+        for effect_class, mode, opacity in layers:
+            if mode not in BLEND_MODES:
+                raise ValueError(f"Unknown blend mode {mode}")
+            canvas = FrameBuffer(num_leds, NullStrip())
+            self.layers.append((effect_class(num_leds), canvas, mode, int(opacity * 256)))
+
+    def render(self, canvas, context):
+        for effect, layer, mode, alpha in self.layers:
+            effect.render(layer, context)
+
+        out = canvas.pixels
+        out[:] = self.layers[0][1].pixels
+        for effect, layer, mode, alpha in self.layers[1:]:
+            blend_pixels(out, layer.pixels, mode, alpha)
+        canvas.mark_dirty()
+
+class KeyframeInterpolator:
+    """Renders an effect's keyframes at its compute rate and blends between the last two at the output rate.
+
+    The output trails the effect by one keyframe, fading from the previous keyframe to the newest.
+    """
+
+    def __init__(self, num_leds, effect, compute_fps):
+        self.effect = effect
+        self.keyframe_ms = 1000 // compute_fps
+        self.keyframe = FrameBuffer(num_leds, NullStrip())  # The effect draws its keyframes here
+        self.previous = bytearray(num_leds * 3)
+        self.context = EffectContext()
+        self.keyframe_start = None
+
+    def render(self, canvas, context):
+        first = self.keyframe_start is None
+        if first or context.t_ms - self.keyframe_start >= self.keyframe_ms:
+            if first:
+                self.context.reset(context.last, self.keyframe_ms)
+            self.previous[:] = self.keyframe.pixels
+            self.context.tick(context.last)
+            self.effect.render(self.keyframe, self.context)
+            if first:
+                self.previous[:] = self.keyframe.pixels
+            self.keyframe_start = context.t_ms
+
+        out = canvas.pixels
+        out[:] = self.previous
+        blend = (context.t_ms - self.keyframe_start) * 256 // self.keyframe_ms
+        if blend:
+            blend_pixels(out, self.keyframe.pixels, "alpha", blend)
+        canvas.mark_dirty()
+
+class SymmetricEffect:
+    """Renders an effect on part of the LEDs and fills the rest with copies of it.
+
+    "mirror" renders half the LEDs outwards from the centre and reflects them onto the other half,
+    "tile" renders 1/parts of the LEDs and repeats them along the strip with slice copies.
+    """
+
+    def __init__(self, num_leds, effect_class, mode="mirror", parts=2):
+        if mode == "mirror":
+            part_leds = num_leds - num_leds // 2
+        elif mode == "tile":
+            part_leds = -(-num_leds // parts)
+        else:
+            raise ValueError(f"Unknown symmetry mode {mode}")
+        self.num_leds = num_leds
+        self.mode = mode
+        self.effect = effect_class(part_leds)
+        self.part = FrameBuffer(part_leds, NullStrip())
+        if hasattr(self.effect, "compute_fps"):
+            self.compute_fps = self.effect.compute_fps  # Keyframes are interpolated after the copies
+
+    def render(self, canvas, context):
+        part = self.part
+        self.effect.render(part, context)
+        if not part.is_dirty():
+            return
+        part.dirty_start = part.num_leds
+        part.dirty_end = 0
+
+        pixels = part.pixels
+        out = canvas.pixels
+        if self.mode == "mirror":
+            half = self.num_leds // 2
+            odd = self.num_leds % 2  # An odd centre LED is not repeated
+            out[half * 3:] = pixels
+            for i in range(half):
+                j = (half - 1 - i) * 3
+                k = (i + odd) * 3
+                out[j] = pixels[k]
+                out[j + 1] = pixels[k + 1]
+                out[j + 2] = pixels[k + 2]
+        else:
+            size = len(pixels)
+            source = memoryview(pixels)
+            for start in range(0, len(out), size):
+                end = min(start + size, len(out))
+                out[start:end] = source[:end - start]
+        canvas.mark_dirty()
+
+def mirrored(effect_class):
+    """Returns a segment effect class rendering effect_class mirrored about the centre."""
+    return lambda num_leds: SymmetricEffect(num_leds, effect_class, "mirror")
+
+# Anti-aliased drawing at fractional LED positions. Positions are converted once to fixed point in
+# 1/256 LED, an LED is lit in proportion to how much of it is covered, and light drawn over light
+# keeps the brighter channels. Each returns the range of LEDs it touched, start to end exclusive.
+
+def plot(pixels, num_leds, i, r, g, b, weight):
+    """Lights LED i with r, g, b scaled by weight (0-256), keeping brighter channels already there."""
+    if weight <= 0 or not 0 <= i < num_leds:
+        return
+    j = i * 3
+    c = r * weight >> 8
+    if pixels[j] < c:
+        pixels[j] = c
+    c = g * weight >> 8
+    if pixels[j + 1] < c:
+        pixels[j + 1] = c
+    c = b * weight >> 8
+    if pixels[j + 2] < c:
+        pixels[j + 2] = c
+
+def draw_point(canvas, x, r, g, b, level=256):
+    """Draws a light one LED wide starting at x, split over the two LEDs it covers."""
+    fx = math.floor(x * 256)
+    i = fx >> 8
+    covered = fx & 0xFF  # Part of LED i + 1 the light covers
+    num_leds = canvas.num_leds
+    plot(canvas.pixels, num_leds, i, r, g, b, (256 - covered) * level >> 8)
+    plot(canvas.pixels, num_leds, i + 1, r, g, b, covered * level >> 8)
+    start = max(0, i)
+    end = max(start, min(i + 2, num_leds))
+    canvas.mark_dirty(start, end)
+    return start, end
+
+def draw_segment(canvas, x0, x1, r, g, b, level=256):
+    """Lights x0 to x1, the LEDs at either end in proportion to how much of them the segment covers."""
+    a = math.floor(min(x0, x1) * 256)
+    e = math.floor(max(x0, x1) * 256)
+    first = a >> 8
+    last = e >> 8
+    num_leds = canvas.num_leds
+    pixels = canvas.pixels
+    if first == last:
+        plot(pixels, num_leds, first, r, g, b, (e - a) * level >> 8)
+    else:
+        plot(pixels, num_leds, first, r, g, b, (256 - (a & 0xFF)) * level >> 8)
+        for i in range(max(first + 1, 0), min(last, num_leds)):
+            plot(pixels, num_leds, i, r, g, b, level)
+        plot(pixels, num_leds, last, r, g, b, (e & 0xFF) * level >> 8)
+    start = max(0, first)
+    end = max(start, min(last + 1, num_leds))
+    canvas.mark_dirty(start, end)
+    return start, end
+
+def draw_gradient_tail(canvas, x, length, r, g, b, direction=-1, level=256):
+    """Draws a head at x with a tail fading to nothing over length LEDs behind it.
+
+    The tail trails towards the start of the strip for direction -1, towards the end for 1. The
+    leading LED is lit by how far the head has moved into it, so the head glides between LEDs.
+    """
+    fx = math.floor(x * 256)
+    span = int(length * 256)
+    if direction < 0:
+        start = (fx - span) // 256 + 1
+        end = (fx >> 8) + 2
+    else:
+        start = fx >> 8
+        end = (fx + span) // 256 + 1
+    num_leds = canvas.num_leds
+    pixels = canvas.pixels
+    start = max(0, start)
+    end = max(start, min(end, num_leds))
+    for i in range(start, end):
+        d = (fx - i * 256) if direction < 0 else (i * 256 - fx)  # How far behind the head, in 1/256 LED
+        if d < 0:
+            weight = (256 + d) * level >> 8
+        else:
+            weight = (span - d) * level // span
+        plot(pixels, num_leds, i, r, g, b, weight)
+    canvas.mark_dirty(start, end)
+    return start, end
+
+class ScrollBuffer:
+    """Ring buffer of LEDs that scrolls by moving its start, so a frame only writes the LEDs entering it."""
+
+    def __init__(self, num_leds, towards_end=True):
+        self.num_leds = num_leds
+        self.ring = bytearray(num_leds * 3)
+        self.start = 0  # Ring index of the first LED
+        self.towards_end = towards_end  # Scroll towards the last LED, entering LEDs at the first
+
+    def push(self, r, g, b):
+        """Scrolls by one LED, entering r, g, b (0-255) at the edge the pixels move away from."""
+        if self.towards_end:
+            self.start = (self.start - 1) % self.num_leds
+            j = self.start * 3
+        else:
+            j = self.start * 3
+            self.start = (self.start + 1) % self.num_leds
+        ring = self.ring
+        ring[j] = r
+        ring[j + 1] = g
+        ring[j + 2] = b
+
+    def push_hsv(self, h, s, v):
+        v = 0.0 if v < 0 else 1.0 if v > 1 else v
+        r, g, b = hsv_to_rgb(h % 1.0, s, v)
+        self.push(r, g, b)
+
+    def copy_to(self, canvas):
+        """Rotates the ring into the canvas with two slice copies."""
+        ring = memoryview(self.ring)
+        j = self.start * 3
+        size = len(ring) - j
+        out = canvas.pixels
+        out[:size] = ring[j:]
+        out[size:] = ring[:j]
+        canvas.mark_dirty()
+
+class CellularAutomaton:
+    """Elementary cellular automaton on a ring of cells, packed one bit per cell into an int.
+
+    A generation is a handful of shifts and masks over the whole ring for any Wolfram rule 0-255.
+    With age_bits, bit planes count how many generations each cell has been alive, saturating.
+    """
+
+    def __init__(self, num_cells, rule, age_bits=0):
+        self.num_cells = num_cells
+        self.rule = rule & 0xFF
+        self.mask = (1 << num_cells) - 1
+        self.state = 0
+        self.ages = [0] * age_bits  # Bit planes of the age counter, least significant first
+        self.generation = 0
+
+    def seed(self, state):
+        """Sets the cells from an int, bit i being cell i, and restarts their ages."""
+        self.state = state & self.mask
+        self.ages = [0] * len(self.ages)
+        self.count_ages()
+
+    def seed_random(self):
+        noise = bytearray((self.num_cells + 7) // 8)
+        fast_random.fill(noise)
+        self.seed(int.from_bytes(noise, "little"))
+
+    def step(self):
+        """Advances the whole ring by one generation."""
+        mask = self.mask
+        n = self.num_cells
+        state = self.state
+        left = ((state << 1) | (state >> (n - 1))) & mask  # Bit i holds cell i - 1
+        right = (state >> 1) | ((state & 1) << (n - 1))  # Bit i holds cell i + 1
+        inverted_left = left ^ mask
+        inverted_state = state ^ mask
+        inverted_right = right ^ mask
+        next_state = 0
+        for pattern in range(8):
+            if self.rule >> pattern & 1:
+                # Cells whose left, centre and right match the pattern's bits
+                next_state |= (
+                    (left if pattern & 4 else inverted_left)
+                    & (state if pattern & 2 else inverted_state)
+                    & (right if pattern & 1 else inverted_right)
+                )
+        self.state = next_state
+        self.generation += 1
+        self.count_ages()
+
+    def count_ages(self):
+        """Increments the age of live cells, saturating, and clears the age of dead ones."""
+        ages = self.ages
+        if not ages:
+            return
+        alive = self.state
+        saturated = self.mask
+        for plane in ages:
+            saturated &= plane
+        carry = alive & (saturated ^ self.mask)
+        for b in range(len(ages)):
+            plane = ages[b]
+            ages[b] = (plane ^ carry) & alive
+            carry &= plane
+
+    def age_bytes(self):
+        """Returns each age bit plane as little-endian bytes, cell i in bit i & 7 of byte i >> 3."""
+        size = (self.num_cells + 7) // 8
+        return [plane.to_bytes(size, "little") for plane in self.ages]
+
+class BounceEngine:
+    """Balls bouncing along a strip, each placed in closed form from the time since its launch.
+
+    With gravity a ball flies parabolic arcs off the start of the strip, each launched at the
+    previous arc's speed times restitution, until it comes to rest. Without gravity it moves at a
+    constant speed between both ends. Balls are drawn with draw_point and only the LEDs lit in the
+    last frame are erased, so a frame costs O(balls) whatever the strip length.
+    """
+
+    def __init__(self, num_leds, gravity=300.0, restitution=0.85):
+        self.num_leds = num_leds
+        self.gravity = gravity  # LEDs per second squared, 0 for balls moving at constant speed
+        self.restitution = restitution  # Speed kept by each bounce
+        # Each ball is [launch time in s, launch speed in LEDs per s, r, g, b, brightness 0-256]. With
+        # gravity, the launch is the start of the current arc and a speed of 0 means the ball rests at
+        # the start since the launch time. Without gravity, the launch is when the ball was at the start.
+        self.balls = []
+        self.lit = None  # LEDs drawn in the last frame
+
+    def launch(self, t, position, velocity, color, ball=None):
+        """Sets off a ball from position at velocity at time t (seconds), reusing ball if given."""
+        gravity = self.gravity
+        if gravity:
+            # Rewind to the launch of the arc the ball is on
+            speed = math.sqrt(velocity * velocity + 2 * gravity * position)
+            start = t - (speed - velocity) / gravity
+        else:
+            speed = velocity
+            start = t - position / velocity
+        if ball is None:
+            ball = [0.0, 0.0, 0, 0, 0, 256]
+            self.balls.append(ball)
+        ball[0] = start
+        ball[1] = speed
+        ball[2], ball[3], ball[4] = color
+        ball[5] = 256
+        return ball
+
+    def resting(self, ball):
+        """Returns True once a ball under gravity has come to rest at the start."""
+        return self.gravity != 0 and ball[1] == 0
+
+    def position(self, ball, t):
+        """Returns the position of ball at time t, which must not go back in time."""
+        span = self.num_leds - 1
+        gravity = self.gravity
+        if not gravity:
+            if not span:
+                return 0.0
+            # Fold the straight flight back and forth between both ends
+            x = ball[1] * (t - ball[0]) % (2 * span)
+            return x if x <= span else 2 * span - x
+        speed = ball[1]
+        if not speed:
+            return 0.0
+        flight = t - ball[0]
+        arc = 2 * speed / gravity
+        while flight >= arc:
+            # Bounce: the next arc starts where this one landed
+            ball[0] += arc
+            flight -= arc
+            speed *= self.restitution
+            if speed * speed < gravity:
+                # The next arc would peak under half an LED, the ball is at rest
+                ball[1] = 0.0
+                return 0.0
+            arc = 2 * speed / gravity
+        ball[1] = speed
+        return min(span, (speed - 0.5 * gravity * flight) * flight)
+
+    def render(self, canvas, t):
+        """Erases the balls of the last frame and draws every ball at time t."""
+        pixels = canvas.pixels
+        if self.lit is None:
+            canvas.clear()
+        else:
+            for i in self.lit:
+                j = i * 3
+                pixels[j] = pixels[j + 1] = pixels[j + 2] = 0
+                canvas.mark_dirty(i, i + 1)
+        lit = []
+        for ball in self.balls:
+            level = ball[5]
+            if not level:
+                continue
+            start, end = draw_point(canvas, self.position(ball, t), ball[2], ball[3], ball[4], level)
+            lit.extend(range(start, end))
+        self.lit = lit
+
+class AnimationCache:
+    """Holds baked periods of deterministic effects in RAM or flash, evicting the least recently used."""
+
+    VERSION = ".version"  # File in BAKE_DIR holding the hash of the code the bakes came from
+
+    def __init__(self, ram_budget=BAKE_RAM_BUDGET, flash_budget=BAKE_FLASH_BUDGET, source=BAKE_SOURCE):
+        self.ram_budget = ram_budget
+        self.flash_budget = flash_budget
+        self.ram = {}  # key -> bytearray holding every frame of one period
+        self.flash = {}  # key -> size of the baked file
+        self.lru = []  # Keys, least recently used first
+        self.version = self.source_hash(source)
+        try:
+            names = os.listdir(BAKE_DIR)
+        except OSError:
+            return
+        try:
+            with open(self.path(self.VERSION), "rb") as f:
+                current = f.read() == self.version
+        except OSError:
+            current = False
+        for name in names:
+            if name == self.VERSION:
+                continue
+            if current:
+                self.flash[name] = os.stat(self.path(name))[6]
+                self.lru.append(name)
+            else:
+                os.remove(self.path(name))  # Baked by other code, its frames may be stale
+        if not current:
+            self.write_version()
+
+    @staticmethod
+    def source_hash(source):
+        """Returns a hash of the source file, so bakes are only replayed by the code that made them."""
+        digest = hashlib.sha256()
+        buf = bytearray(1024)
+        try:
+            with open(source, "rb") as f:
+                while True:
+                    n = f.readinto(buf)
+                    if not n:
+                        break
+                    digest.update(buf[:n])
+        except OSError:
+            pass
+        return digest.digest()
+
+    def write_version(self):
+        with open(self.path(self.VERSION), "wb") as f:
+            f.write(self.version)
+
+    def path(self, key):
+        return f"{BAKE_DIR}/{key}"
+
+    def get(self, key):
+        """Returns the baked frames for key as a bytearray or a file opened for reading, or None."""
+        if key in self.ram:
+            store = self.ram[key]
+        elif key in self.flash:
+            store = open(self.path(key), "rb")
+        else:
+            return None
+        self.lru.remove(key)
+        self.lru.append(key)
+        return store
+
+    def evict(self, entries, budget, size):
+        """Evicts least recently used entries of one tier until size more bytes fit in budget."""
+        used = sum(entries.values()) if entries is self.flash else sum(len(e) for e in entries.values())
+        for key in self.lru[:]:
+            if used + size <= budget:
+                break
+            if key in entries:
+                used -= entries[key] if entries is self.flash else len(entries[key])
+                del entries[key]
+                self.lru.remove(key)
+                if entries is self.flash:
+                    os.remove(self.path(key))
+
+    def reserve(self, key, size, flash=True):
+        """Returns an empty store for size bytes of frames, or None if it fits neither budget.
+
+        Without flash only RAM is tried, for bakes not replayed often enough to be worth the wear.
+        """
+        if size <= self.ram_budget:
+            self.evict(self.ram, self.ram_budget, size)
+            try:
+                return bytearray(size)
+            except MemoryError:
+                pass
+        if flash and size <= self.flash_budget:
+            self.evict(self.flash, self.flash_budget, size)
+            try:
+                os.mkdir(BAKE_DIR)
+                self.write_version()
+            except OSError:
+                pass
+            return open(self.path(key), "wb")
+        return None
+
+    def commit(self, key, store):
+        """Records a completely baked store and returns it ready for replay."""
+        if isinstance(store, bytearray):
+            self.ram[key] = store
+        else:
+            store.close()
+            self.flash[key] = os.stat(self.path(key))[6]
+            store = open(self.path(key), "rb")
+        self.lru.append(key)
+        return store
+
+    def discard(self, key, store):
+        """Drops a store whose period was interrupted before it was fully baked."""
+        if not isinstance(store, bytearray):
+            store.close()
+            os.remove(self.path(key))
+
+animation_cache = AnimationCache()
+
+def play_periodic(key, period, render_frame, delay, hsv_values, max_periods=None):
+    """Plays a periodic effect, rendering its first period live while baking it, then replaying the bake.
+
+    render_frame(t) draws frame t (0 <= t < period) into the framebuffer, frames are shown every
+    delay seconds. The key must name the effect and every parameter that changes its frames. Effects
+    that can't replay two periods in a run are only baked to RAM, writing them to flash would wear
+    it for little gain.
+    """
+    if not period:
+        return hsv_values  # Periods that scale with a strip without LEDs have no frames to play
+    pixels = framebuffer.pixels
+    frame_size = len(pixels)
+    store = animation_cache.get(key)
+    baking = store is None
+    if baking:
+        periods_per_run = TIMEOUT_DURATION / (period * delay * 1000)
+        if max_periods:
+            periods_per_run = min(periods_per_run, max_periods)
+        store = animation_cache.reserve(key, period * frame_size, flash=periods_per_run >= 2)
+
+    t = 0
+    periods = 0
+    frame_ms = int(delay * 1000)
+    start_time = next_frame = time.ticks_ms()
+
+    try:
+        while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
+            if baking or store is None:
+                render_frame(t)
+                if isinstance(store, bytearray):
+                    store[t * frame_size:(t + 1) * frame_size] = pixels
+                elif store is not None:
+                    store.write(pixels)
+            else:
+                if isinstance(store, bytearray):
+                    pixels[:] = memoryview(store)[t * frame_size:(t + 1) * frame_size]
+                else:
+                    store.readinto(pixels)
+                framebuffer.mark_dirty()
+
+            framebuffer.show()
+            # Sleeps until the frame's deadline, so rendering or reading it doesn't slow the effect down
+            next_frame = time.ticks_add(next_frame, frame_ms)
+            wait = time.ticks_diff(next_frame, time.ticks_ms())
+            if wait > 0:
+                time.sleep_ms(wait)
+            else:
+                next_frame = time.ticks_ms()  # Fell behind, carry on from now instead of rushing
+
+            t += 1
+            if t == period:
+                t = 0
+                periods += 1
+                if baking and store is not None:
+                    store = animation_cache.commit(key, store)
+                elif store is not None and not isinstance(store, bytearray):
+                    store.seek(0)
+                baking = False
+                if max_periods and periods >= max_periods:
+                    break
+    finally:
+        # The manager may interrupt the effect mid-period, never keep a partial bake
+        if store is not None and not isinstance(store, bytearray):
+            if baking:
+                animation_cache.discard(key, store)
+            else:
+                store.close()
+    return hsv_values
+
 def read_buttons():
     """Checks the state of the buttons and returns True if no button is pressed, otherwise False."""
     if user_sw.read() or button_a.read() or button_b.read():
@@ -59,28 +1147,41 @@ def read_buttons():
 
 # Function to perform a smooth crossfade between effects
 def crossfade_effects(effect_from, effect_to, duration=1.0, steps=50):
-    """Smoothly transitions from one effect to another over the given duration."""
+    """Smoothly transitions from one RGB frame to another over the given duration."""
+    pixels = framebuffer.pixels
     for step in range(steps):
-        blend = step / steps
-        for i in range(NUM_LEDS):
-            h1, s1, v1 = effect_from[i]
-            h2, s2, v2 = effect_to[i]
-
-            h = h1 * (1 - blend) + h2 * blend
-            s = s1 * (1 - blend) + s2 * blend
-            v = v1 * (1 - blend) + v2 * blend
-
-            led_strip.set_hsv(i, h, s, v)
+        blend = step * 256 // steps
+        for j in range(len(pixels)):
+            pixels[j] = (effect_from[j] * (256 - blend) + effect_to[j] * blend) >> 8
 
+        framebuffer.mark_dirty()
+        framebuffer.show()
         time.sleep(duration / steps)
 
 # Effect manager class
 class EffectManager:
-    def __init__(self, num_leds):
+    def __init__(self, num_leds, sources=()):
         self.num_leds = num_leds
         self.hsv_values = [(0.0, 0.0, 0.0) for _ in range(num_leds)]
         self.current_effect = 0
         self.random_mode = True
+        self.sources = list(sources)  # Frame sources fed by a host, e.g. SerialStream
+
+    def pending_source(self):
+        """Returns a frame source with data waiting, or None."""
+        for source in self.sources:
+            if source.available():
+                return source
+        return None
+
+    def input_pending(self):
+        return self.pending_source() is not None
+
+    def effect_expired(self):
+        """Polled on every commit: stops the effect once its time is up, a button is pressed or a host streams."""
+        if time.ticks_diff(time.ticks_ms(), self.start_time) > self.timeout_duration:
+            return True
+        return not read_buttons() or (self.sources and self.input_pending())
 
     def get_random_timeout_duration(self):
         """Return a random duration between 3 and 20 seconds."""
@@ -89,22 +1190,62 @@ class EffectManager:
     def run_effect(self, effect_func):
         self.timeout_duration = self.get_random_timeout_duration()
         print(f"Effect {self.current_effect + 1} - Running for {self.timeout_duration / 1000:.2f} seconds")
-        start_time = time.ticks_ms()
-        
-        while read_buttons():
-            if time.ticks_diff(time.ticks_ms(), start_time) > self.timeout_duration:
-                break
-            self.hsv_values = effect_func(self.hsv_values)
-            self.update_led_strip()
+        self.start_time = time.ticks_ms()
+        static_frame = False
+        framebuffer.poll_input = self.effect_expired
+
+        try:
+            while read_buttons():
+                if time.ticks_diff(time.ticks_ms(), self.start_time) > self.timeout_duration:
+                    break
+                if static_frame:
+                    # The effect rendered the same frame twice, stop re-rendering it
+                    if self.input_pending():
+                        break
+                    time.sleep(0.05)
+                    continue
+                shown = framebuffer.frame_count
+                self.hsv_values = effect_func(self.hsv_values)
+                if framebuffer.frame_count == shown:
+                    # One-shot effects only fill hsv_values, commit them here
+                    static_frame = not self.update_led_strip()
+        except EffectInterrupted:
+            if self.sources and self.input_pending():
+                print("Effect interrupted by a host stream")
+        finally:
+            framebuffer.poll_input = None
+
+    def run_stream(self, source):
+        """Shows frames from a host as they arrive, until none came for STREAM_TIMEOUT ms."""
+        print("Streaming from host")
+        micropython.kbd_intr(-1)  # Pixel data may contain Ctrl-C
+        frames = 0
+        start_time = last_frame = time.ticks_ms()
+
+        try:
+            while time.ticks_diff(time.ticks_ms(), last_frame) < STREAM_TIMEOUT:
+                if source.read_frame(framebuffer):
+                    framebuffer.show()
+                    frames += 1
+                    last_frame = time.ticks_ms()
+                else:
+                    time.sleep_ms(1)
+        finally:
+            micropython.kbd_intr(3)
+
+        elapsed = time.ticks_diff(last_frame, start_time)
+        print(f"Stream ended after {frames} frames, {frames * 1000 / max(1, elapsed):.1f} FPS")
 
     def update_led_strip(self):
+        """Commits hsv_values to the strip, returns False if the frame did not change."""
         for i, (h, s, v) in enumerate(self.hsv_values):
-            led_strip.set_hsv(i, h, s, v)
+            framebuffer.set_hsv(i, h, s, v)
+        return framebuffer.show()
 
     def crossfade_to_next(self, next_effect_func):
-        effect_from = self.hsv_values[:]
+        effect_from = bytes(framebuffer.pixels)
         self.run_effect(next_effect_func)
-        effect_to = self.hsv_values[:]
+        effect_to = bytes(framebuffer.pixels)
         crossfade_effects(effect_from, effect_to)
 
     def read_buttons(self):
@@ -132,1238 +1273,1834 @@ class EffectManager:
         else:
             self.current_effect = (self.current_effect + 1) % len(effects)
 
+def write_animation_header(f, num_leds, fps, color_order="RGB", magic=ANIMATION_MAGIC):
+    """Writes the header of a pre-rendered animation, raw frames of num_leds * 3 bytes follow it."""
+    f.write(struct.pack(ANIMATION_HEADER, magic, num_leds, fps, color_order.encode()))
+
+def fill_run(pixels, start, count, r, g, b):
+    """Fills count pixels from pixel start with one colour, doubling slice copies instead of looping per pixel."""
+    view = memoryview(pixels)
+    a = start * 3
+    end = a + count * 3
+    pixels[a] = r
+    pixels[a + 1] = g
+    pixels[a + 2] = b
+    filled = 3
+    while a + filled < end:
+        n = min(filled, end - a - filled)
+        view[a + filled:a + filled + n] = view[a:a + n]
+        filled += n
+
+class RawFrameReader:
+    """Reads raw frames in chunks into one preallocated buffer and copies them into the target."""
+
+    def __init__(self, f, num_leds, target):
+        self.f = f
+        self.data_start = f.tell()
+        frame_bytes = num_leds * 3
+        self.frame_bytes = frame_bytes
+        self.copy_leds = min(num_leds, target.num_leds)
+        copy_bytes = self.copy_leds * 3
+        frames_per_chunk = max(1, PLAYBACK_CHUNK_BYTES // frame_bytes)
+        self.chunk = bytearray(frames_per_chunk * frame_bytes)
+        chunk_view = memoryview(self.chunk)
+        self.frame_views = [chunk_view[k * frame_bytes:k * frame_bytes + copy_bytes] for k in range(frames_per_chunk)]
+        self.pixel_view = memoryview(target.pixels)[:copy_bytes]
+        self.frames_read = 0
+        self.k = 0
+
+    def read_frame(self):
+        """Copies the next frame into the target, returns the changed LED range or None at the end."""
+        if self.k == self.frames_read:
+            self.frames_read = self.f.readinto(self.chunk) // self.frame_bytes
+            self.k = 0
+            if self.frames_read == 0:
+                return None
+        self.pixel_view[:] = self.frame_views[self.k]
+        self.k += 1
+        return 0, self.copy_leds
+
+    def rewind(self):
+        self.f.seek(self.data_start)
+        self.frames_read = 0
+        self.k = 0
+
+class FrameSequenceReader:
+    """Streams a compressed frame sequence, decoding each frame in place into the target.
+
+    Every frame is a flags byte, a payload length and a payload of spans. A span is a start LED and
+    a count whose top bit marks a run: runs carry one colour for all count LEDs, other spans carry
+    count literal colours. Keyframes start from black, delta frames from the previous frame.
+    """
+
+    def __init__(self, f, num_leds, target):
+        self.f = f
+        self.data_start = f.tell()
+        self.num_leds = num_leds
+        self.target = target
+        self.frame_header = bytearray(struct.calcsize(FRAME_HEADER))
+        self.payload = bytearray(num_leds * 3 + struct.calcsize(SPAN_HEADER))
+        self.payload_view = memoryview(self.payload)
+        # Decode straight into the framebuffer when the LED counts match
+        same_size = num_leds == target.num_leds
+        self.pixels = target.pixels if same_size else bytearray(num_leds * 3)
+        self.copy_bytes = 0 if same_size else min(num_leds, target.num_leds) * 3
+
+    def read_frame(self):
+        """Decodes the next frame into the target, returns the changed LED range or None at the end."""
+        f = self.f
+        if f.readinto(self.frame_header) != len(self.frame_header):
+            return None
+        flags, length = struct.unpack(FRAME_HEADER, self.frame_header)
+        f.readinto(self.payload_view[:length])
+
+        pixels = self.pixels
+        payload = self.payload
+        view = self.payload_view
+        if flags & FRAME_KEY:
+            for j in range(len(pixels)):
+                pixels[j] = 0
+            changed_start, changed_end = 0, self.num_leds
+        else:
+            changed_start, changed_end = self.num_leds, 0
+
+        p = 0
+        while p < length:
+            start = payload[p] | payload[p + 1] << 8
+            count = payload[p + 2] | payload[p + 3] << 8
+            p += 4
+            if count & SPAN_RUN:
+                count &= ~SPAN_RUN
+                fill_run(pixels, start, count, payload[p], payload[p + 1], payload[p + 2])
+                p += 3
+            else:
+                n = count * 3
+                pixels[start * 3:start * 3 + n] = view[p:p + n]
+                p += n
+            if start < changed_start:
+                changed_start = start
+            if start + count > changed_end:
+                changed_end = start + count
+
+        if self.copy_bytes:
+            self.target.pixels[:self.copy_bytes] = memoryview(pixels)[:self.copy_bytes]
+            changed_end = min(changed_end, self.target.num_leds)
+        return changed_start, changed_end
+
+    def rewind(self):
+        self.f.seek(self.data_start)
+
+class FrameSequenceEncoder:
+    """Writes frames as a compressed frame sequence of keyframes and delta frames of RLE spans."""
+
+    def __init__(self, f, num_leds, fps, keyframe_interval=100):
+        self.f = f
+        self.num_leds = num_leds
+        self.keyframe_interval = keyframe_interval
+        self.black = bytes(num_leds * 3)
+        self.previous = None
+        self.frames = 0
+        self.raw_bytes = 0
+        self.encoded_bytes = struct.calcsize(ANIMATION_HEADER)
+        write_animation_header(f, num_leds, fps, magic=FRAME_SEQUENCE_MAGIC)
+
+    def encode_spans(self, frame, reference):
+        """Encodes the pixels of frame that differ from reference as run and literal spans."""
+        out = bytearray()
+        num_leds = self.num_leds
+
+        def same(i):
+            j = i * 3
+            return frame[j] == reference[j] and frame[j + 1] == reference[j + 1] and frame[j + 2] == reference[j + 2]
+
+        def emit(start, count, run):
+            while count:
+                n = min(count, SPAN_RUN - 1)
+                out.extend(struct.pack(SPAN_HEADER, start, n | SPAN_RUN if run else n))
+                out.extend(frame[start * 3:start * 3 + (3 if run else n * 3)])
+                start += n
+                count -= n
+
+        i = 0
+        while i < num_leds:
+            if same(i):
+                i += 1
+                continue
+            # Extend the changed region across single unchanged pixels, a new span costs more
+            end = i + 1
+            while end < num_leds and (not same(end) or (end + 1 < num_leds and not same(end + 1))):
+                end += 1
+            literal_start = p = i
+            while p < end:
+                q = p + 1
+                while q < end and frame[q * 3:q * 3 + 3] == frame[p * 3:p * 3 + 3]:
+                    q += 1
+                if q - p >= 3:
+                    if literal_start < p:
+                        emit(literal_start, p - literal_start, False)
+                    emit(p, q - p, True)
+                    literal_start = q
+                p = q
+            if literal_start < end:
+                emit(literal_start, end - literal_start, False)
+            i = end
+        return out
+
+    def add_frame(self, frame):
+        """Appends one canonical RGB frame, as a delta frame unless a keyframe is due or smaller."""
+        payload = self.encode_spans(frame, self.black)
+        flags = FRAME_KEY
+        if self.previous is not None and self.frames % self.keyframe_interval:
+            delta = self.encode_spans(frame, self.previous)
+            if len(delta) < len(payload):
+                payload = delta
+                flags = 0
+        if len(payload) > self.num_leds * 3:
+            # Nothing to gain, store the whole frame as one literal span
+            payload = struct.pack(SPAN_HEADER, 0, self.num_leds) + bytes(frame)
+            flags = FRAME_KEY
+        self.f.write(struct.pack(FRAME_HEADER, flags, len(payload)))
+        self.f.write(payload)
+        self.previous = bytes(frame)
+        self.frames += 1
+        self.raw_bytes += self.num_leds * 3
+        self.encoded_bytes += struct.calcsize(FRAME_HEADER) + len(payload)
+
+    def compression_ratio(self):
+        return self.raw_bytes / self.encoded_bytes if self.encoded_bytes else 0.0
+
+class CaptureComplete(Exception):
+    pass
+
+def capture_effect(effect_func, path, num_frames, fps=20, target=None):
+    """Records the first num_frames frames an effect shows into a compressed frame sequence."""
+    target = target or framebuffer
+    show = target.show
+
+    with open(path, "wb") as f:
+        encoder = FrameSequenceEncoder(f, target.num_leds, fps)
+
+        def capture_show():
+            encoder.add_frame(target.pixels)
+            if encoder.frames >= num_frames:
+                raise CaptureComplete()
+            return show()
+
+        target.show = capture_show
+        try:
+            effect_func([(0.0, 0.0, 0.0) for _ in range(target.num_leds)])
+        except CaptureComplete:
+            pass
+        finally:
+            del target.show  # Back to the class method
+
+    print(f"Captured {encoder.frames} frames to {path}, compression ratio {encoder.compression_ratio():.1f}:1")
+    return encoder
+
+def play_animation_file(path, target, duration, throttle=True):
+    """Streams a pre-rendered animation from flash into target until duration ms have passed.
+
+    Raw animations are read in chunks into one preallocated buffer and compressed frame sequences
+    are decoded in place, so playback allocates nothing per frame. Returns the number of frames
+    shown, or 0 if the file is missing or not an animation.
+    """
+    try:
+        f = open(path, "rb")
+    except OSError:
+        print(f"No animation at {path}")
+        return 0
+
+    header = f.read(struct.calcsize(ANIMATION_HEADER))
+    if len(header) < struct.calcsize(ANIMATION_HEADER):
+        magic = num_leds = None  # Too short to hold a header
+    else:
+        magic, num_leds, fps, color_order = struct.unpack(ANIMATION_HEADER, header)
+    if magic == ANIMATION_MAGIC and num_leds:
+        reader = RawFrameReader(f, num_leds, target)
+    elif magic == FRAME_SEQUENCE_MAGIC and num_leds:
+        reader = FrameSequenceReader(f, num_leds, target)
+    else:
+        print(f"{path} is not an animation")
+        f.close()
+        return 0
+
+    # LEDs past the end of a shorter animation stay dark instead of keeping the last effect
+    target.clear()
+
+    # Route the file's channel order through the output stage instead of converting every pixel
+    canonical_order = target.order
+    file_order = color_order.decode()
+    target.order = tuple(file_order.index("RGB"[c]) for c in canonical_order)
+
+    frame_us = 1000000 // max(1, fps)
+    frames_shown = 0
+    start_time = time.ticks_ms()
+    next_frame = time.ticks_us()
+
+    try:
+        while time.ticks_diff(time.ticks_ms(), start_time) < duration:
+            changed = reader.read_frame()
+            if changed is None:
+                reader.rewind()  # Loop the animation
+                continue
+
+            target.mark_dirty(changed[0], changed[1])
+            target.show()
+            frames_shown += 1
+
+            if throttle:
+                next_frame = time.ticks_add(next_frame, frame_us)
+                wait = time.ticks_diff(next_frame, time.ticks_us())
+                if wait > 0:
+                    time.sleep_us(wait)
+                else:
+                    next_frame = time.ticks_us()  # Running late, do not try to catch up
+    finally:
+        # Also runs when the manager interrupts playback from show()
+        f.close()
+
+        # Leave the last frame in canonical RGB for whatever runs next
+        target.order = canonical_order
+        if file_order != "RGB":
+            pixels = target.pixels
+            o0, o1, o2 = (file_order.index(c) for c in "RGB")
+            for j in range(0, min(num_leds, target.num_leds) * 3, 3):
+                pixels[j], pixels[j + 1], pixels[j + 2] = pixels[j + o0], pixels[j + o1], pixels[j + o2]
+    return frames_shown
+
+def connect_wifi(ssid=WIFI_SSID, password=WIFI_PASSWORD, timeout=10000):
+    """Joins a Wi-Fi network on a Plasma 2040 W, returns the board's IP address or None."""
+    try:
+        import network
+    except ImportError:
+        print("No network support on this board")
+        return None
+
+    wlan = network.WLAN(network.STA_IF)
+    wlan.active(True)
+    if not wlan.isconnected():
+        wlan.connect(ssid, password)
+        start_time = time.ticks_ms()
+        while not wlan.isconnected():
+            if time.ticks_diff(time.ticks_ms(), start_time) > timeout:
+                print(f"Could not connect to {ssid}")
+                return None
+            time.sleep(0.1)
+    ip = wlan.ifconfig()[0]
+    print(f"Connected to {ssid} as {ip}")
+    return ip
+
+def sequence_is_stale(last, sequence, modulo, window):
+    """True if sequence repeats last or is up to window packets behind it."""
+    return (last - sequence) % modulo < window
+
+class UdpReceiver:
+    """Receives DDP and E1.31 (sACN) packets into one preallocated buffer and maps them onto the strip.
+
+    DDP packets carry a byte offset and show the frame when the push flag is set. E1.31 universes map
+    onto consecutive runs of E131_PIXELS_PER_UNIVERSE pixels starting at E131_UNIVERSE, and the frame
+    is shown when the universe holding the last pixel arrives. Repeated or late packets are dropped.
+    """
+
+    def __init__(self, num_leds, ip, ddp_port=DDP_PORT, e131_port=E131_PORT, first_universe=E131_UNIVERSE):
+        import socket
+
+        self.num_leds = num_leds
+        self.first_universe = first_universe
+        self.last_universe = first_universe + (num_leds - 1) // E131_PIXELS_PER_UNIVERSE
+        self.packet = bytearray(1500)
+        self.packet_view = memoryview(self.packet)
+        self.poller = select.poll()
+
+        self.ddp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.ddp.bind(("0.0.0.0", ddp_port))
+        self.e131 = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.e131.bind(("0.0.0.0", e131_port))
+        for sock in (self.ddp, self.e131):
+            sock.setblocking(False)
+            self.poller.register(sock, select.POLLIN)
+
+        # sACN is usually multicast to 239.255.<universe high>.<universe low>
+        local = bytes(int(part) for part in ip.split("."))
+        for universe in range(first_universe, self.last_universe + 1):
+            try:
+                group = bytes((239, 255, universe >> 8, universe & 0xFF))
+                self.e131.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, group + local)
+            except (AttributeError, OSError):
+                print("Multicast not available, send E1.31 to the board's address")
+                break
+
+        self.ddp_sequence = 0
+        self.e131_sequences = {}
+        self.last_packet = time.ticks_ms()
+
+    def available(self):
+        return bool(self.poller.poll(0))
+
+    def read_frame(self, target):
+        """Reads waiting packets into target. Returns True once a packet completes a frame."""
+        for sock, _ in self.poller.poll(0):
+            length = sock.readinto(self.packet)
+            if not length:
+                continue
+            if time.ticks_diff(time.ticks_ms(), self.last_packet) > STREAM_TIMEOUT:
+                # The sender may have restarted, forget its sequence numbers
+                self.ddp_sequence = 0
+                self.e131_sequences = {}
+            self.last_packet = time.ticks_ms()
+            if sock is self.ddp:
+                complete = self.handle_ddp(length, target)
+            else:
+                complete = self.handle_e131(length, target)
+            if complete:
+                return True
+        return False
+
+    def handle_ddp(self, length, target):
+        packet = self.packet
+        if length < 10 or packet[0] & 0xC0 != 0x40 or packet[0] & 0x06:
+            return False  # Not DDP version 1, or a query (0x02) or reply (0x04) rather than pixel data
+        sequence = packet[1] & 0x0F
+        if sequence and self.ddp_sequence and sequence_is_stale(self.ddp_sequence, sequence, 16, 8):
+            return False
+        if sequence:
+            self.ddp_sequence = sequence
+
+        header = 14 if packet[0] & 0x10 else 10  # Timecode adds four bytes
+        offset = packet[4] << 24 | packet[5] << 16 | packet[6] << 8 | packet[7]
+        size = packet[8] << 8 | packet[9]
+        size = min(size, length - header, len(target.pixels) - offset)
+        if size > 0:
+            target.pixels[offset:offset + size] = self.packet_view[header:header + size]
+            target.mark_dirty(offset // 3, (offset + size + 2) // 3)
+        return bool(packet[0] & 0x01)  # Push flag
+
+    def handle_e131(self, length, target):
+        packet = self.packet
+        if length < 126 or packet[4:16] != b"ASC-E1.17\x00\x00\x00" or packet[125] != 0:
+            return False  # Not sACN, or not a DMX start code
+        universe = packet[113] << 8 | packet[114]
+        if not self.first_universe <= universe <= self.last_universe:
+            return False
+        sequence = packet[111]
+        last = self.e131_sequences.get(universe)
+        if last is not None and sequence_is_stale(last, sequence, 256, 20):
+            return False
+        self.e131_sequences[universe] = sequence
+
+        channels = min((packet[123] << 8 | packet[124]) - 1, length - 126, E131_PIXELS_PER_UNIVERSE * 3)
+        offset = (universe - self.first_universe) * E131_PIXELS_PER_UNIVERSE * 3
+        size = min(channels, len(target.pixels) - offset) // 3 * 3
+        if size > 0:
+            target.pixels[offset:offset + size] = self.packet_view[126:126 + size]
+            target.mark_dirty(offset // 3, (offset + size) // 3)
+        return universe == self.last_universe
+
 # Individual effect implementations
 def effect_1(hsv_values):
     """Color-Cycling Pulse effect."""
-    for t in range(1000):
+    def render_frame(t):
         for i in range(NUM_LEDS):
             hue = (i + t) % 360 / 360.0
             brightness = (1 + math.sin(t * 2 * math.pi / 100)) / 2
             hsv_values[i] = (hue, 1.0, brightness)
-            led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
-        time.sleep(0.01)
-    return hsv_values
+            framebuffer.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
+
+    return play_periodic(f"effect_1_{NUM_LEDS}", 1000, render_frame, 0.01, hsv_values, max_periods=1)
+
+class ColorWipeEffect:
+    """Wipes a colour along the strip, each lit LED fading as the wipe moves on, then fades the rest out.
+
+    An LED's colour only depends on how many steps ago it was lit, so every step looks its colour up
+    in a table built once per wipe and only the LEDs that are still fading are redrawn.
+    """
+
+    def __init__(self, num_leds, fade=0.9, step_ms=50, pause_ms=500):
+        self.num_leds = num_leds
+        self.fade = fade  # Brightness kept per step
+        self.step_ms = step_ms
+        self.pause_ms = pause_ms  # Dark pause after each wipe
+        self.start = None
+        self.last_step = 0
+
+    def begin(self, now):
+        """Starts a wipe in a new colour."""
+        hue = uniform(0, 1.0)
+        self.colors = []  # Colour of an LED lit this many steps ago, black at the end
+        v = 1.0
+        while True:
+            color = hsv_to_rgb(hue, 1.0, v)
+            self.colors.append(color)
+            if color == (0, 0, 0) or len(self.colors) > 2 * self.num_leds:
+                break
+            v *= self.fade
+        self.start = now
+        self.last_step = 0
+
+    def render(self, canvas, context):
+        num_leds = self.num_leds
+        if not num_leds:
+            return
+        if self.start is None:
+            self.begin(context.t_ms)
+        elapsed = context.t_ms - self.start
+        if elapsed >= 2 * num_leds * self.step_ms + self.pause_ms:
+            self.begin(context.t_ms)
+            elapsed = 0
+        step = min(elapsed // self.step_ms, 2 * num_leds)
+
+        # LEDs lit before first were black by the previous step already
+        colors = self.colors
+        black = len(colors) - 1
+        first = max(0, self.last_step - black)
+        for i in range(first, min(step, num_leds - 1) + 1):
+            age = step - i
+            r, g, b = colors[age if age < black else black]
+            canvas.set_rgb(i, r, g, b)
+        self.last_step = step
 
 def effect_2(hsv_values):
     """Smooth Dispersing Color Wipe effect."""
-    hue = uniform(0, 1.0)
-    for i in range(NUM_LEDS):
-        for j in range(i):
-            h, s, v = hsv_values[j]
-            hsv_values[j] = (h, s, v * 0.9)
-            led_strip.set_hsv(j, hsv_values[j][0], hsv_values[j][1], hsv_values[j][2])
-
-        hsv_values[i] = (hue, 1.0, 1.0)
-        led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
-        time.sleep(0.05)
-
-    for _ in range(NUM_LEDS):
-        for j in range(NUM_LEDS):
-            h, s, v = hsv_values[j]
-            hsv_values[j] = (h, s, v * 0.9)
-            led_strip.set_hsv(j, hsv_values[j][0], hsv_values[j][1], hsv_values[j][2])
-        time.sleep(0.05)
-
-    time.sleep(0.5)
-    return hsv_values
+    return play_frame_effect(ColorWipeEffect, 20, hsv_values)
+
+class MeteorShowerEffect:
+    """Meteors of random colours streaking along the strip with fading tails."""
+
+    def __init__(self, num_leds, meteor_count=3, meteor_length=8):
+        self.num_leds = num_leds
+        self.meteor_length = meteor_length
+        self.meteors = [
+            {
+                "position": randrange(num_leds) if num_leds else 0,
+                "velocity": uniform(2.0, 10.0),  # LEDs per second
+                "color": hsv_to_rgb(uniform(0, 1.0), 1.0, 1.0)
+            }
+            for _ in range(meteor_count)
+        ]
+
+    def render(self, canvas, context):
+        num_leds = self.num_leds
+        meteor_length = self.meteor_length
+
+        # Fade to 75% every 50 ms
+        pixels = canvas.pixels
+        scale = context.fade_scale(0.003)
+        for j in range(len(pixels)):
+            pixels[j] = pixels[j] * scale >> 8
+        canvas.mark_dirty()
+
+        for meteor in self.meteors:
+            meteor["position"] = context.move(meteor["position"], meteor["velocity"])
+            if meteor["position"] >= num_leds + meteor_length:
+                meteor["position"] = -meteor_length
+                meteor["color"] = hsv_to_rgb(uniform(0, 1.0), 1.0, 1.0)
+
+            r, g, b = meteor["color"]
+            draw_gradient_tail(canvas, meteor["position"], meteor_length, r, g, b)
 
 def effect_3(hsv_values):
     """Meteor Shower effect."""
-    meteor_length = 8
-    meteor_count = 3
-    fade_rate = 0.75
-
-    meteors = [
-        {
-            "position": randrange(NUM_LEDS),
-            "velocity": uniform(0.1, 0.5),
-            "hue": uniform(0, 1.0)
-        }
-        for _ in range(meteor_count)
-    ]
+    return play_frame_effect(MeteorShowerEffect, 20, hsv_values)
 
-    start_time = time.ticks_ms()
+def effect_4(hsv_values):
+    """Enhanced Breathe effect."""
+    def render_frame(t):
+        hue = t / 360.0
+        brightness = (1 + math.sin(t * 2 * math.pi / 180)) / 2
 
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
         for i in range(NUM_LEDS):
-            h, s, v = hsv_values[i]
-            hsv_values[i] = (h, s, v * fade_rate)
-            led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
-
-        for meteor in meteors:
-            meteor["position"] += meteor["velocity"]
-            if meteor["position"] >= NUM_LEDS + meteor_length:
-                meteor["position"] = -meteor_length
-                meteor["hue"] = uniform(0, 1.0)
+            hsv_values[i] = (hue, 1.0, brightness)
+            framebuffer.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
 
-            for j in range(meteor_length):
-                pos = int(meteor["position"] - j)
-                if 0 <= pos < NUM_LEDS:
-                    brightness = 1.0 - (j / meteor_length)
-                    hsv_values[pos] = (meteor["hue"], 1.0, brightness)
-                    led_strip.set_hsv(pos, hsv_values[pos][0], hsv_values[pos][1], hsv_values[pos][2])
+    return play_periodic(f"effect_4_{NUM_LEDS}", 360, render_frame, 0.02, hsv_values)
 
-        time.sleep(0.05)
-    return hsv_values
+class StarryTwinkleEffect:
+    """Stars of random colours lighting up and fading away."""
 
-def effect_4(hsv_values):
-    """Enhanced Breathe effect."""
-    start_time = time.ticks_ms()
-    
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        for t in range(360):
-            hue = t / 360.0
-            brightness = (1 + math.sin(t * 2 * math.pi / 180)) / 2
-            
-            for i in range(NUM_LEDS):
-                hsv_values[i] = (hue, 1.0, brightness)
-                led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
-
-            time.sleep(0.02)
-    return hsv_values
+    def __init__(self, num_leds, twinkle_rate=1.0, fade_rate=0.12):
+        self.num_leds = num_leds
+        self.twinkle_rate = twinkle_rate  # Twinkles per LED per second, about 5% every 50 ms
+        self.twinkles = SparseSampler(0)
+        self.fade_rate = fade_rate  # Brightness left after a second, 90% every 50 ms
+
+    def render(self, canvas, context):
+        pixels = canvas.pixels
+        scale = context.fade_scale(self.fade_rate)
+        for j in range(len(pixels)):
+            pixels[j] = pixels[j] * scale >> 8
+        canvas.mark_dirty()
+
+        # Per-frame chance from the rate, so the star density doesn't depend on the frame rate
+        self.twinkles.set_probability(context.chance(self.twinkle_rate))
+        for i in self.twinkles.indices(self.num_leds):
+            canvas.set_hsv(i, fast_random.next16() / 65536, 1.0, fast_random.uniform(0.5, 1.0))
 
 def effect_5(hsv_values):
     """Starry Twinkle effect."""
-    fade_rate = 0.9
-    twinkle_chance = 0.05
+    return play_frame_effect(StarryTwinkleEffect, 20, hsv_values)
 
-    start_time = time.ticks_ms()
-    
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        for i in range(NUM_LEDS):
-            h, s, v = hsv_values[i]
-            hsv_values[i] = (h, s, v * fade_rate)
-            led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
+class WavesOfColorEffect:
+    """Waves of colour rolling through a shifting rainbow."""
 
-            if uniform(0, 1) < twinkle_chance:
-                twinkle_hue = uniform(0.0, 1.0)
-                twinkle_brightness = uniform(0.5, 1.0)
-                hsv_values[i] = (twinkle_hue, 1.0, twinkle_brightness)
-                led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
+    compute_fps = 15
 
-        time.sleep(0.05)
-    return hsv_values
+    def __init__(self, num_leds, wave_count=3, wave_length=20, step_ms=50):
+        self.num_leds = num_leds
+        self.wave_count = wave_count
+        self.wave_length = wave_length
+        self.step_ms = step_ms  # The pattern moves one degree per step
+
+    def render(self, canvas, context):
+        num_leds = self.num_leds
+        wave_count = self.wave_count
+        wave_length = self.wave_length
+        t = context.t_ms / self.step_ms % 360
+        for i in range(num_leds):
+            brightness = 0
+            for wave in range(wave_count):
+                offset = (t + wave * 120) % 360
+                wave_position = (i * 360 / num_leds + offset) % 360
+                wave_brightness = (1 + math.sin(wave_position * 2 * math.pi / wave_length)) / 2
+                brightness += wave_brightness / wave_count
+
+            hue = (t + i) % 360 / 360.0
+            canvas.set_hsv(i, hue, 1.0, brightness)
 
 def effect_6(hsv_values):
     """Waves of Color effect."""
-    wave_count = 3
-    wave_speed = 0.1
-    wave_length = 20
-
-    start_time = time.ticks_ms()
-    
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        for t in range(360):
-            for i in range(NUM_LEDS):
-                brightness = 0
-                for wave in range(wave_count):
-                    offset = (t + wave * 120) % 360
-                    wave_position = (i * 360 / NUM_LEDS + offset) % 360
-                    wave_brightness = (1 + math.sin(wave_position * 2 * math.pi / wave_length)) / 2
-                    brightness += wave_brightness / wave_count
-
-                hue = (t + i) % 360 / 360.0
-                hsv_values[i] = (hue, 1.0, brightness)
-                led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
-
-            time.sleep(0.05)
-    return hsv_values
+    return play_frame_effect(WavesOfColorEffect, 60, hsv_values)
 
-def effect_7(hsv_values):
-    """Plasma Storm effect with a balanced color spectrum."""
-    speed = 0.2
-    intensity_variation = 0.3
-    wave_length = 15
-    color_shift_speed = 0.02
+class PlasmaStormEffect:
+    """Plasma storm with a balanced colour spectrum."""
 
-    start_time = time.ticks_ms()
-    
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        for t in range(360):
-            base_hue = (t * color_shift_speed) % 1.0
+    compute_fps = 20
 
-            for i in range(NUM_LEDS):
-                noise1 = math.sin(i * 2 * math.pi / wave_length + t * speed)
-                noise2 = math.cos(i * 2 * math.pi / (wave_length / 2) + t * speed * 1.5)
-                combined_noise = (noise1 + noise2) / 2
+    def __init__(self, num_leds, speed=0.2, intensity_variation=0.3, wave_length=15,
+                 color_shift_speed=0.02, step_ms=50):
+        self.num_leds = num_leds
+        self.speed = speed
+        self.intensity_variation = intensity_variation
+        self.wave_length = wave_length
+        self.color_shift_speed = color_shift_speed
+        self.step_ms = step_ms  # Speeds are per step of this length
+
+    def render(self, canvas, context):
+        speed = self.speed
+        wave_length = self.wave_length
+        t = context.t_ms / self.step_ms % 360
+        base_hue = (t * self.color_shift_speed) % 1.0
+
+        for i in range(self.num_leds):
+            noise1 = math.sin(i * 2 * math.pi / wave_length + t * speed)
+            noise2 = math.cos(i * 2 * math.pi / (wave_length / 2) + t * speed * 1.5)
+            combined_noise = (noise1 + noise2) / 2
+
+            hue = (base_hue + combined_noise * 0.05) % 1.0
+            brightness = 0.5 + combined_noise * self.intensity_variation
+            canvas.set_hsv(i, hue, 1.0, brightness)
 
-                hue = (base_hue + combined_noise * 0.05) % 1.0
-                brightness = 0.5 + combined_noise * intensity_variation
+def effect_7(hsv_values):
+    """Plasma Storm effect with a balanced color spectrum."""
+    return play_frame_effect(PlasmaStormEffect, 60, hsv_values)
 
-                hsv_values[i] = (hue, 1.0, brightness)
-                led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
+class WaveBurstEffect:
+    """Bursts of colour that grow outwards and fade, launched at a steady interval."""
 
-            time.sleep(0.05)
-    return hsv_values
+    def __init__(self, num_leds, burst_ms=2500, interval_ms=5000, growth=20.0):
+        self.num_leds = num_leds
+        self.burst_ms = burst_ms  # Lifetime of a burst
+        self.interval_ms = interval_ms
+        self.growth = growth  # LEDs per second
+        self.bursts = []
+
+    def render(self, canvas, context):
+        num_leds = self.num_leds
+        burst_ms = self.burst_ms
+        for burst in self.bursts[:]:
+            age = context.t_ms - burst["start"]
+            if age > burst_ms:
+                self.bursts.remove(burst)
+                continue
+
+            fade_factor = (burst_ms - age) / burst_ms
+            size = 1 + int(age * self.growth / 1000)
+            for j in range(-size, size):
+                distance = abs(j) / size
+                canvas.set_hsv((burst["position"] + j) % num_leds, burst["hue"], 1.0, fade_factor * (1 - distance))
+
+        if num_leds and context.every(self.interval_ms):
+            self.bursts.append({
+                "position": randrange(num_leds),
+                "hue": uniform(0, 1.0),
+                "start": context.t_ms
+            })
 
 def effect_8(hsv_values):
     """Continuous Color Wave Burst effect."""
-    burst_count = 3
-    max_burst_size = 10
-    burst_duration = 50
-    burst_interval = 100
-    frame_count = 0
+    return play_frame_effect(WaveBurstEffect, 20, hsv_values)
 
-    active_bursts = []
+class FireworksEffect:
+    """Rockets climbing from the start of the strip and bursting into explosions that grow and fade.
 
-    start_time = time.ticks_ms()
+    A rocket is launched every launch_interval explosion steps, the explosions hold still while it climbs.
+    """
 
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        for burst in active_bursts:
-            burst["frame"] += 1
-            burst["size"] += 1
-            fade_factor = max(0, (burst_duration - burst["frame"]) / burst_duration)
-            burst["brightness"] = fade_factor
+    def __init__(self, num_leds, launch_interval=50, fade=0.9, step_ms=50):
+        self.num_leds = num_leds
+        self.launch_interval = launch_interval
+        self.fade = fade  # Brightness an explosion keeps per step
+        self.step_ms = step_ms  # Rockets climb one LED per step
+        self.rocket = None  # Position, burst position and hue of the climbing rocket
+        self.explosions = []
+        self.steps = 0
+
+    def step(self, canvas):
+        num_leds = self.num_leds
+        if self.rocket is None and self.steps % self.launch_interval == 0:
+            self.rocket = [0, randrange(num_leds // 2, num_leds), uniform(0, 1.0)]
+            self.steps += 1
+
+        rocket = self.rocket
+        if rocket:
+            position, burst, hue = rocket
+            if position > 0:
+                canvas.set_rgb(position - 1, 0, 0, 0)
+            canvas.set_hsv(position, hue, 1.0, 1.0)
+            rocket[0] = position + 1
+            if rocket[0] >= burst:
+                self.explosions.append({"position": burst, "hue": hue, "size": 1, "brightness": 1.0})
+                self.rocket = None
+            return
+
+        for explosion in self.explosions[:]:
+            size = explosion["size"]
+            for j in range(-size, size):
+                pos = explosion["position"] + j
+                if 0 <= pos < num_leds:
+                    canvas.set_hsv(pos, explosion["hue"], 1.0, explosion["brightness"] * (1.0 - abs(j) / size))
 
-            if burst["frame"] > burst_duration:
-                active_bursts.remove(burst)
-            else:
-                for j in range(-burst["size"], burst["size"]):
-                    pos = (burst["position"] + j) % NUM_LEDS
-                    if 0 <= pos < NUM_LEDS:
-                        distance = abs(j) / burst["size"]
-                        brightness = burst["brightness"] * (1 - distance)
-                        hsv_values[pos] = (burst["hue"], 1.0, brightness)
-                        led_strip.set_hsv(pos, hsv_values[pos][0], hsv_values[pos][1], hsv_values[pos][2])
-
-        if frame_count % burst_interval == 0:
-            new_burst = {
-                "position": randrange(NUM_LEDS),
-                "hue": uniform(0, 1.0),
-                "size": 0,
-                "brightness": 1.0,
-                "frame": 0
-            }
-            active_bursts.append(new_burst)
+            explosion["size"] = size + 1
+            explosion["brightness"] *= self.fade
+            if explosion["brightness"] < 0.01:
+                self.explosions.remove(explosion)
+        self.steps += 1
 
-        frame_count += 1
-        time.sleep(0.05)
-    return hsv_values
+    def render(self, canvas, context):
+        if not self.num_leds:
+            return
+        for _ in range(min(context.every(self.step_ms), 5)):
+            self.step(canvas)
 
 def effect_9(hsv_values):
     """Smooth Fading Fireworks effect."""
-    firework_speed = 0.3
-    explosion_size = 10
-    launch_interval = 50
-    fade_speed = 0.9
-    frame_count = 0
-
-    active_explosions = []
+    return play_frame_effect(FireworksEffect, 20, hsv_values)
 
-    start_time = time.ticks_ms()
+class LavaLampEffect:
+    """Lava lamp: solid colour blobs drifting up and down the strip, blending their hues where they overlap.
 
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        if frame_count % launch_interval == 0:
-            launch_pos = 0
-            explosion_pos = randrange(NUM_LEDS // 2, NUM_LEDS)
-            firework_hue = uniform(0, 1.0)
-            firework_phase = "launch"
-
-            while firework_phase == "launch":
-                if launch_pos > 0:
-                    hsv_values[launch_pos - 1] = (0.0, 0.0, 0.0)
-                    led_strip.set_hsv(launch_pos - 1, 0.0, 0.0, 0.0)
-
-                hsv_values[launch_pos] = (firework_hue, 1.0, 1.0)
-                led_strip.set_hsv(launch_pos, firework_hue, 1.0, 1.0)
-
-                launch_pos += 1
-
-                if launch_pos >= explosion_pos:
-                    firework_phase = "explode"
-                    active_explosions.append({
-                        "position": explosion_pos,
-                        "hue": firework_hue,
-                        "size": 1,
-                        "brightness": 1.0
-                    })
-                time.sleep(0.05)
-
-        for explosion in active_explosions[:]:
-            for j in range(-explosion["size"], explosion["size"]):
-                pos = explosion["position"] + j
-                if 0 <= pos < NUM_LEDS:
-                    brightness = explosion["brightness"] * (1.0 - abs(j) / explosion["size"])
-                    hsv_values[pos] = (explosion["hue"], 1.0, brightness)
-                    led_strip.set_hsv(pos, hsv_values[pos][0], hsv_values[pos][1], hsv_values[pos][2])
+    Blobs add integer weights from a precomputed falloff kernel, shifted to their position within
+    an LED, into persistent accumulators. A single pass over the strip then writes covered LEDs,
+    fades the rest and clears the accumulators. LEDs with little weight are only partly lit, so
+    blob edges glide between LEDs instead of snapping.
+    """
 
-            explosion["size"] += 1
-            explosion["brightness"] *= fade_speed
+    # Fully saturated colours for hues 0-255
+    HUE_RGB = bytes(c for k in range(256) for c in hsv_to_rgb(k / 256, 1.0, 1.0))
 
-            if explosion["brightness"] < 0.01:
-                active_explosions.remove(explosion)
+    EDGE_WEIGHT = 64  # LEDs under this total weight are lit in proportion to it
 
-        frame_count += 1
-        time.sleep(0.05)
-    return hsv_values
+    kernels = {}  # Blob size -> (offset of the first weight, weights), shared by all instances
 
-def hsv_to_grb(h, s, v):
-    """Converts HSV to GRB color space to accommodate the GRB LED strip."""
-    r, g, b = hsv_to_rgb(h, s, v)
-    return g, r, b  # Swap R and G to fit the GRB color order
+    def __init__(self, num_leds, num_blobs=3, blob_min_size=8, blob_max_size=16, speed=2.5, fade=0.077):
+        self.num_leds = num_leds
+        self.fade = fade  # Fraction of brightness kept after a second, 95% every 20 ms
+        # Each blob is [position, size, direction, hue 0-255, speed in LEDs per second]
+        self.blobs = [
+            [uniform(0, num_leds), randrange(blob_min_size, blob_max_size), choice([-1, 1]),
+             randrange(256), uniform(speed, speed * 2)]
+            for _ in range(num_blobs if num_leds else 0)
+        ]
+        self.hue_sum = [0] * num_leds  # Weighted hue per LED
+        self.weight = [0] * num_leds  # Total blob weight per LED
+
+    @classmethod
+    def kernel(cls, size):
+        """Returns the falloff of a blob of size, 0-255 from the centre to 0 at the edges and beyond."""
+        kernel = cls.kernels.get(size)
+        if kernel is None:
+            reach = size // 2 + 1
+            kernel = (-reach, tuple(
+                max(0, 255 - 510 * abs(j) // size) if 2 * abs(j) < size else 0 for j in range(-reach, reach + 1)
+            ))
+            cls.kernels[size] = kernel
+        return kernel
+
+    def render(self, canvas, context):
+        num_leds = self.num_leds
+        hue_sum = self.hue_sum
+        weight = self.weight
+
+        for blob in self.blobs:
+            # Move and reverse direction at the strip ends
+            position = context.move(blob[0], blob[2] * blob[4])
+            if position < 0 or position >= num_leds:
+                blob[2] = -blob[2]
+                position = max(0, min(num_leds - 1, position))
+            blob[0] = position
+
+            # Sample the kernel moved right by the blob's position within its LED, in 1/256 LED
+            hue = blob[3]
+            fx = int(position * 256)
+            moved = fx & 0xFF
+            first, weights = self.kernel(blob[1])
+            pos = (fx >> 8) + first
+            below = 0
+            for w in weights:
+                shifted = (w * (256 - moved) + below * moved) >> 8
+                below = w
+                if shifted and 0 <= pos < num_leds:
+                    hue_sum[pos] += hue * shifted
+                    weight[pos] += shifted
+                pos += 1
+
+        # One pass: covered LEDs take the blended hue, at full brightness from EDGE_WEIGHT, the rest fade
+        pixels = canvas.pixels
+        hue_rgb = self.HUE_RGB
+        edge = self.EDGE_WEIGHT
+        scale = context.fade_scale(self.fade)
+        for i in range(num_leds):
+            j = i * 3
+            w = weight[i]
+            if w >= edge:
+                k = (hue_sum[i] + (w >> 1)) // w * 3
+                pixels[j] = hue_rgb[k]
+                pixels[j + 1] = hue_rgb[k + 1]
+                pixels[j + 2] = hue_rgb[k + 2]
+                hue_sum[i] = 0
+                weight[i] = 0
+            elif w:
+                # Blend the faded LED towards the blob colour by the weight
+                k = (hue_sum[i] + (w >> 1)) // w * 3
+                level = w * 256 // edge
+                for c in range(3):
+                    faded = pixels[j + c] * scale >> 8
+                    pixels[j + c] = faded + ((hue_rgb[k + c] - faded) * level >> 8)
+                hue_sum[i] = 0
+                weight[i] = 0
+            else:
+                pixels[j] = pixels[j] * scale >> 8
+                pixels[j + 1] = pixels[j + 1] * scale >> 8
+                pixels[j + 2] = pixels[j + 2] * scale >> 8
+        canvas.mark_dirty()
 
 def effect_10(hsv_values):
-    """Improved Lava Lamp Effect with Smooth, Solid Color Blobs and Blended Overlaps (GRB Compatible)."""
-    num_blobs = 3  # Number of blobs in the effect
-    base_speed = 0.05  # Base speed for the blobs
-    blob_min_size = 8  # Minimum size of the blobs
-    blob_max_size = 16  # Maximum size of the blobs
-    fade_factor = 0.95  # How quickly the previous color fades
-    step_time = 0.02  # Delay between animation steps
-
-    # Initialize blobs with position, size, direction, hue, and speed
-    blobs = [
-        {
-            "position": uniform(0, NUM_LEDS),
-            "size": randrange(blob_min_size, blob_max_size),
-            "direction": choice([-1, 1]),
-            "hue": uniform(0, 1.0),
-            "speed": uniform(base_speed, base_speed * 2)
-        }
-        for _ in range(num_blobs)
-    ]
-
-    start_time = time.ticks_ms()
-
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        # Initialize arrays for blended hue, saturation, and brightness
-        blended_hue = [0.0] * NUM_LEDS
-        blended_brightness = [0.0] * NUM_LEDS
-        total_weight = [0.0] * NUM_LEDS  # Track the sum of brightness weights for blending
-
-        # Fade all LEDs to create a trailing effect
-        for i in range(NUM_LEDS):
-            h, s, v = hsv_values[i]
-            v = v * fade_factor
-            hsv_values[i] = (h, s, v)
-            r, g, b = hsv_to_grb(h, s, v)
-            led_strip.set_rgb(i, r, g, b)
-
-        # Update each blob and calculate blending for overlaps
-        for blob in blobs:
-            # Update position and reverse direction at strip ends
-            blob["position"] += blob["direction"] * blob["speed"]
-            if blob["position"] < 0 or blob["position"] >= NUM_LEDS:
-                blob["direction"] *= -1
-                blob["position"] = max(0, min(NUM_LEDS - 1, blob["position"]))
-
-            # Apply the blob's color and brightness, blending with existing values
-            for j in range(-blob["size"] // 2, blob["size"] // 2):
-                pos = int(blob["position"] + j)
-                if 0 <= pos < NUM_LEDS:
-                    distance = abs(j) / (blob["size"] / 2)
-                    brightness = max(0, 1.0 - distance)  # Blob brightness decreases from center to edges
-
-                    # Blend the hue and brightness for overlaps
-                    blended_hue[pos] += blob["hue"] * brightness
-                    blended_brightness[pos] += brightness
-                    total_weight[pos] += brightness
-
-        # Set the final blended color for each LED
-        for i in range(NUM_LEDS):
-            if total_weight[i] > 0:
-                # Calculate the average hue and brightness based on the blending
-                final_hue = blended_hue[i] / total_weight[i]
-                final_brightness = blended_brightness[i] / total_weight[i]
-                hsv_values[i] = (final_hue, 1.0, final_brightness)
-                r, g, b = hsv_to_grb(final_hue, 1.0, final_brightness)
-                led_strip.set_rgb(i, r, g, b)
+    """Improved Lava Lamp Effect with Smooth, Solid Color Blobs and Blended Overlaps."""
+    return play_frame_effect(LavaLampEffect, 50, hsv_values)
+
+class TwinkleStarsEffect:
+    """Smooth twinkling stars over a fading background."""
+
+    def __init__(self, num_leds, num_stars=20, min_brightness=0.2, max_brightness=1.0, twinkle_speed=0.1):
+        self.min_brightness = min_brightness
+        self.max_brightness = max_brightness
+        self.twinkle_speed = twinkle_speed
+        self.stars = [
+            {
+                "position": randrange(num_leds),
+                "brightness": uniform(min_brightness, max_brightness),
+                "direction": choice([-1, 1]),
+                "hue": uniform(0, 1.0)
+            }
+            for _ in range(num_stars if num_leds else 0)
+        ]
 
-        time.sleep(step_time)
+    def render(self, canvas, context):
+        pixels = canvas.pixels
+        scale = context.fade_scale(0.36)  # 95% every 50 ms
+        for j in range(len(pixels)):
+            pixels[j] = pixels[j] * scale >> 8
+        canvas.mark_dirty()
 
-    return hsv_values
+        for star in self.stars:
+            star["brightness"] = context.move(star["brightness"], star["direction"] * self.twinkle_speed)
 
-def hsv_to_grb(h, s, v):
-    """Converts HSV color space to GRB color space for the LED strip."""
-    r, g, b = hsv_to_rgb(h, s, v)
-    return g, r, b  # Swap red and green for GRB
+            if star["brightness"] >= self.max_brightness:
+                star["direction"] = -1
+            elif star["brightness"] <= self.min_brightness:
+                star["direction"] = 1
 
+            canvas.set_hsv(star["position"], star["hue"], 1.0, star["brightness"])
 
 def effect_11(hsv_values):
     """Smooth Twinkle Stars effect."""
-    num_stars = 20
-    max_brightness = 1.0
-    min_brightness = 0.2
-    twinkle_speed = 0.005
-
-    stars = [
-        {
-            "position": randrange(NUM_LEDS),
-            "brightness": uniform(min_brightness, max_brightness),
-            "direction": choice([-1, 1]),
-            "hue": uniform(0, 1.0)
-        }
-        for _ in range(num_stars)
-    ]
+    return play_frame_effect(TwinkleStarsEffect, 20, hsv_values)
+
+class TetrisEffect:
+    """Tetris blocks in the standard colours falling onto a stack, which slides away once it is full.
+
+    Every step does a bounded amount of drawing: a falling block moves by redrawing its two ends and
+    the sliding stack by redrawing the bottom LED of each block.
+    """
+
+    BLOCK_COLORS = (
+        (0, 255, 255),  # Cyan
+        (255, 255, 0),  # Yellow
+        (255, 0, 255),  # Purple
+        (0, 255, 0),  # Green
+        (0, 0, 255),  # Blue
+        (255, 0, 0),  # Red
+        (255, 165, 0),  # Orange
+    )
+
+    def __init__(self, num_leds, min_block_length=3, max_block_length=10, step_ms=50, pause_ms=3000):
+        self.num_leds = num_leds
+        self.min_block_length = min_block_length
+        self.max_block_length = max_block_length
+        self.step_ms = step_ms  # Blocks fall and slide one LED per step
+        self.pause_ms = pause_ms  # Pause with the stack full
+        self.state = None
+
+    def new_game(self, canvas, now):
+        if self.state is None:
+            canvas.clear()
+        else:
+            # Only the top block is left at the bottom of the strip
+            start, end, color = self.blocks[-1]
+            for i in range(max(0, start - self.offset), min(end - self.offset, self.num_leds)):
+                canvas.set_rgb(i, 0, 0, 0)
+        self.blocks = []  # (start, end, colour) from the bottom up
+        self.stacked = 0
+        self.offset = 0  # How far the stack has slid down
+        self.lowest = 0  # First block still on the strip while sliding
+        self.spawn(canvas, now)
+
+    def spawn(self, canvas, now):
+        """Drops a new block from the end of the strip, or pauses when the stack is full."""
+        if self.stacked >= self.num_leds:
+            self.state = "pause"
+            self.state_start = now
+            return
+        color = self.BLOCK_COLORS[randrange(len(self.BLOCK_COLORS))]
+        length = randrange(self.min_block_length, self.max_block_length + 1)
+        bottom = max(self.stacked, self.num_leds - length)
+        self.falling = [bottom, length, color]
+        for i in range(bottom, min(bottom + length, self.num_leds)):
+            canvas.set_rgb(i, *color)
+        self.state = "fall"
+
+    def step(self, canvas, now):
+        num_leds = self.num_leds
+        if self.state == "fall":
+            bottom, length, color = self.falling
+            if bottom > self.stacked:
+                top = bottom + length - 1
+                if top < num_leds:
+                    canvas.set_rgb(top, 0, 0, 0)
+                bottom -= 1
+                canvas.set_rgb(bottom, *color)
+                self.falling[0] = bottom
+            else:
+                self.blocks.append((bottom, bottom + length, color))
+                self.stacked = bottom + length
+                self.spawn(canvas, now)
+        elif self.state == "pause":
+            if now - self.state_start >= self.pause_ms:
+                self.state = "slide"
+        elif self.state == "slide":
+            blocks = self.blocks
+            top_start, top_end, _ = blocks[-1]
+            if top_start - self.offset <= 0:
+                self.new_game(canvas, now)
+                return
+            # The stack moves down as one, so only each block's bottom LED and the top LED change
+            self.offset += 1
+            offset = self.offset
+            while blocks[self.lowest][1] - offset <= 0:
+                self.lowest += 1
+            for k in range(self.lowest, len(blocks)):
+                start, end, color = blocks[k]
+                i = start - offset
+                if 0 <= i < num_leds:
+                    canvas.set_rgb(i, *color)
+            if top_end - offset < num_leds:
+                canvas.set_rgb(top_end - offset, 0, 0, 0)
+
+    def render(self, canvas, context):
+        if not self.num_leds:
+            return
+        if self.state is None:
+            self.new_game(canvas, context.t_ms)
+        for _ in range(min(context.every(self.step_ms), 5)):
+            self.step(canvas, context.t_ms)
 
-    start_time = time.ticks_ms()
+def effect_12(hsv_values):
+    """Tetris Block Fall (Top-Down) with Standard Tetris Colors and Dispersal."""
+    return play_frame_effect(TetrisEffect, 20, hsv_values)
 
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        for i in range(NUM_LEDS):
-            hsv_values[i] = (
-                hsv_values[i][0], 
-                hsv_values[i][1], 
-                hsv_values[i][2] * 0.95
-            )
-            led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
+class RainEffect:
+    """Blue raindrops with short trails streaking along the strip, from a drizzle to a torrent.
 
-        for star in stars:
-            star["brightness"] += star["direction"] * twinkle_speed
+    Drops come from a fixed pool, and only the LEDs that are still lit get faded, through a
+    lookup table, so the frame time follows the amount of rain rather than the strip length.
+    """
 
-            if star["brightness"] >= max_brightness:
-                star["direction"] = -1
-            elif star["brightness"] <= min_brightness:
-                star["direction"] = 1
+    def __init__(self, num_leds, intensity=1.0, drop_color=(0, 0, 255), trail_length=3, fade=0.7 ** 100):
+        self.num_leds = num_leds
+        self.intensity = intensity  # 1.0 is a torrent, 0.1 a drizzle
+        self.fade = fade  # Fraction of brightness kept after a second, 70% every 10 ms
+        # Trail colours from the head back, fading out linearly
+        self.trail = [
+            tuple(int(c * (1.0 - t / trail_length)) for c in drop_color) for t in range(trail_length)
+        ]
+        # 15 drops on 66 LEDs at full intensity, the same density on longer strips
+        pool = max(1, round(15 * intensity * num_leds / 66)) if num_leds else 0
+        self.positions = [-1.0] * pool  # Negative for a free slot
+        self.speeds = [0.0] * pool
+        self.spawn_rate = pool * 50 / 15  # Drops per second while there are free slots
+        self.min_speed = 5.0 * (0.4 + 0.6 * intensity)  # LEDs per second
+        self.max_speed = 15.0 * (0.4 + 0.6 * intensity)
+        self.lit = []  # LEDs that still need fading
+        self.lit_flags = bytearray(num_leds)
+        self.fade_lut = None
+        self.fade_lut_scale = -1
+        self.cleared = False
+
+    def render(self, canvas, context):
+        num_leds = self.num_leds
+        if not num_leds:
+            return
+        pixels = canvas.pixels
+        if not self.cleared:
+            canvas.clear()
+            self.cleared = True
+
+        positions = self.positions
+        speeds = self.speeds
+
+        # Spawn drops at the spawn rate, rounding the fraction of a drop at random
+        due = self.spawn_rate * context.dt
+        count = int(due)
+        if fast_random.below(256) < (due - count) * 256:
+            count += 1
+        for k in range(len(positions)):
+            if not count:
+                break
+            if positions[k] < 0:
+                positions[k] = float(fast_random.below(max(1, num_leds - 1)))
+                speeds[k] = fast_random.uniform(self.min_speed, self.max_speed)
+                count -= 1
+
+        # Fade the lit LEDs, forgetting the ones that went dark
+        scale = context.fade_scale(self.fade)
+        if scale != self.fade_lut_scale:
+            self.fade_lut = bytes(v * scale >> 8 for v in range(256))
+            self.fade_lut_scale = scale
+        lut = self.fade_lut
+        flags = self.lit_flags
+        still_lit = []
+        for i in self.lit:
+            j = i * 3
+            r = pixels[j] = lut[pixels[j]]
+            g = pixels[j + 1] = lut[pixels[j + 1]]
+            b = pixels[j + 2] = lut[pixels[j + 2]]
+            if r | g | b:
+                still_lit.append(i)
+            else:
+                flags[i] = 0
+
+        # Draw each drop's trail over what is left, then move it on
+        for k in range(len(positions)):
+            position = positions[k]
+            if position < 0:
+                continue
+            head = int(position)
+            for t, (r, g, b) in enumerate(self.trail):
+                i = head - t
+                if 0 <= i < num_leds:
+                    j = i * 3
+                    if pixels[j] < r:
+                        pixels[j] = r
+                    if pixels[j + 1] < g:
+                        pixels[j + 1] = g
+                    if pixels[j + 2] < b:
+                        pixels[j + 2] = b
+                    if not flags[i]:
+                        flags[i] = 1
+                        still_lit.append(i)
+            position += speeds[k] * context.dt
+            positions[k] = position if position < num_leds else -1.0
+
+        self.lit = still_lit
+        canvas.mark_dirty()
 
-            pos = star["position"]
-            hsv_values[pos] = (star["hue"], 1.0, star["brightness"])
-            led_strip.set_hsv(pos, hsv_values[pos][0], hsv_values[pos][1], hsv_values[pos][2])
+def effect_13(hsv_values):
+    """Simulates torrential rain with fast-moving blue raindrops on the LED strip."""
+    return play_frame_effect(RainEffect, 100, hsv_values)
 
-        time.sleep(0.05)
-    return hsv_values
+def effect_14(hsv_values):
+    """Creates a dynamic wave of colors flowing across the LED strip."""
 
-def effect_12(hsv_values):
-    """Tetris Block Fall (Top-Down) with Standard Tetris Colors in GRB format and Dispersal."""
-    block_colors = [
-        {"name": "Cyan",    "rgb": (255, 0, 255)}, 
-        {"name": "Yellow",  "rgb": (255, 255, 0)}, 
-        {"name": "Purple",  "rgb": (0, 255, 255)}, 
-        {"name": "Green",   "rgb": (255, 0, 0)},   
-        {"name": "Blue",    "rgb": (0, 0, 255)},   
-        {"name": "Red",     "rgb": (0, 255, 0)},   
-        {"name": "Orange",  "rgb": (165, 255, 0)}  
-    ]
-    
-    max_block_length = 10
-    min_block_length = 3
-    frame_delay = 0.05
-    stacked_height = 0
-    blocks = []
+    wave_length = 20
+    speed = 0.1
+    wave_height = 1.0
 
-    for i in range(NUM_LEDS):
-        hsv_values[i] = (0.0, 0.0, 0.0)
-        led_strip.set_rgb(i, 0, 0, 0)
+    def render_frame(t):
+        for i in range(NUM_LEDS):
+            wave_position = (i + t * speed) % wave_length
+            brightness = (1 + math.sin(wave_position * 2 * math.pi / wave_length)) / 2 * wave_height
+
+            hue = (t + i) % 360 / 360.0
+            framebuffer.set_hsv(i, hue, 1.0, brightness)
+
+    key = f"effect_14_{NUM_LEDS}_{wave_length}_{speed}_{wave_height}"
+    return play_periodic(key, 360, render_frame, 0.05, hsv_values)
+
+def heat_palette(*stops):
+    """Returns a 256-entry heat to RGB palette as bytes, interpolated between (heat, (r, g, b)) stops."""
+    palette = bytearray(256 * 3)
+    for (h0, c0), (h1, c1) in zip(stops, stops[1:]):
+        for h in range(h0, h1 + 1):
+            for k in range(3):
+                palette[h * 3 + k] = c0[k] + (c1[k] - c0[k]) * (h - h0) // (h1 - h0)
+    return bytes(palette)
+
+# Fire presets, name: (cooling, sparking, palette)
+FIRE_PRESETS = {
+    # Orange flames fading to black
+    "ember": (55, 120, heat_palette((0, (0, 0, 0)), (255, (255, 122, 0)))),
+    # Classic black, red, yellow and white heat colours, burning hot
+    "blaze": (50, 160, heat_palette((0, (0, 0, 0)), (85, (255, 0, 0)), (170, (255, 255, 0)), (255, (255, 255, 255)))),
+    # Short blue gas flame
+    "gas": (80, 90, heat_palette((0, (0, 0, 0)), (110, (0, 0, 255)), (200, (0, 160, 255)), (255, (200, 255, 255)))),
+    # Flickering green flame
+    "witch": (90, 200, heat_palette((0, (0, 0, 0)), (100, (0, 160, 0)), (190, (120, 255, 0)), (255, (220, 255, 160)))),
+}
+
+class FireEffect:
+    """Simulates a fire burning from the start of the LEDs it is given.
+
+    Heat lives in a bytearray, cooled from one batch of random bytes per step, and reaches the
+    pixels through the preset's heat palette.
+    """
+
+    def __init__(self, num_leds, preset="ember", step_ms=20):
+        self.num_leds = num_leds
+        self.cooling, self.sparking, self.palette = FIRE_PRESETS[preset]
+        self.step_ms = step_ms  # The fire burns one step of this length whatever the frame rate
+        self.heat = bytearray(num_leds)
+        self.noise = bytearray(num_leds)
+
+    def step(self):
+        num_leds = self.num_leds
+        heat = self.heat
+        noise = self.noise
+        fast_random.fill(noise)
+        cool_range = (self.cooling * 10) // num_leds + 2  # Each cell cools by 0 to cool_range - 1
+
+        # Cool every cell and let heat drift up, cell i taking from cells i - 1 and i - 2. Walking
+        # down from the top, the cooled cell just below is carried along in below_1.
+        if num_leds > 1:
+            below_1 = heat[num_leds - 2] - (noise[num_leds - 2] * cool_range >> 8)
+            if below_1 < 0:
+                below_1 = 0
+            for i in range(num_leds - 1, 1, -1):
+                below_2 = heat[i - 2] - (noise[i - 2] * cool_range >> 8)
+                if below_2 < 0:
+                    below_2 = 0
+                heat[i] = (below_1 + below_2 + below_2) // 3
+                below_1 = below_2
+            h = heat[1] - (noise[1] * cool_range >> 8)
+            heat[1] = h if h > 0 else 0
+            heat[0] = below_1
+        else:
+            h = heat[0] - (noise[0] * cool_range >> 8)
+            heat[0] = h if h > 0 else 0
+
+        if fast_random.below(255) < self.sparking:
+            y = fast_random.below(min(7, num_leds))
+            heat[y] = min(255, heat[y] + 160 + fast_random.below(95))
+
+    def render(self, canvas, context):
+        if not self.num_leds:
+            return
+        for _ in range(min(context.every(self.step_ms), 10)):
+            self.step()
+
+        heat = self.heat
+        palette = self.palette
+        pixels = canvas.pixels
+        for i in range(self.num_leds):
+            j = i * 3
+            k = heat[i] * 3
+            pixels[j] = palette[k]
+            pixels[j + 1] = palette[k + 1]
+            pixels[j + 2] = palette[k + 2]
+        canvas.mark_dirty()
 
-    start_time = time.ticks_ms()
+def effect_15(hsv_values):
+    """Simulates a fire effect."""
+    return play_frame_effect(FireEffect, 50, hsv_values)
 
-    while stacked_height < NUM_LEDS:
-        block = block_colors[randrange(len(block_colors))]
-        block_length = randrange(min_block_length, max_block_length + 1)
-        
-        print(f"Block Color: {block['name']}, Length: {block_length}")
+class LavaDripEffect:
+    """A drip of lava running from the end of the strip to the start, slowing as it goes."""
 
-        block_position = NUM_LEDS - 1
+    def __init__(self, num_leds, drip_length=5, first_step=0.021, slowdown=1.05, pause_ms=500):
+        self.num_leds = num_leds
+        self.drip_length = drip_length
+        self.first_step = first_step  # Seconds the drip takes for its first LED
+        self.slowdown = slowdown  # Each LED takes this much longer than the one before
+        self.pause_ms = pause_ms
+        self.max_brightness = 0.9
+        self.min_brightness = 0.2
+        self.hue = 0.05
+        # The steps form a geometric series, so the whole drip lasts
+        self.drip_ms = 1000 * first_step * (slowdown ** num_leds - 1) / (slowdown - 1)
+        self.drip_start = 0
+
+    def position(self, elapsed):
+        """Returns the head of the drip elapsed seconds after it started."""
+        steps = math.log(1 + elapsed * (self.slowdown - 1) / self.first_step) / math.log(self.slowdown)
+        return self.num_leds - 1 - int(steps)
+
+    def render(self, canvas, context):
+        elapsed = context.t_ms - self.drip_start
+        if elapsed >= self.drip_ms + self.pause_ms:
+            self.drip_start = context.t_ms
+            elapsed = 0
+
+        position = self.position(elapsed / 1000) if elapsed < self.drip_ms else -self.drip_length
+        for i in range(self.num_leds):
+            canvas.set_rgb(i, 0, 0, 0)
+
+        for i in range(self.drip_length):
+            pos = position - i
+            if 0 <= pos < self.num_leds:
+                brightness = self.max_brightness - ((i / self.drip_length) * (self.max_brightness - self.min_brightness))
+                r, g, b = hsv_to_rgb(self.hue, 1.0, brightness)
+                canvas.set_rgb(pos, r, g, b)
 
-        while block_position - block_length + 1 > stacked_height:
-            if block_position + 1 < NUM_LEDS:
-                for j in range(block_position - block_length + 2, block_position + 2):
-                    if 0 <= j < NUM_LEDS:
-                        led_strip.set_rgb(j, 0, 0, 0)
+def effect_16(hsv_values):
+    """Simulates a lava drip running from the end of the strip to the start, slowing as it goes."""
+    return play_frame_effect(LavaDripEffect, 50, hsv_values)
 
-            for j in range(block_position, block_position - block_length, -1):
-                if 0 <= j < NUM_LEDS:
-                    led_strip.set_rgb(j, *block["rgb"])
+def effect_17(hsv_values): return effect_7(hsv_values)
 
-            block_position -= 1
-            time.sleep(frame_delay)
+def effect_18(hsv_values): return effect_6(hsv_values)
 
-        blocks.append({"start": stacked_height, "end": stacked_height + block_length, "color": block["rgb"]})
-        stacked_height += block_length
+class NightSkyEffect:
+    """A dim blue night sky with white stars lighting up for a moment at random."""
 
-    print("Blocks stacked. Pausing for 3 seconds...")
-    time.sleep(3)
+    def __init__(self, num_leds, twinkle_chance=0.05, twinkle_steps=10, step_ms=50):
+        self.num_leds = num_leds
+        self.twinkle_chance = twinkle_chance  # Chance of a resting star twinkling every step
+        self.twinkle_steps = twinkle_steps  # Steps a twinkle lasts
+        self.step_ms = step_ms
+        self.background = hsv_to_rgb(0.66, 1.0, 0.1)  # Dim blue
+        # Position and steps left twinkling, one star for every 10 LEDs
+        self.stars = [[randrange(num_leds), 0] for _ in range(num_leds // 10)]
+
+    def render(self, canvas, context):
+        steps = min(context.every(self.step_ms), self.twinkle_steps)
+        if not steps:
+            return
+        r, g, b = self.background
+        for i in range(self.num_leds):
+            canvas.set_rgb(i, r, g, b)
+
+        for star in self.stars:
+            if not star[1] and uniform(0, 1) < self.twinkle_chance * steps:
+                star[1] = self.twinkle_steps
+            if star[1]:
+                canvas.set_hsv(star[0], 0.0, 0.0, uniform(0.5, 1.0))  # Random brightness for the twinkle
+                star[1] = max(0, star[1] - steps)
 
-    print("Dispersing blocks...")
-    hsv_values = disperse_blocks(blocks, frame_delay, hsv_values)
+def effect_19(hsv_values):
+    """Night Sky with Twinkling Stars."""
+    return play_frame_effect(NightSkyEffect, 20, hsv_values)
 
-    return hsv_values
 
-def disperse_blocks(blocks, frame_delay, hsv_values):
-    """Disperse blocks randomly after stacking."""
-    while blocks:
-        for block in blocks:
-            speed = uniform(0.02, 0.1)
-            if block["start"] > 0:
-                for j in range(block["end"] - 1, block["start"] - 1, -1):
-                    if j < NUM_LEDS:
-                        led_strip.set_rgb(j, 0, 0, 0)
-                        if j - 1 >= 0:
-                            led_strip.set_rgb(j - 1, *block["color"])
-
-                block["start"] -= 1
-                block["end"] -= 1
-            else:
-                blocks.remove(block)
 
-        time.sleep(frame_delay)
-    return hsv_values
+def effect_20(hsv_values): return effect_7(hsv_values)
 
-def effect_13(hsv_values):
-    """Simulates torrential rain with fast-moving blue raindrops on the LED strip."""
+def effect_21(hsv_values): return effect_10(hsv_values)
 
-    num_drops = 15
-    drop_color = (0, 0, 255)
-    trail_length = 3
-    frame_delay = 0.01
-    drops = []
+class PulseEffect:
+    """The whole strip in one hue, pulsing smoothly between two brightnesses.
 
-    led_state = [(0, 0, 0) for _ in range(NUM_LEDS)]
+    saturations repeat along the strip, e.g. (1.0, 0.0) alternates coloured and white LEDs.
+    """
 
-    start_time = time.ticks_ms()
+    def __init__(self, num_leds, hue=0.0, saturations=(1.0,), min_brightness=0.1, max_brightness=1.0, speed=0.02):
+        self.num_leds = num_leds
+        self.hue = hue
+        self.saturations = saturations
+        self.min_brightness = min_brightness
+        self.max_brightness = max_brightness
+        self.speed = speed  # Radians per millisecond
+
+    def render(self, canvas, context):
+        pulse = 0.5 + 0.5 * math.sin(context.t_ms * self.speed)
+        brightness = self.min_brightness + (self.max_brightness - self.min_brightness) * pulse
+        colors = [hsv_to_rgb(self.hue, saturation, brightness) for saturation in self.saturations]
+        count = len(colors)
+        for i in range(self.num_leds):
+            r, g, b = colors[i % count]
+            canvas.set_rgb(i, r, g, b)
 
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        if len(drops) < num_drops and uniform(0, 1) < 0.5:
-            start_pos = randrange(0, NUM_LEDS - 1)
-            drops.append({"position": start_pos, "speed": uniform(0.05, 0.15)})
+def effect_22(hsv_values):
+    """Enhanced Pulsating Red Glow effect."""
+    return play_frame_effect(PulseEffect, 20, hsv_values)
 
-        for i in range(NUM_LEDS):
-            led_state[i] = tuple(int(c * 0.7) for c in led_state[i])
 
-        for drop in drops:
-            drop_pos = drop["position"]
-            speed = drop["speed"]
+class BouncingLightsEffect:
+    """Single lights gliding between the ends of the strip without tails, anti-aliased between LEDs."""
 
-            for i in range(trail_length):
-                pos = int(drop_pos) - i
-                if 0 <= pos < NUM_LEDS:
-                    brightness = 1.0 - (i / trail_length)
-                    led_state[pos] = (
-                        max(led_state[pos][0], int(drop_color[0] * brightness)),
-                        max(led_state[pos][1], int(drop_color[1] * brightness)),
-                        max(led_state[pos][2], int(drop_color[2] * brightness))
-                    )
+    def __init__(self, num_leds, num_lights=5, min_speed=2.0, max_speed=6.0):
+        self.num_leds = num_leds
+        self.engine = BounceEngine(num_leds, gravity=0)
+        for _ in range(num_lights if num_leds else 0):
+            speed = uniform(min_speed, max_speed) * choice([-1, 1])  # LEDs per second
+            color = hsv_to_rgb(randrange(360) / 360.0, 1.0, 1.0)  # Different colors
+            self.engine.launch(0.0, uniform(0, num_leds - 1), speed, color)
 
-            drop["position"] += speed
+    def render(self, canvas, context):
+        if self.num_leds:
+            self.engine.render(canvas, context.t_ms / 1000)
 
-        for i in range(NUM_LEDS):
-            led_strip.set_rgb(i, *led_state[i])
+def effect_23(hsv_values):
+    """Smooth single-LED bouncing lights without tails, flickering, or strobing."""
+    return play_frame_effect(BouncingLightsEffect, 100, hsv_values)
 
-        drops = [drop for drop in drops if drop["position"] < NUM_LEDS]
+def effect_24(hsv_values):
+    """Fire burning hot in the classic heat colours."""
+    return play_frame_effect(lambda num_leds: FireEffect(num_leds, "blaze"), 50, hsv_values)
 
-        time.sleep(frame_delay)
-    return hsv_values
+def effect_25(hsv_values):
+    """Short blue gas flame."""
+    return play_frame_effect(lambda num_leds: FireEffect(num_leds, "gas"), 50, hsv_values)
 
-def effect_14(hsv_values):
-    """Creates a dynamic wave of colors flowing across the LED strip."""
+def effect_26(hsv_values):
+    """Flickering green flame."""
+    return play_frame_effect(lambda num_leds: FireEffect(num_leds, "witch"), 50, hsv_values)
 
-    wave_length = 20
-    speed = 0.1
-    wave_height = 1.0
+def effect_27(hsv_values): return effect_5(hsv_values)
 
-    start_time = time.ticks_ms()
+class PacManEffect:
+    """Pac-Man eating his way round the strip, chased by ghosts until he eats a power pill.
 
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        for t in range(360):
-            for i in range(NUM_LEDS):
-                wave_position = (i + t * speed) % wave_length
-                brightness = (1 + math.sin(wave_position * 2 * math.pi / wave_length)) / 2 * wave_height
+    What is on each LED lives in an occupancy bytearray, so collisions are single lookups and
+    a step only redraws the LEDs that changed.
+    """
 
-                hue = (t + i) % 360 / 360.0
-                led_strip.set_hsv(i, hue, 1.0, brightness)
+    DOT = 1
+    PILL = 2
+    GHOST = 4  # Added once for every ghost on the LED
+    PERSONALITIES = (
+        ("chase", 0.0),  # Heads for Pac-Man, red
+        ("ambush", 0.9),  # Heads for the LEDs in front of Pac-Man, pink
+        ("wander", 0.5),  # Moves at random, cyan
+        ("shy", 0.08),  # Chases from afar, wanders when close, orange
+    )
 
-            time.sleep(0.05)
-    return hsv_values
+    def __init__(self, num_leds, num_ghosts=None, num_pills=None, step_ms=100, power_ms=5000, death_ms=2000):
+        self.num_leds = num_leds
+        self.step_ms = step_ms  # Time per move
+        self.power_ms = power_ms  # Length of a power-up
+        self.death_ms = death_ms  # Pause before Pac-Man respawns
+        self.num_pills = num_pills or max(1, num_leds // 100)  # Laid again every lap
+        if num_ghosts is None:
+            num_ghosts = max(1, num_leds // 22)
+        num_ghosts = min(num_ghosts, 63)  # Ghost counts must fit the occupancy byte
+
+        self.occupancy = bytearray(num_leds)
+        self.ghost_at = bytearray(num_leds)  # Index + 1 of a ghost on each LED
+        self.pacman = 0
+        self.state = "playing"
+        self.state_start = 0
+        self.power_until = None
+        self.frightened = False
+        self.steps = 0
+        self.changed = []  # LEDs to redraw
+        self.redraw_all = True
+        self.colors = {
+            "pacman": hsv_to_rgb(0.15, 1.0, 1.0),  # Yellow Pac-Man
+            "dot": hsv_to_rgb(0.15, 1.0, 0.2),  # Dim yellow dots
+            "pill": (255, 255, 255),  # White pills
+            "frightened": hsv_to_rgb(0.55, 1.0, 1.0),  # Blue ghosts when chased
+        }
+        if not num_leds:
+            self.ghosts = []
+            return
+        self.new_level()
+
+        self.ghosts = []  # [position, personality, colour]
+        for k in range(num_ghosts):
+            personality, hue = self.PERSONALITIES[k % len(self.PERSONALITIES)]
+            self.ghosts.append([0, personality, hsv_to_rgb(hue, 1.0, 1.0)])
+            self.place_ghost(k, self.spawn_position())
+
+    def new_level(self):
+        """Lays dots on every LED and scatters the power pills."""
+        occupancy = self.occupancy
+        for i in range(self.num_leds):
+            occupancy[i] = (occupancy[i] & ~self.PILL) | self.DOT
+        self.dots = self.num_leds
+        for _ in range(self.num_pills):
+            occupancy[randrange(self.num_leds)] |= self.PILL
+        self.redraw_all = True
+
+    def spawn_position(self):
+        """Returns a random LED away from Pac-Man."""
+        n = self.num_leds
+        return (self.pacman + n // 4 + randrange(max(1, n // 2))) % n
+
+    def place_ghost(self, k, position):
+        self.ghosts[k][0] = position
+        self.occupancy[position] += self.GHOST
+        self.ghost_at[position] = k + 1
+        self.changed.append(position)
+
+    def remove_ghost(self, k):
+        position = self.ghosts[k][0]
+        self.occupancy[position] -= self.GHOST
+        self.changed.append(position)
+        if self.ghost_at[position] == k + 1:
+            self.ghost_at[position] = 0
+            if self.occupancy[position] >= self.GHOST:
+                for j, ghost in enumerate(self.ghosts):
+                    if j != k and ghost[0] == position:
+                        self.ghost_at[position] = j + 1
+                        break
+
+    def ghost_direction(self, ghost):
+        n = self.num_leds
+        position, personality = ghost[0], ghost[1]
+        distance = (self.pacman - position) % n
+        distance = min(distance, n - distance)
+        if personality == "wander" or (personality == "shy" and distance < 8):
+            return 1 if fast_random.next16() & 1 else -1
+        target = self.pacman + 4 if personality == "ambush" else self.pacman
+        delta = (target - position) % n
+        if delta == 0:
+            return 0
+        toward = 1 if delta <= n // 2 else -1
+        return -toward if self.frightened else toward
+
+    def set_frightened(self, frightened):
+        if frightened != self.frightened:
+            self.frightened = frightened
+            for ghost in self.ghosts:
+                self.changed.append(ghost[0])  # Ghosts change colour
+
+    def collide(self, now):
+        """Resolves Pac-Man meeting ghosts on his LED."""
+        position = self.pacman
+        if self.occupancy[position] < self.GHOST:
+            return
+        if self.frightened:
+            # Eaten ghosts respawn away from Pac-Man
+            for k, ghost in enumerate(self.ghosts):
+                if ghost[0] == position:
+                    self.remove_ghost(k)
+                    self.place_ghost(k, self.spawn_position())
+        else:
+            self.state = "dying"
+            self.state_start = now
+            self.changed.append(position)
+
+    def step(self, now):
+        """Advances the game by one move."""
+        n = self.num_leds
+        occupancy = self.occupancy
+        self.steps += 1
+        if self.state == "dying":
+            if now - self.state_start >= self.death_ms:
+                self.changed.append(self.pacman)
+                self.pacman = 0  # Respawn at the start
+                self.changed.append(0)
+                self.state = "playing"
+                for k in range(len(self.ghosts)):
+                    self.remove_ghost(k)
+                    self.place_ghost(k, self.spawn_position())
+            return
+
+        if self.power_until is not None and now >= self.power_until:
+            self.power_until = None
+            self.set_frightened(False)
+
+        self.changed.append(self.pacman)
+        self.pacman = position = (self.pacman + 1) % n
+        self.changed.append(position)
+        here = occupancy[position]
+        if here & self.DOT:
+            occupancy[position] = here & ~self.DOT
+            self.dots -= 1
+        if here & self.PILL:
+            occupancy[position] &= ~self.PILL
+            self.power_until = now + self.power_ms
+            self.set_frightened(True)
+        self.collide(now)
+        if self.state != "playing":
+            return
+
+        for k, ghost in enumerate(self.ghosts):
+            if self.steps & 3 == 0 or (self.frightened and self.steps & 1):
+                continue  # Ghosts move at 3/4 of Pac-Man's speed, half when frightened
+            direction = self.ghost_direction(ghost)
+            if direction:
+                self.remove_ghost(k)
+                self.place_ghost(k, (ghost[0] + direction) % n)
+        self.collide(now)
+
+        if not self.dots:
+            self.new_level()
+
+    def color(self, i):
+        if i == self.pacman:
+            return self.colors["pacman"] if self.state == "playing" else (0, 0, 0)  # Pac-Man disappears when dead
+        here = self.occupancy[i]
+        if here >= self.GHOST:
+            return self.colors["frightened"] if self.frightened else self.ghosts[self.ghost_at[i] - 1][2]
+        if here & self.PILL:
+            return self.colors["pill"]
+        if here & self.DOT:
+            return self.colors["dot"]
+        return (0, 0, 0)
+
+    def render(self, canvas, context):
+        if not self.num_leds:
+            return
+        for _ in range(min(context.every(self.step_ms), 5)):
+            self.step(context.t_ms)
+
+        changed = range(self.num_leds) if self.redraw_all else self.changed
+        for i in changed:
+            r, g, b = self.color(i)
+            canvas.set_rgb(i, r, g, b)
+        self.redraw_all = False
+        self.changed = []
 
-def effect_15(hsv_values):
-    """Simulates a fire effect on a GRB LED strip."""
+def effect_28(hsv_values):
+    """Pac-Man chased by ghosts round the strip."""
+    return play_frame_effect(PacManEffect, 20, hsv_values)
 
-    cooling = 55
-    sparking = 120
-    speed_delay = 0.02
-    heat = [0] * NUM_LEDS
 
-    start_time = time.ticks_ms()
+class MatrixEffect:
+    """Matrix trails of green characters falling from the end of the strip to the start.
 
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        for i in range(NUM_LEDS):
-            cooldown = randrange(0, ((cooling * 10) // NUM_LEDS) + 2)
-            heat[i] = max(0, heat[i] - cooldown)
+    Each trail is a gradient tail drawn at its fractional position, so the trails glide down at any
+    frame rate, and only the LEDs of the last frame's trails are erased.
+    """
+
+    def __init__(self, num_leds, num_trails=5, trail_length=10, fade_factor=0.75):
+        self.num_leds = num_leds
+        self.trail_length = trail_length
+        self.color = hsv_to_rgb(0.33, 1.0, fade_factor)  # Green color (0.33)
+        self.speed = 1 / min(uniform(0.05, 0.2) for _ in range(num_trails))  # LEDs per second
+        # Distance each head has fallen from the end of the strip
+        self.heads = [uniform(0, num_leds) for _ in range(num_trails)] if num_leds else []
+        self.drawn = None  # LED ranges drawn in the last frame
+
+    def render(self, canvas, context):
+        num_leds = self.num_leds
+        if not num_leds:
+            return
+        if self.drawn is None:
+            canvas.clear()
+        else:
+            for start, end in self.drawn:
+                if end > start:
+                    fill_run(canvas.pixels, start, end - start, 0, 0, 0)
+                    canvas.mark_dirty(start, end)
+        r, g, b = self.color
+        heads = self.heads
+        drawn = []
+        for k in range(len(heads)):
+            # The head re-enters at the end once its tail has fallen off the start
+            heads[k] = context.move(heads[k], self.speed) % (num_leds + self.trail_length)
+            drawn.append(draw_gradient_tail(canvas, num_leds - 1 - heads[k], self.trail_length, r, g, b, 1))
+        self.drawn = drawn
+
+def effect_29(hsv_values):
+    """Matrix effect with cascading green characters falling from bottom to top."""
+    return play_frame_effect(MatrixEffect, 20, hsv_values)
 
-        for i in range(NUM_LEDS - 1, 1, -1):
-            heat[i] = (heat[i - 1] + heat[i - 2] + heat[i - 2]) // 3
+def effect_30(hsv_values): return effect_7(hsv_values)
 
-        if randrange(255) < sparking:
-            y = randrange(0, 7)
-            heat[y] = min(255, heat[y] + randrange(160, 255))
+def effect_31(hsv_values):
+    """Waves of color moving down the strip."""
+    wave_speed = 0.1  # Speed at which the wave moves
+    wave_length = 10  # Length of the wave
 
+    def render_frame(t):
         for i in range(NUM_LEDS):
-            hue = 0.08
-            saturation = 1.0
-            brightness = heat[i] / 255.0
-            r, g, b = hsv_to_rgb(hue, saturation, brightness)
-            led_strip.set_rgb(i, int(r * 255), int(g * 255), int(b * 255))
+            hue = (i % 360) / 360.0
+            brightness = (1 + math.sin((i * 2 * math.pi / wave_length) + (t * wave_speed))) / 2
+            hsv_values[i] = (hue, 1.0, brightness)
+            framebuffer.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
 
-        time.sleep(speed_delay)
-    return hsv_values
+    # The wave animates over NUM_LEDS * 2 frames, then starts over
+    key = f"effect_31_{NUM_LEDS}_{wave_speed}_{wave_length}"
+    return play_periodic(key, NUM_LEDS * 2, render_frame, 0.05, hsv_values)
 
-def effect_16(hsv_values):
-    """Simulates a lava drip effect on a GRB LED strip, starting from the bottom and dripping upward."""
 
-    drip_length = 5
-    speed_delay = 0.02
-    acceleration = 1.05
-    max_brightness = 0.9
-    min_brightness = 0.2
-    hue = 0.05
-    saturation = 1.0
+class FlickeringFireEffect:
+    """Every LED flickering in its own fiery hue and brightness, redrawn every step."""
 
-    start_time = time.ticks_ms()
+    def __init__(self, num_leds, step_ms=50):
+        self.num_leds = num_leds
+        self.step_ms = step_ms
+
+    def render(self, canvas, context):
+        if not context.every(self.step_ms):
+            return
+        for i in range(self.num_leds):
+            hue = 0.05 + randrange(-10, 10) / 100.0
+            canvas.set_hsv(i, hue % 1.0, 1.0, randrange(50, 100) / 100.0)
+
+def effect_32(hsv_values):
+    """Fire effect with varying intensities."""
+    return play_frame_effect(FlickeringFireEffect, 20, hsv_values)
 
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        position = NUM_LEDS - 1
-        speed = speed_delay
+class RandomFlickerEffect:
+    """A fresh set of random LEDs lit in random hues every step, the rest dark."""
 
-        while position >= 0:
-            for i in range(NUM_LEDS):
-                led_strip.set_rgb(i, 0, 0, 0)
+    def __init__(self, num_leds, density=0.1, step_ms=50):
+        self.num_leds = num_leds
+        self.sparkles = SparseSampler(density)  # Fraction of the LEDs lit each step
+        self.step_ms = step_ms
 
-            for i in range(drip_length):
-                pos = position - i
-                if 0 <= pos < NUM_LEDS:
-                    brightness = max_brightness - ((i / drip_length) * (max_brightness - min_brightness))
-                    r, g, b = hsv_to_rgb(hue, saturation, brightness)
-                    led_strip.set_rgb(pos, int(r * 255), int(g * 255), int(b * 255))
+    def render(self, canvas, context):
+        if not context.every(self.step_ms):
+            return
+        canvas.clear()
+        for i in self.sparkles.indices(self.num_leds):
+            canvas.set_hsv(i, fast_random.below(360) / 360.0, 1.0, 1.0)
 
-            position -= 1
-            speed *= acceleration
-            time.sleep(speed)
+def effect_33(hsv_values):
+    """Sparkle effect with random flickers."""
+    return play_frame_effect(RandomFlickerEffect, 20, hsv_values)
 
-        time.sleep(0.5)
+def effect_34(hsv_values):
+    """Rotating color bands."""
+    band_width = 5
+    for i in range(NUM_LEDS):
+        hue = ((i // band_width) % 6) / 6.0
+        brightness = 1.0 if (i // band_width) % 2 == 0 else 0.5
+        hsv_values[i] = (hue, 1.0, brightness)
     return hsv_values
 
-def effect_17(hsv_values): return effect_7(hsv_values)
+class FallingMeteorEffect:
+    """A red meteor falling from the end of the strip to the start, its tail fading to nothing behind it."""
 
-def effect_18(hsv_values): return effect_6(hsv_values)
+    def __init__(self, num_leds, meteor_length=10, step_ms=100):
+        self.num_leds = num_leds
+        self.meteor_length = meteor_length  # Length of the meteor's tail
+        self.step_ms = step_ms  # The meteor falls one LED per step
+
+    def render(self, canvas, context):
+        num_leds = self.num_leds
+        if not num_leds or not context.every(self.step_ms):
+            return
+        meteor_length = self.meteor_length
+        position = num_leds - 1 - context.t_ms // self.step_ms % num_leds
+        for i in range(num_leds):
+            distance = (i - position) % num_leds  # The tail wraps round from the start to the end
+            brightness = 1 - (distance + 1) / meteor_length if distance < meteor_length else 0.0
+            canvas.set_hsv(i, 0.0, 1.0, brightness)
 
-def effect_19(hsv_values):
-    """Night Sky with Twinkling Stars."""
-    # Set the background to a dark blue color
-    background_hue = 0.66  # Hue for blue (240 degrees on color wheel)
-    background_saturation = 1.0
-    background_value = 0.1  # Dim blue for the night sky
-
-    star_twinkle_probability = 0.05  # Probability of a star twinkling each frame
-    twinkle_duration = 10  # Duration of each twinkle in frames
-
-    # Initialize the star states
-    stars = [{
-        "position": randrange(NUM_LEDS),
-        "hue": 0.15 if randrange(2) == 0 else 0.0,  # Randomly choose between yellow (hue 0.15) and white (hue 0.0)
-        "saturation": 0.0,  # Fully desaturated for white or slightly for yellow
-        "twinkle_counter": 0  # Counter to manage twinkle duration
-    } for _ in range(NUM_LEDS // 10)]  # Number of stars as a fraction of total LEDs
+def effect_35(hsv_values):
+    """Meteor shower with fading tails that vanish completely, moving from top to bottom."""
+    return play_frame_effect(FallingMeteorEffect, 20, hsv_values)
 
-    start_time = time.ticks_ms()
 
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        # Set the background
-        for i in range(NUM_LEDS):
-            hsv_values[i] = (background_hue, background_saturation, background_value)
+class RainbowRadiateEffect:
+    """Rainbow rings moving outwards from the first LED, fading towards the last."""
 
-        # Handle star twinkling
-        for star in stars:
-            if star["twinkle_counter"] == 0 and uniform(0, 1) < star_twinkle_probability:
-                star["twinkle_counter"] = twinkle_duration
+    def __init__(self, num_leds, speed=0.1, cycle_length=360):
+        self.num_leds = num_leds
+        self.speed = speed  # Hue cycles per second
+        self.cycle_length = cycle_length  # The length of the hue cycle
 
-            if star["twinkle_counter"] > 0:
-                brightness = uniform(0.5, 1.0)  # Random brightness for the twinkle
-                hsv_values[star["position"]] = (star["hue"], star["saturation"], brightness)
-                star["twinkle_counter"] -= 1
+    def render(self, canvas, context):
+        cycle_length = self.cycle_length
+        shift = context.t_ms / 1000 * self.speed * cycle_length
+        for distance in range(self.num_leds):
+            hue = (shift + distance * 10) % cycle_length / 360.0
+            brightness = max(0, 1 - distance / self.num_leds)
+            canvas.set_hsv(distance, hue, 1.0, brightness)
 
-        # Update the LED strip
-        for i in range(NUM_LEDS):
-            led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
+def effect_36(hsv_values):
+    """Fast animated rainbow explosion effect radiating from the center outward."""
+    return play_frame_effect(mirrored(RainbowRadiateEffect), 50, hsv_values)
 
-        time.sleep(0.05)  # Small delay for animation smoothness
+class BreathingRainbowEffect:
+    """The strip breathing in and out while a rainbow drifts along it."""
 
-    return hsv_values
+    def __init__(self, num_leds, speed=0.05):
+        self.num_leds = num_leds
+        self.speed = speed  # Breaths and hue cycles per second
 
+    def render(self, canvas, context):
+        elapsed = context.t_ms / 1000
+        brightness = (1 + math.sin(elapsed * 2 * math.pi * self.speed)) / 2
+        offset = elapsed * self.speed * 360
+        for i in range(self.num_leds):
+            canvas.set_hsv(i, (offset + i) % 360 / 360.0, 1.0, brightness)
 
+def effect_37(hsv_values):
+    """Breathing effect with color cycling."""
+    return play_frame_effect(BreathingRainbowEffect, 50, hsv_values)
 
-def effect_20(hsv_values): return effect_7(hsv_values)
 
-def effect_21(hsv_values): return effect_10(hsv_values)
+class MovingPlasmaEffect:
+    """Plasma of hues shifting along the strip under a slowly moving sine wave of brightness."""
 
-def effect_22(hsv_values):
-    """Enhanced Pulsating Red Glow effect."""
-    hue_red = 0.33  # Corrected hue for red in GRB format
-    max_brightness = 1.0
-    min_brightness = 0.1
-    pulse_speed = 0.02
-
-    start_time = time.ticks_ms()
-
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        for i in range(NUM_LEDS):
-            # Create a smooth pulsating effect
-            brightness = min_brightness + (max_brightness - min_brightness) * (0.5 + 0.5 * math.sin(time.ticks_ms() * pulse_speed))
-            hsv_values[i] = (hue_red, 1.0, brightness)
-            led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
-
-        time.sleep(0.05)  # Short delay to control the speed of the effect
-
-    return hsv_values
-
-
-def effect_23(hsv_values):
-    """Smooth single-LED bouncing lights without tails, flickering, or strobing."""
-    num_bouncing_leds = 5  # Number of bouncing LEDs
-    led_positions = [randrange(NUM_LEDS) for _ in range(num_bouncing_leds)]
-    led_speeds = [uniform(0.1, 0.3) for _ in range(num_bouncing_leds)]
-    led_directions = [choice([-1, 1]) for _ in range(num_bouncing_leds)]
-    led_hues = [randrange(360) / 360.0 for _ in range(num_bouncing_leds)]  # Different colors
-
-    start_time = time.ticks_ms()
-
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        # Reset all LEDs to the dark state (off)
-        for i in range(NUM_LEDS):
-            hsv_values[i] = (0.0, 0.0, 0.0)  # Turn off all LEDs
-
-        # Update the position and color of each bouncing LED
-        for j in range(num_bouncing_leds):
-            # Move the LED smoothly
-            led_positions[j] += led_speeds[j] * led_directions[j]
-
-            # Reverse direction if the LED hits the boundary
-            if led_positions[j] >= NUM_LEDS - 1 or led_positions[j] <= 0:
-                led_directions[j] = -led_directions[j]
-                led_positions[j] = max(0, min(NUM_LEDS - 1, led_positions[j]))  # Clamp within bounds
-
-            # Ensure LED stays at integer positions to avoid flickering
-            index = int(round(led_positions[j]))
-
-            # Set the color of the LED at the current position
-            hsv_values[index] = (led_hues[j], 1.0, 1.0)  # Brightness and saturation are both 1.0
-
-        # Apply the updated hsv_values to the LED strip
-        for i in range(NUM_LEDS):
-            led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
-
-        time.sleep(0.05)  # Delay to control the speed of the animation
-
-    return hsv_values
-
-
-
-def effect_24(hsv_values): return effect_15(hsv_values)
-
-def effect_25(hsv_values): return effect_15(hsv_values)
-
-def effect_26(hsv_values): return effect_15(hsv_values)
-
-def effect_27(hsv_values): return effect_5(hsv_values)
-
-import time
-from random import randrange, choice, uniform
-
-import time
-from random import randrange, choice, uniform
-
-def effect_28(hsv_values):
-    pacman_pos = 0
-    ghost_positions = [randrange(NUM_LEDS) for _ in range(3)]
-    pill_positions = sorted([randrange(NUM_LEDS) for _ in range(5)])
-    pacman_chasing = False
-    pacman_alive = True
-    dots = [True] * NUM_LEDS
-
-    def is_pill(pos):
-        return pos in pill_positions
-
-    def is_ghost(pos):
-        return pos in ghost_positions
-
-    def move_pacman():
-        nonlocal pacman_pos
-        pacman_pos += 1
-        if pacman_pos >= NUM_LEDS:
-            pacman_pos = 0
-
-    def move_ghosts():
-        nonlocal ghost_positions
-        for i in range(len(ghost_positions)):
-            if pacman_chasing:
-                if ghost_positions[i] > pacman_pos:
-                    ghost_positions[i] -= 1
-                elif ghost_positions[i] < pacman_pos:
-                    ghost_positions[i] += 1
-            else:
-                if randrange(2) == 0:
-                    ghost_positions[i] += 1
-                else:
-                    ghost_positions[i] -= 1
-            if ghost_positions[i] >= NUM_LEDS:
-                ghost_positions[i] = 0
-            elif ghost_positions[i] < 0:
-                ghost_positions[i] = NUM_LEDS - 1
-
-    def update_leds():
-        # Clear strip
-        for i in range(NUM_LEDS):
-            hsv_values[i] = (0.15, 1.0, 0.2 if dots[i] else 0.0)  # Dim yellow dots
-
-        # Place pills
-        for pos in pill_positions:
-            hsv_values[pos] = (0.0, 0.0, 1.0)  # White pills
-
-        # Place ghosts
-        for pos in ghost_positions:
-            if pacman_chasing:
-                hsv_values[pos] = (0.55, 1.0, 1.0)  # Blue ghosts when chased
-            else:
-                hsv_values[pos] = (uniform(0.0, 1.0), 1.0, 1.0)  # Random colored ghosts
-
-        # Place Pac-Man
-        if pacman_alive:
-            hsv_values[pacman_pos] = (0.15, 1.0, 1.0)  # Yellow Pac-Man
-        else:
-            hsv_values[pacman_pos] = (0.0, 0.0, 0.0)  # Pac-Man disappears when dead
-
-        # Update LED strip
-        for i in range(NUM_LEDS):
-            led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
-
-    def respawn_pacman():
-        nonlocal pacman_pos, pacman_alive
-        pacman_pos = 0  # Respawn at the start
-        pacman_alive = True
-
-    start_time = time.ticks_ms()
-    pill_eaten_time = 0
-
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        if pacman_alive:
-            move_pacman()
-            move_ghosts()
-
-            if is_pill(pacman_pos):
-                pacman_chasing = True
-                pill_positions.remove(pacman_pos)
-                pill_eaten_time = time.ticks_ms()
-
-            if time.ticks_diff(time.ticks_ms(), pill_eaten_time) > 5000:  # 5 seconds of power-up
-                pacman_chasing = False
-
-            if is_ghost(pacman_pos) and not pacman_chasing:
-                # Pac-Man is caught by a ghost
-                pacman_alive = False
-                print("Pac-Man died! Respawning...")
-                time.sleep(1)  # Brief pause to simulate "death"
-
-            if is_ghost(pacman_pos) and pacman_chasing:
-                ghost_positions.remove(pacman_pos)
-                ghost_positions.append(randrange(NUM_LEDS))  # Respawn ghost
-
-            dots[pacman_pos] = False
-
-        update_leds()
-        time.sleep(0.1)  # Adjust for speed of the game
-
-        if not pacman_alive:
-            time.sleep(1)  # Wait before respawn
-            respawn_pacman()
-
-    return hsv_values
-
-
-def effect_29(hsv_values):
-    """Matrix effect with cascading green characters falling from bottom to top."""
-    trail_length = 10  # Length of the trailing effect
-    fade_factor = 0.75  # Fading factor for the trails
-    num_trails = 5  # Number of cascading trails
-
-    # Initialize positions and speeds for the trails
-    positions = [randrange(NUM_LEDS) for _ in range(num_trails)]
-    speeds = [uniform(0.05, 0.2) for _ in range(num_trails)]
-    brightness_levels = [0.0] * NUM_LEDS
-
-    start_time = time.ticks_ms()  # Record the start time
-
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        # Fade all LEDs slightly
-        for i in range(NUM_LEDS):
-            hsv_values[i] = (hsv_values[i][0], hsv_values[i][1], hsv_values[i][2] * fade_factor)
-            led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
-
-        # Move and update each trail
-        for i in range(num_trails):
-            position = positions[i]
-            brightness_levels[position] = 1.0  # Set the head of the trail to full brightness
-
-            # Create the trail effect
-            for j in range(trail_length):
-                trail_pos = position + j  # Move the trail upwards
-                if trail_pos < NUM_LEDS:
-                    brightness = 1.0 - (j / trail_length)
-                    hsv_values[trail_pos] = (0.00, 1.0, brightness * fade_factor)  # Green color (0.00)
-                    led_strip.set_hsv(trail_pos, hsv_values[trail_pos][0], hsv_values[trail_pos][1], hsv_values[trail_pos][2])
-
-            positions[i] -= 1  # Move the trail position upwards
-            if positions[i] < 0:  # Reset position if it goes above the strip
-                positions[i] = NUM_LEDS - 1
-
-        time.sleep(min(speeds))  # Control the speed of the trails
-
-    return hsv_values
-
-
-
-def effect_30(hsv_values): return effect_7(hsv_values)
-
-def effect_31(hsv_values):
-    """Waves of color moving down the strip."""
-    wave_speed = 0.1  # Speed at which the wave moves
-    wave_length = 10  # Length of the wave
-
-    start_time = time.ticks_ms()  # Start time for the effect
-
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        for t in range(NUM_LEDS * 2):  # Loop to animate the wave
-            for i in range(NUM_LEDS):
-                hue = (i % 360) / 360.0
-                brightness = (1 + math.sin((i * 2 * math.pi / wave_length) + (t * wave_speed))) / 2
-                hsv_values[i] = (hue, 1.0, brightness)
-                led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
-
-            time.sleep(0.05)  # Control the speed of the animation
-
-    return hsv_values
-
-
-def effect_32(hsv_values):
-    """Fire effect with varying intensities."""
-    for i in range(NUM_LEDS):
-        hue = 0.05 + randrange(-10, 10) / 100.0
-        brightness = randrange(50, 100) / 100.0
-        hsv_values[i] = (hue, 1.0, brightness)
-    return hsv_values
-
-def effect_33(hsv_values):
-    """Sparkle effect with random flickers."""
-    for i in range(NUM_LEDS):
-        hsv_values[i] = (0.0, 0.0, 0.0)
-    for i in range(NUM_LEDS):
-        if randrange(100) < 10:
-            hue = randrange(360) / 360.0
-            hsv_values[i] = (hue, 1.0, 1.0)
-    return hsv_values
-
-def effect_34(hsv_values):
-    """Rotating color bands."""
-    band_width = 5
-    for i in range(NUM_LEDS):
-        hue = ((i // band_width) % 6) / 6.0
-        brightness = 1.0 if (i // band_width) % 2 == 0 else 0.5
-        hsv_values[i] = (hue, 1.0, brightness)
-    return hsv_values
-
-def effect_35(hsv_values):
-    """Meteor shower with fading tails that vanish completely, moving from top to bottom."""
-    meteor_length = 10  # Length of the meteor's tail
-    meteor_speed = 0.1  # Speed of the meteor movement
-    fade_rate = 0.85    # Adjusted fade rate for a smoother fade-out
-
-    start_time = time.ticks_ms()
-
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        # Fade out the existing LED strip values
-        for i in range(NUM_LEDS):
-            h, s, v = hsv_values[i]
-            hsv_values[i] = (h, s, v * fade_rate)
-            led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
-
-        # Move the meteor across the strip (from top to bottom)
-        for pos in reversed(range(NUM_LEDS)):
-            for i in range(meteor_length):
-                index = (pos + i) % NUM_LEDS  # Moving downwards (top to bottom)
-                brightness = max(0, 1 - ((i + 1) / meteor_length))  # Ensure the tail fades to zero
-                hsv_values[index] = (0.33, 1.0, brightness)  # Use 0.33 for a red hue (GRB format)
-                led_strip.set_hsv(index, hsv_values[index][0], hsv_values[index][1], hsv_values[index][2])
-
-            time.sleep(meteor_speed)  # Control the speed of the meteor
-
-    return hsv_values
-
-
-def effect_36(hsv_values):
-    """Fast animated rainbow explosion effect radiating from the center outward."""
-    center = NUM_LEDS // 2
-    speed = 0.1  # Increased speed for faster color shift
-    cycle_length = 360  # The length of the hue cycle
-
-    start_time = time.ticks_ms()  # Record the start time
-
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        elapsed = time.ticks_diff(time.ticks_ms(), start_time) / 1000  # Time in seconds
-        for i in range(NUM_LEDS):
-            # Calculate the distance from the center
-            distance = abs(center - i)
-            # Calculate the hue based on distance and elapsed time, with GRB adjustment
-            hue = (elapsed * speed * cycle_length + distance * 10) % cycle_length / 360.0
-            
-            # Adjust for GRB by setting green (hue 0.00) and red (hue 0.33) correctly
-            if hue < 0.17 or hue >= 0.83:  # Corresponds to Green region
-                adjusted_hue = 0.00
-            elif 0.17 <= hue < 0.5:  # Corresponds to Blue region
-                adjusted_hue = 0.66
-            else:  # Corresponds to Red region
-                adjusted_hue = 0.33
-
-            brightness = max(0, 1 - distance / (NUM_LEDS / 2.0))
-            hsv_values[i] = (adjusted_hue, 1.0, brightness)
-            led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
-
-        time.sleep(0.02)  # Faster animation
-
-    return hsv_values
-
-def effect_37(hsv_values):
-    """Breathing effect with color cycling."""
-    speed = 0.05  # Breathing speed
-    cycle_length = 360  # Full hue cycle length
-
-    start_time = time.ticks_ms()  # Record the start time
-
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        elapsed = time.ticks_diff(time.ticks_ms(), start_time) / 1000  # Time in seconds
-        
-        for i in range(NUM_LEDS):
-            # Calculate the hue based on elapsed time and GRB adjustment
-            hue = (elapsed * speed * cycle_length + i) % cycle_length / 360.0
-            
-            # Adjust the hue to ensure correct GRB color order
-            if hue < 0.17 or hue >= 0.83:  # Corresponds to Green region
-                adjusted_hue = 0.00
-            elif 0.17 <= hue < 0.5:  # Corresponds to Blue region
-                adjusted_hue = 0.66
-            else:  # Corresponds to Red region
-                adjusted_hue = 0.33
-
-            # Calculate brightness based on a sinusoidal breathing effect
-            brightness = (1 + math.sin(elapsed * 2 * math.pi * speed)) / 2
-
-            hsv_values[i] = (adjusted_hue, 1.0, brightness)
-            led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
-
-        time.sleep(0.02)  # Small delay for smoother breathing effect
-
-    return hsv_values
+    def __init__(self, num_leds, speed=0.1, wave_length=20):
+        self.num_leds = num_leds
+        self.speed = speed  # Radians per second the brightness wave moves
+        self.wave_length = wave_length
 
+    def render(self, canvas, context):
+        elapsed = context.t_ms / 1000
+        phase = elapsed * self.speed
+        hue_offset = elapsed * 100
+        for i in range(self.num_leds):
+            brightness = (1 + math.sin(i * 2 * math.pi / self.wave_length + phase)) / 2
+            canvas.set_hsv(i, (i * 10 + hue_offset) % 360 / 360.0, 1.0, brightness)
 
 def effect_38(hsv_values):
     """Moving plasma effect."""
-    speed = 0.1  # Adjust the speed of the plasma movement
-    wave_length = 20  # Length of the wave for sine calculation
-
-    start_time = time.ticks_ms()  # Record the start time
-
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        elapsed = time.ticks_diff(time.ticks_ms(), start_time) / 1000  # Time in seconds
-
-        for i in range(NUM_LEDS):
-            # Calculate the hue based on the position and elapsed time
-            hue = (i * 10 + elapsed * 100) % 360 / 360.0
-
-            # Adjust the hue for the correct GRB color order
-            if hue < 0.17 or hue >= 0.83:  # Corresponds to Green region
-                adjusted_hue = 0.00
-            elif 0.17 <= hue < 0.5:  # Corresponds to Blue region
-                adjusted_hue = 0.66
-            else:  # Corresponds to Red region
-                adjusted_hue = 0.33
-
-            # Calculate brightness using a sine wave for a moving plasma effect
-            brightness = (1 + math.sin(i * 2 * math.pi / wave_length + elapsed * speed)) / 2
+    return play_frame_effect(MovingPlasmaEffect, 50, hsv_values)
 
-            hsv_values[i] = (adjusted_hue, 1.0, brightness)
-            led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
 
-        time.sleep(0.02)  # Small delay for smooth animation
-
-    return hsv_values
 
+class BinaryCounterEffect:
+    """A binary counter counting up every step, each bit lighting its own group of LEDs green."""
 
+    def __init__(self, num_leds, group_size=3, step_ms=10):
+        self.num_leds = num_leds
+        self.group_size = group_size  # Each bit controls this many consecutive LEDs
+        self.step_ms = step_ms
+        self.bits = num_leds // group_size
+        self.color = hsv_to_rgb(0.33, 1.0, 1.0)  # Green
+
+    def render(self, canvas, context):
+        # Wraps once every group is lit, to keep the effect continuous
+        counter = context.t_ms // self.step_ms % (1 << self.bits)
+        group_size = self.group_size
+        on_r, on_g, on_b = self.color
+        for bit in range(self.bits):
+            r, g, b = (on_r, on_g, on_b) if counter >> bit & 1 else (0, 0, 0)
+            for i in range(bit * group_size, (bit + 1) * group_size):
+                canvas.set_rgb(i, r, g, b)
 
 def effect_39(hsv_values):
     """Binary counter effect with 3-pixel wide groups, toggling LEDs on and off."""
-    counter = 0  # Initialize the binary counter
-    group_size = 3  # Each bit controls 3 consecutive LEDs
-
-    start_time = time.ticks_ms()  # Record the start time
-
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        for i in range(NUM_LEDS // group_size):
-            # Calculate the state of the LED group based on the binary counter
-            if counter & (1 << i):
-                hue = 0.00  # Green in GRB format
-                brightness = 1.0  # LEDs on
-            else:
-                hue = 0.00  # Ensure hue is still defined
-                brightness = 0.0  # LEDs off
-
-            # Set the HSV values for each LED in the group
-            for j in range(group_size):
-                idx = i * group_size + j
-                if idx < NUM_LEDS:
-                    hsv_values[idx] = (hue, 1.0, brightness)
-                    led_strip.set_hsv(idx, hsv_values[idx][0], hsv_values[idx][1], hsv_values[idx][2])
+    return play_frame_effect(BinaryCounterEffect, 50, hsv_values)
+class BouncingBallEffect:
+    """Balls dropped from the end of the strip, bouncing until they rest at the start, then fading out."""
 
-        counter += 1  # Increment the binary counter
-        time.sleep(0.01)  # Reduced delay for faster animation
-
-        # If the counter exceeds the number of LED groups, reset it to keep the effect continuous
-        if counter >= (1 << (NUM_LEDS // group_size)):
-            counter = 0
+    def __init__(self, num_leds, num_balls=3, gravity=300.0, restitution=0.85, rest_ms=1000, fade_ms=1000,
+                 gap_ms=100, stagger_ms=1500):
+        self.num_leds = num_leds
+        self.engine = BounceEngine(num_leds, gravity, restitution)
+        self.rest = rest_ms / 1000  # Time a ball lies still before fading
+        self.fade = fade_ms / 1000
+        self.gap = gap_ms / 1000  # Dark time before the ball is dropped again
+        self.slots = [None] * (num_balls if num_leds else 0)
+        self.drop_at = [k * stagger_ms / 1000 for k in range(num_balls)]  # First drop of each ball
+
+    def render(self, canvas, context):
+        if not self.num_leds:
+            return
+        engine = self.engine
+        t = context.t_ms / 1000
+        for k in range(len(self.slots)):
+            ball = self.slots[k]
+            if ball is None or engine.resting(ball):
+                since = t - ball[0] if ball else 0.0  # Time since the ball came to rest
+                if ball is None or since >= self.rest + self.fade + self.gap:
+                    if t >= self.drop_at[k]:
+                        color = hsv_to_rgb(randrange(360) / 360.0, 1.0, 1.0)  # Random hue for each ball
+                        self.slots[k] = engine.launch(t, self.num_leds - 1, 0.0, color, ball)
+                elif since < self.rest:
+                    ball[5] = 256
+                elif since < self.rest + self.fade:
+                    ball[5] = int(256 * (1 - (since - self.rest) / self.fade))
+                else:
+                    ball[5] = 0
+        engine.render(canvas, t)
 
-    return hsv_values
-    
 def effect_40(hsv_values):
-    gravity = -0.03
-    bounce_damping = 0.85
-    fade_speed = 0.01
-    pause_duration = 1.0
-
-    start_time = time.ticks_ms()  # Record the start time
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        ball_position = NUM_LEDS - 1  # Start at the top
-        velocity = 0.0  # Initial velocity
-        hue = randrange(360) / 360.0  # Random hue for each ball
-        ball_dropping = True  # Flag to control the bouncing
-
-        while ball_dropping and time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-            # Clear the strip
-            for i in range(NUM_LEDS):
-                hsv_values[i] = (hsv_values[i][0], hsv_values[i][1], 0.0)
-
-            # Apply gravity to the velocity
-            velocity += gravity
-            ball_position += velocity
-
-            if ball_position <= 0:
-                ball_position = 0  # Clamp the position to the ground
-                velocity = -velocity * bounce_damping  # Reverse and dampen velocity
-
-                # Exit if the bounce is minimal
-                if abs(velocity) < 0.01:
-                    ball_dropping = False  # Stop the inner loop
-
-                    # Show the ball at the bottom, then fade out
-                    hsv_values[0] = (hue, 1.0, 1.0)
-                    led_strip.set_hsv(0, hsv_values[0][0], hsv_values[0][1], hsv_values[0][2])
-                    time.sleep(pause_duration)
-
-                    # Fade out the ball
-                    for brightness in [i / 100 for i in range(100, -1, -1)]:
-                        if time.ticks_diff(time.ticks_ms(), start_time) >= TIMEOUT_DURATION:
-                            break  # Respect the timeout during fading
-                        hsv_values[0] = (hue, 1.0, brightness)
-                        led_strip.set_hsv(0, hsv_values[0][0], hsv_values[0][1], hsv_values[0][2])
-                        time.sleep(fade_speed)
-
-                    break  # Exit the inner loop
-
-            # Smooth interpolation between two LEDs
-            pos_floor = int(ball_position)
-            pos_ceil = min(pos_floor + 1, NUM_LEDS - 1)
-            brightness_ceil = ball_position - pos_floor
-            brightness_floor = 1.0 - brightness_ceil
-
-            hsv_values[pos_floor] = (hue, 1.0, brightness_floor)
-            hsv_values[pos_ceil] = (hue, 1.0, brightness_ceil)
-
-            # Update the LED strip
-            for i in range(NUM_LEDS):
-                led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
-
-            # Short delay for smoother animation
-            time.sleep(0.01)
-
-        # Ensure the bottom LED is off before starting the next drop
-        hsv_values[0] = (hue, 1.0, 0.0)
-        led_strip.set_hsv(0, hsv_values[0][0], hsv_values[0][1], hsv_values[0][2])
-
-        # Brief pause before the next ball
-        time.sleep(0.1)
+    """Bouncing balls that fade out where they come to rest."""
+    return play_frame_effect(BouncingBallEffect, 100, hsv_values)
 
-    return hsv_values
+class CometPassEffect:
+    """A red comet entering past the end of the strip and leaving past its start, then a dark pause as long."""
+
+    def __init__(self, num_leds, comet_length=10, step_ms=20):
+        self.num_leds = num_leds
+        self.comet_length = comet_length  # Length of the comet's tail either side of its head
+        self.step_ms = step_ms  # The comet moves one LED per step
+        self.t = -1
+
+    def render(self, canvas, context):
+        num_leds = self.num_leds
+        comet_length = self.comet_length
+        total_length = num_leds + comet_length  # Including the space off the strip
+        t = context.t_ms // self.step_ms % (total_length * 2)
+        if t == self.t:
+            return
+        self.t = t
+
+        position = total_length + comet_length - t  # Head position, counting down towards the start
+        for i in range(num_leds):
+            distance = abs(position - i)
+            if 0 <= position < num_leds and distance < comet_length:
+                brightness = 1 - distance / comet_length
+            else:
+                brightness = 0.0  # LEDs outside the comet's range are off
+            canvas.set_hsv(i, 0.0, 1.0, brightness)
 
 def effect_41(hsv_values):
     """Rotating comet effect that appears from off the end of the LED strip and exits off the start."""
-    comet_length = 10  # Length of the comet's tail
-    speed = 0.02  # Speed of the comet
-
-    # Color values for the comet's head (initially set to red in GRB format)
-    hue = 0.33
-    saturation = 1.0
-    brightness = 1.0
-
-    total_length = NUM_LEDS + comet_length  # Total length including off-strip space
-
-    start_time = time.ticks_ms()  # Record the start time
-
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        for t in range(total_length * 2):  # Loop over the total length, including off-strip
-            for i in range(NUM_LEDS):
-                # Calculate the reversed position of the comet's head relative to the LED strip
-                position = total_length - (t - comet_length)
-
-                # Determine the distance of each LED from the comet's head
-                distance = abs(position - i)
-
-                if 0 <= position < NUM_LEDS and distance < comet_length:
-                    # Adjust the brightness based on the distance from the comet's head
-                    tail_brightness = brightness * (1 - distance / comet_length)
-                else:
-                    tail_brightness = 0.0  # LEDs outside the comet's range are off
-
-                hsv_values[i] = (hue, saturation, tail_brightness)
-                led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
+    return play_frame_effect(CometPassEffect, 50, hsv_values)
 
-            time.sleep(speed)
 
-            # Ensure the tail fades out completely at the start of the strip
-            if t == total_length * 2 - 1:
-                for i in range(NUM_LEDS):
-                    hsv_values[i] = (hue, saturation, 0.0)
-                    led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
-
-    return hsv_values
+class SpiralEffect:
+    """A spiral as long as the strip climbing it, its hues swaying from side to side at random."""
 
+    def __init__(self, num_leds, hue_shift=0.01, hue_range=0.2, turn_chance=10, step_ms=50):
+        self.num_leds = num_leds
+        self.hue_shift = hue_shift  # Hue change per LED and per step
+        self.hue_range = hue_range  # Hues stay within this part of the spectrum
+        self.turn_chance = turn_chance  # Percent chance per step of the hues turning
+        self.step_ms = step_ms
+        self.direction = 1
+        self.t = 0
+
+    def render(self, canvas, context):
+        num_leds = self.num_leds
+        steps = context.every(self.step_ms)
+        if not num_leds or not steps:
+            return
+        for _ in range(min(steps, 5)):
+            if randrange(100) < self.turn_chance:
+                self.direction = -self.direction
+
+        t = self.t
+        hue_shift = self.hue_shift
+        hue_step = t * hue_shift * self.direction
+        for i in range(num_leds):
+            position = num_leds - (t + i) % num_leds  # Head of the spiral, counting down
+            brightness = max(0, 1 - abs(position - i) / num_leds)
+            canvas.set_hsv(i, (i * hue_shift + hue_step) % self.hue_range, 1.0, brightness)
+        self.t = (t + steps) % (num_leds * 2)
 
 def effect_42(hsv_values):
-    """Spiral effect moving up the strip (from bottom to top) with a 66-LED spiral and random side-to-side hue shifts."""
-    speed = 0.05  # Speed of the spiral movement
-    spiral_length = 66  # Length of the spiral (full strip)
-    hue_shift = 0.01  # Base hue change per step
-    hue_range = 0.2  # Restrict hue to 10% of the spectrum
-
-    start_time = time.ticks_ms()
-    direction = 1  # Initial direction for hue shift
-
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        for t in range(NUM_LEDS * 2):
-            if randrange(100) < 10:  # 10% chance to change direction
-                direction = -direction
-
-            for i in range(NUM_LEDS):
-                # Calculate the position of the spiral's "head" with inversion
-                position = NUM_LEDS - (t + i) % spiral_length
-
-                # Calculate brightness based on distance from the head of the spiral
-                distance = abs(position - i)
-                brightness = max(0, 1 - distance / spiral_length)
-
-                # Apply hue shift with random side-to-side movement
-                hue = ((i * hue_shift + t * hue_shift * direction) % hue_range)
-
-                # Set the color and brightness for each LED
-                hsv_values[i] = (hue, 1.0, brightness)
-                led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
-
-            time.sleep(speed)
-
-    return hsv_values
+    """Spiral effect moving up the strip (from bottom to top) with a strip-long spiral and random side-to-side hue shifts."""
+    return play_frame_effect(SpiralEffect, 20, hsv_values)
 
 
 
@@ -1384,1004 +3121,1323 @@ def effect_44(hsv_values):
         hsv_values[i] = (hue, 1.0, brightness)
     return hsv_values
 
-def effect_45(hsv_values):
-    """Game of Life effect with white LEDs."""
-    # Initialize the game board with random states (on or off)
-    current_state = [randrange(2) for _ in range(NUM_LEDS)]
-
-    def count_neighbors(index):
-        """Count the number of alive neighbors for a given cell."""
-        left = current_state[(index - 1) % NUM_LEDS]
-        right = current_state[(index + 1) % NUM_LEDS]
-        return left + right
-
-    start_time = time.ticks_ms()
-
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        next_state = [0] * NUM_LEDS
-
-        for i in range(NUM_LEDS):
-            neighbors = count_neighbors(i)
-
-            if current_state[i] == 1:  # Cell is alive
-                if neighbors == 1:  # Survival condition
-                    next_state[i] = 1
-            else:  # Cell is dead
-                if neighbors == 1:  # Birth condition
-                    next_state[i] = 1
+class CellularAutomatonEffect:
+    """Elementary cellular automaton, cells lit white when born and tinted blue as they age."""
 
-            # Set the LED color based on the cell's state
-            brightness = 1.0 if next_state[i] == 1 else 0.0
-            hsv_values[i] = (0.0, 0.0, brightness)  # White LEDs
-            led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
+    def __init__(self, num_leds, rule=90, age_bits=3, step_ms=100):
+        self.num_leds = num_leds
+        self.step_ms = step_ms  # Time per generation
+        self.automaton = CellularAutomaton(num_leds, rule, age_bits)
+        if num_leds:
+            self.automaton.seed_random()
+        oldest = max(1, (1 << age_bits) - 2)
+        self.palette = [(0, 0, 0)] + [
+            hsv_to_rgb(0.6, 0.8 * age / oldest, 1.0 - 0.6 * age / oldest)
+            for age in range((1 << age_bits) - 1)
+        ]
+
+    def render(self, canvas, context):
+        if not self.num_leds:
+            return
+        generations = min(context.every(self.step_ms), 4)
+        if not generations:
+            return
+        for _ in range(generations):
+            self.automaton.step()
+
+        planes = self.automaton.age_bytes()
+        palette = self.palette
+        for i in range(self.num_leds):
+            byte = i >> 3
+            bit = 1 << (i & 7)
+            age = 0
+            for b in range(len(planes)):
+                if planes[b][byte] & bit:
+                    age |= 1 << b
+            r, g, b = palette[age]
+            canvas.set_rgb(i, r, g, b)
 
-        # Update the current state to the next state
-        current_state = next_state[:]
+def effect_45(hsv_values):
+    """Game of Life effect with white LEDs."""
+    # A cell lives when exactly one neighbour does, which is Wolfram rule 90
+    return play_frame_effect(CellularAutomatonEffect, 20, hsv_values)
 
-        time.sleep(0.1)  # Adjust the speed of evolution
 
-    return hsv_values
+class RainbowCometEffect:
+    """Rainbow comet with a fading tail, entering at the first LED and leaving at the last."""
 
+    def __init__(self, num_leds, comet_length=20, hue_shift=0.005, step_ms=100):
+        self.num_leds = num_leds
+        self.comet_length = comet_length  # Length of the comet tail
+        self.hue_shift = hue_shift  # How quickly the hue changes over time
+        self.step_ms = step_ms  # The comet moves one LED per step
+        self.scroll = ScrollBuffer(num_leds)
+        self.t = 0
+
+    def step(self):
+        """Scrolls the comet one LED on, entering the LED of step t at the start."""
+        t = self.t
+        if t < self.comet_length:
+            self.scroll.push_hsv(t * self.hue_shift, 1.0, 1 - t / self.comet_length)
+        else:
+            self.scroll.push(0, 0, 0)
+        self.t = (t + 1) % (self.num_leds + self.comet_length)
 
+    def render(self, canvas, context):
+        steps = min(context.every(self.step_ms), self.num_leds)
+        for _ in range(steps):
+            self.step()
+        if steps:
+            self.scroll.copy_to(canvas)
 
 def effect_46(hsv_values):
     """Rainbow comet effect moving across the strip with a fading tail."""
-    comet_length = 20  # Length of the comet tail
-    comet_speed = 0.1  # Speed of the comet's movement
-    hue_shift = 0.005  # How quickly the hue changes over time
-
-    start_time = time.ticks_ms()
+    return play_frame_effect(RainbowCometEffect, 20, hsv_values)
 
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        for t in range(NUM_LEDS + comet_length):
-            for i in range(NUM_LEDS):
-                distance = t - i
-                if 0 <= distance < comet_length:
-                    # Calculate the hue for each part of the comet
-                    hue = ((i / NUM_LEDS) + (t * hue_shift)) % 1.0
-                    brightness = max(0, 1 - (distance / comet_length))
-                    hsv_values[i] = (hue, 1.0, brightness)
-                else:
-                    # Fade out the rest of the LEDs
-                    hsv_values[i] = (0.0, 0.0, 0.0)
-                
-                # Set the LED color
-                led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
 
-            time.sleep(comet_speed)
+class RandomHueWaveEffect:
+    """A still brightness wave along the strip, its LEDs taking new random hues every step."""
 
-    return hsv_values
+    def __init__(self, num_leds, wave_length=10.0, step_ms=50):
+        self.num_leds = num_leds
+        self.levels = [(1 + math.sin(i * 2 * math.pi / wave_length)) / 2 for i in range(num_leds)]
+        self.step_ms = step_ms
 
+    def render(self, canvas, context):
+        if not context.every(self.step_ms):
+            return
+        levels = self.levels
+        for i in range(self.num_leds):
+            canvas.set_hsv(i, randrange(360) / 360.0, 1.0, levels[i])
 
 def effect_47(hsv_values):
     """Random wave effect with multiple hues."""
-    for i in range(NUM_LEDS):
-        hue = randrange(360) / 360.0
-        brightness = (1 + math.sin(i * 2 * math.pi / 10.0)) / 2
-        hsv_values[i] = (hue, 1.0, brightness)
-    return hsv_values
-
-def effect_48(hsv_values):
-    """Color pulsating wave that moves back and forth across the strip."""
-    wave_length = 20  # Length of the wave
-    wave_speed = 0.05  # Speed of the wave's movement
-    hue_shift = 0.01  # How quickly the hue changes over time
-
-    start_time = time.ticks_ms()
-
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        for t in range(NUM_LEDS * 2):
-            for i in range(NUM_LEDS):
-                distance = abs((t % NUM_LEDS) - i)
-                if distance < wave_length:
-                    # Calculate the hue and brightness for each part of the wave
-                    hue = (i * hue_shift) % 1.0
-                    brightness = (1 + math.sin(distance * math.pi / wave_length)) / 2
-                    hsv_values[i] = (hue, 1.0, brightness)
-                else:
-                    # Set LEDs outside the wave to be off
-                    hsv_values[i] = (0.0, 0.0, 0.0)
-                
-                # Set the LED color
-                led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
-
-            # Reverse the wave's direction after it reaches the end
-            if t == NUM_LEDS:
-                wave_speed = -wave_speed
+    return play_frame_effect(RandomHueWaveEffect, 20, hsv_values)
 
-            time.sleep(abs(wave_speed))
+class PulsingWaveEffect:
+    """A rainbow-tinted wave swelling and fading as it sweeps along the strip, the rest dark."""
 
-    return hsv_values
-
-def effect_49(hsv_values):
-    """Gentle rolling clouds effect with soft white and blue hues."""
-    cloud_color_1 = (0.50, 0.2, 0.7)  # Light blue cloud
-    cloud_color_2 = (0.50, 0.1, 0.9)  # Slightly brighter blue-white cloud
-    speed = 0.05  # Speed of cloud movement
-    cloud_length = 20  # Length of each cloud
-    fade_factor = 0.98  # Fading effect for trailing edges of clouds
+    def __init__(self, num_leds, wave_length=20, hue_shift=0.01, step_ms=50):
+        self.num_leds = num_leds
+        self.wave_length = wave_length  # LEDs lit either side of the wave's centre
+        self.hue_shift = hue_shift  # Hue change per LED
+        self.step_ms = step_ms  # The wave moves one LED per step
+        self.position = None
+
+    def render(self, canvas, context):
+        num_leds = self.num_leds
+        if not num_leds:
+            return
+        position = context.t_ms // self.step_ms % num_leds
+        if position == self.position:
+            return
+        self.position = position
+
+        wave_length = self.wave_length
+        for i in range(num_leds):
+            distance = abs(position - i)
+            if distance < wave_length:
+                brightness = (1 + math.sin(distance * math.pi / wave_length)) / 2
+                canvas.set_hsv(i, (i * self.hue_shift) % 1.0, 1.0, brightness)
+            else:
+                canvas.set_rgb(i, 0, 0, 0)
 
-    # Initialize cloud positions
-    cloud_positions = [randrange(NUM_LEDS) for _ in range(3)]
-    cloud_directions = [choice([-1, 1]) for _ in range(3)]
+def effect_48(hsv_values):
+    """Color pulsating wave that moves back and forth across the strip."""
+    return play_frame_effect(PulsingWaveEffect, 20, hsv_values)
 
-    start_time = time.ticks_ms()
+class CloudsEffect:
+    """Gentle rolling clouds with soft white and blue hues."""
 
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        # Fade the entire strip slightly to create a smooth trailing effect
-        for i in range(NUM_LEDS):
-            hsv_values[i] = (hsv_values[i][0], hsv_values[i][1], hsv_values[i][2] * fade_factor)
+    def __init__(self, num_leds, num_clouds=3, cloud_length=20, speed=20.0):
+        self.num_leds = num_leds
+        self.cloud_length = cloud_length  # Length of each cloud
+        self.speed = speed  # LEDs per second
+        self.cloud_color_1 = (0.50, 0.2, 0.7)  # Light blue cloud
+        self.cloud_color_2 = (0.50, 0.1, 0.9)  # Slightly brighter blue-white cloud
+        self.cloud_positions = [randrange(num_leds) for _ in range(num_clouds if num_leds else 0)]
+        self.cloud_directions = [choice([-1, 1]) for _ in range(num_clouds)]
+
+    def render(self, canvas, context):
+        num_leds = self.num_leds
+        cloud_length = self.cloud_length
+        color_1 = self.cloud_color_1
+        color_2 = self.cloud_color_2
+        positions = self.cloud_positions
+        directions = self.cloud_directions
+
+        # Fade the segment to 98% every 50 ms for a smooth trailing edge
+        pixels = canvas.pixels
+        scale = context.fade_scale(0.67)
+        for j in range(len(pixels)):
+            pixels[j] = pixels[j] * scale >> 8
+        canvas.mark_dirty()
 
         # Move and draw clouds
-        for j in range(len(cloud_positions)):
+        for j in range(len(positions)):
             for t in range(cloud_length):
-                index = (cloud_positions[j] + t * cloud_directions[j]) % NUM_LEDS
+                index = (int(positions[j]) + t * directions[j]) % num_leds
                 brightness = max(0, 1.0 - (t / cloud_length))
-                hsv_values[index] = (
-                    (cloud_color_1[0] * (1 - brightness) + cloud_color_2[0] * brightness),
-                    (cloud_color_1[1] * (1 - brightness) + cloud_color_2[1] * brightness),
-                    (cloud_color_1[2] * (1 - brightness) + cloud_color_2[2] * brightness)
+                canvas.set_hsv(
+                    index,
+                    color_1[0] * (1 - brightness) + color_2[0] * brightness,
+                    color_1[1] * (1 - brightness) + color_2[1] * brightness,
+                    color_1[2] * (1 - brightness) + color_2[2] * brightness
                 )
 
             # Update cloud position
-            cloud_positions[j] += cloud_directions[j]
-            if cloud_positions[j] >= NUM_LEDS or cloud_positions[j] < 0:
-                cloud_directions[j] = -cloud_directions[j]  # Reverse direction
-                cloud_positions[j] += cloud_directions[j] * 2
+            positions[j] = context.move(positions[j], directions[j] * self.speed)
+            if positions[j] >= num_leds or positions[j] < 0:
+                directions[j] = -directions[j]  # Reverse direction
+                positions[j] = min(max(positions[j], 0), num_leds - 1)
 
-        # Update the LED strip with the new HSV values
-        for i in range(NUM_LEDS):
-            led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
+def effect_49(hsv_values):
+    """Gentle rolling clouds effect with soft white and blue hues."""
+    return play_frame_effect(CloudsEffect, 20, hsv_values)
 
-        time.sleep(speed)  # Control the speed of the effect
+class RipplesEffect:
+    """Ripples bouncing along the strip, each drawing a trail that fades behind it.
 
-    return hsv_values
+    colors gives each ripple its (hue, saturation), cycling through the list, or a random hue each when None.
+    """
+
+    def __init__(self, num_leds, num_ripples=3, trail_length=15, fade=0.85, colors=None, hue_jitter=0.0, floor=0.0, step_ms=50):
+        self.num_leds = num_leds
+        self.trail_length = trail_length
+        self.fade = fade  # Brightness the trails keep per step
+        self.colors = colors or [(randrange(360) / 360.0, 1.0) for _ in range(num_ripples)]
+        self.hue_jitter = hue_jitter  # Ripples pick a hue this wide around their own every step
+        self.floor = floor  # Trails never fade below this brightness
+        self.step_ms = step_ms  # Ripples move one LED per step
+        self.positions = [randrange(num_leds) if num_leds else 0 for _ in range(num_ripples)]
+        self.directions = [choice([-1, 1]) for _ in range(num_ripples)]
+        self.hues = [0.0] * num_leds
+        self.saturations = [0.0] * num_leds
+        self.levels = [0.0] * num_leds
+
+    def step(self):
+        num_leds = self.num_leds
+        levels = self.levels
+        fade = self.fade
+        floor = self.floor
+        for i in range(num_leds):
+            levels[i] = max(levels[i] * fade, floor)
+
+        trail_length = self.trail_length
+        colors = self.colors
+        jitter = self.hue_jitter
+        for r in range(len(self.positions)):
+            hue, saturation = colors[r % len(colors)]
+            if jitter:
+                hue = (hue + uniform(-jitter / 2, jitter / 2)) % 1.0
+            position = self.positions[r]
+            direction = self.directions[r]
+            for t in range(trail_length):
+                index = (position + t * direction) % num_leds
+                self.hues[index] = hue
+                self.saturations[index] = saturation
+                levels[index] = max(0, 1.0 - t / trail_length)
+
+            position += direction
+            if position >= num_leds or position < 0:
+                direction = -direction  # Bounce off the ends
+                position += direction * 2
+            self.positions[r] = position
+            self.directions[r] = direction
+
+    def render(self, canvas, context):
+        steps = context.every(self.step_ms)
+        if not self.num_leds or not steps:
+            return
+        for _ in range(min(steps, 5)):
+            self.step()
+        hues = self.hues
+        saturations = self.saturations
+        levels = self.levels
+        for i in range(self.num_leds):
+            canvas.set_hsv(i, hues[i], saturations[i], levels[i])
 
 def effect_50(hsv_values):
     """Glowing Pulsar effect with bright pulses moving along the strip."""
-    num_pulsars = 3  # Number of pulsars
-    pulsar_length = 10  # Length of each pulsar trail
-    fade_factor = 0.85  # Fading factor for the pulsar trails
-    speed = 0.05  # Speed of the pulsars' movement
-
-    # Initialize pulsar positions, directions, and hues
-    pulsar_positions = [randrange(NUM_LEDS) for _ in range(num_pulsars)]
-    pulsar_directions = [choice([-1, 1]) for _ in range(num_pulsars)]
-    pulsar_hues = [randrange(360) / 360.0 for _ in range(num_pulsars)]
+    return play_frame_effect(lambda num_leds: RipplesEffect(num_leds, 3, 10), 20, hsv_values)
 
-    start_time = time.ticks_ms()
-
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        # Fade the entire strip slightly to create trailing effects
-        for i in range(NUM_LEDS):
-            hsv_values[i] = (hsv_values[i][0], hsv_values[i][1], hsv_values[i][2] * fade_factor)
-
-        # Move and draw pulsars
-        for j in range(num_pulsars):
-            for t in range(pulsar_length):
-                index = (pulsar_positions[j] + t * pulsar_directions[j]) % NUM_LEDS
-                brightness = max(0, 1.0 - (t / pulsar_length))
-                hsv_values[index] = (
-                    pulsar_hues[j],
-                    1.0,
-                    brightness
-                )
-
-            # Update pulsar position
-            pulsar_positions[j] += pulsar_directions[j]
-            if pulsar_positions[j] >= NUM_LEDS or pulsar_positions[j] < 0:
-                pulsar_directions[j] = -pulsar_directions[j]  # Reverse direction
-                pulsar_positions[j] += pulsar_directions[j] * 2
-
-        # Update the LED strip with the new HSV values
-        for i in range(NUM_LEDS):
-            led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
 
-        time.sleep(speed)  # Control the speed of the effect
-
-    return hsv_values
+class NorthernLightsEffect:
+    """Waves of muted colour flowing along the strip, their palette drifting slowly round the hue wheel."""
 
+    def __init__(self, num_leds, wave_speed=1.0, hue_drift=0.02, wave_amplitude=0.5, base_hue=0.5, saturation=0.6):
+        self.num_leds = num_leds
+        self.wave_speed = wave_speed  # Radians per second
+        self.hue_drift = hue_drift  # Hue change of the palette per second
+        self.wave_amplitude = wave_amplitude  # How far the hue swings either side of the palette's
+        self.base_hue = base_hue  # Starting hue (around cyan/purple)
+        self.saturation = saturation  # Gentle saturation for a muted palette
+
+    def render(self, canvas, context):
+        num_leds = self.num_leds
+        elapsed = context.t_ms / 1000
+        time_offset = elapsed * self.wave_speed
+        base_hue = self.base_hue + elapsed * self.hue_drift
+        for i in range(num_leds):
+            wave = math.sin(i * 2 * math.pi / num_leds + time_offset)
+            canvas.set_hsv(i, (base_hue + wave * self.wave_amplitude) % 1.0, self.saturation, (1 + wave) / 2)
 
 def effect_51(hsv_values):
     """Northern Lights effect with flowing waves of green, blue, and purple hues."""
-    wave_speed = 0.001  # Speed at which the waves move
-    hue_shift_speed = 0.001  # Speed of hue shift over time
-    wave_amplitude = 0.5  # Amplitude of the sine wave
-    base_hue = 0.5  # Starting hue (around cyan/purple)
+    return play_frame_effect(NorthernLightsEffect, 20, hsv_values)
 
-    start_time = time.ticks_ms()
+class FlashBurstEffect:
+    """A burst lighting up round a random LED every step, fading out towards its edge.
 
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        for i in range(NUM_LEDS):
-            # Calculate the hue based on position and time
-            position_offset = (i / NUM_LEDS) * math.pi * 2
-            time_offset = time.ticks_diff(time.ticks_ms(), start_time) * wave_speed
-            hue_variation = math.sin(position_offset + time_offset) * wave_amplitude
-            hue = (base_hue + hue_variation) % 1.0
-            
-            # Set brightness based on the sine wave for a wavy effect
-            brightness = (1 + math.sin(position_offset + time_offset)) / 2
-            
-            # Apply a gentle saturation for a more muted color palette
-            saturation = 0.6
-
-            hsv_values[i] = (hue, saturation, brightness)
-            led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
-
-        # Gradually shift the base hue to create a slowly changing color palette
-        base_hue = (base_hue + hue_shift_speed) % 1.0
-
-        time.sleep(0.05)
+    With confetti every LED of the burst takes a random hue over what was there, otherwise the
+    burst is a single hue on a dark strip.
+    """
 
-    return hsv_values
+    def __init__(self, num_leds, radius=10, confetti=True, step_ms=100):
+        self.num_leds = num_leds
+        self.radius = radius
+        self.confetti = confetti
+        self.step_ms = step_ms
+
+    def render(self, canvas, context):
+        num_leds = self.num_leds
+        if not num_leds or not context.every(self.step_ms):
+            return
+        center = randrange(num_leds)
+        radius = self.radius
+        confetti = self.confetti
+        if not confetti:
+            canvas.clear()
+            hue = randrange(360) / 360.0
+        for i in range(max(0, center - radius + 1), min(num_leds, center + radius)):
+            if confetti:
+                hue = randrange(360) / 360.0
+            canvas.set_hsv(i, hue, 1.0, 1 - abs(center - i) / radius)
 
 def effect_52(hsv_values):
     """Fireworks Burst"""
-    start_time = time.ticks_ms()
+    return play_frame_effect(FlashBurstEffect, 20, hsv_values)
 
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        for t in range(50):
-            center = randrange(NUM_LEDS)
-            for i in range(NUM_LEDS):
-                distance = abs(center - i)
-                hue = randrange(360) / 360.0
-                brightness = max(0, 1 - distance / 10)
-                if brightness > 0:
-                    hsv_values[i] = (hue, 1.0, brightness)
-                led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
-            time.sleep(0.1)
-    return hsv_values
+class ExplosionEffect:
+    """A front of random colours racing outwards from the first LED, leaving its colours behind."""
+
+    def __init__(self, num_leds, step_ms=50):
+        self.num_leds = num_leds
+        self.step_ms = step_ms  # The front moves one LED per step
+
+    def render(self, canvas, context):
+        if not self.num_leds:
+            return
+        t = context.t_ms // self.step_ms % self.num_leds
+        for distance in range(self.num_leds):
+            brightness = 1 - (distance - t) / 10
+            if brightness > 0:
+                canvas.set_hsv(distance, randrange(360) / 360.0, 1.0, brightness)
 
 def effect_53(hsv_values):
     """Explosion"""
-    start_time = time.ticks_ms()
-
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        for t in range(NUM_LEDS // 2):
-            center = NUM_LEDS // 2
-            for i in range(NUM_LEDS):
-                distance = abs(center - i)
-                hue = randrange(360) / 360.0
-                brightness = max(0, 1 - (distance - t) / 10)
-                if brightness > 0:
-                    hsv_values[i] = (hue, 1.0, brightness)
-                led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
-            time.sleep(0.05)
-    return hsv_values
+    return play_frame_effect(mirrored(ExplosionEffect), 20, hsv_values)
 
 def effect_54(hsv_values):
     """Larson Scanner (Knight Rider)"""
-    start_time = time.ticks_ms()
+    return play_frame_effect(lambda num_leds: LarsonScannerEffect(num_leds, hue=0.0), 20, hsv_values)
 
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        for t in range(NUM_LEDS * 2):
-            position = t % NUM_LEDS if t < NUM_LEDS else NUM_LEDS - (t % NUM_LEDS) - 1
-            for i in range(NUM_LEDS):
-                brightness = max(0, 1 - abs(i - position) / 10)
-                hsv_values[i] = (0.0, 1.0, brightness)
-                led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
-            time.sleep(0.05)
-    return hsv_values
+class StreakEffect:
+    """A streak running from the start of the strip to the end, over and over.
+
+    With a hue the streak is that colour, otherwise it shows a rainbow painted along the strip. A tapered
+    streak fades out over its length either side of its head, an untapered one is lit evenly.
+    """
+
+    def __init__(self, num_leds, length=10, hue=None, tapered=True, step_ms=50):
+        self.num_leds = num_leds
+        self.length = length
+        self.hue = hue
+        self.tapered = tapered
+        self.step_ms = step_ms  # The streak moves one LED per step
+        self.position = None
+
+    def render(self, canvas, context):
+        num_leds = self.num_leds
+        if not num_leds:
+            return
+        position = context.t_ms // self.step_ms % num_leds
+        if position == self.position:
+            return
+        self.position = position
+
+        length = self.length
+        hue = self.hue
+        tapered = self.tapered
+        for i in range(num_leds):
+            distance = abs(i - position)
+            if tapered:
+                brightness = max(0, 1 - distance / length)
+            else:
+                brightness = 1.0 if distance < length else 0.0
+            canvas.set_hsv(i, (i * 10) % 360 / 360.0 if hue is None else hue, 1.0, brightness)
 
 def effect_55(hsv_values):
     """Comet Trail"""
-    start_time = time.ticks_ms()
+    return play_frame_effect(lambda num_leds: StreakEffect(num_leds, hue=0.5), 20, hsv_values)
 
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        for t in range(NUM_LEDS):
-            for i in range(NUM_LEDS):
-                distance = abs(t - i)
-                hue = 0.5
-                brightness = max(0, 1 - distance / 10)
-                hsv_values[i] = (hue, 1.0, brightness)
-                led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
-            time.sleep(0.05)
-    return hsv_values
+class ExpandingBurstsEffect:
+    """Bursts of colour spreading out from random LEDs and dimming as they grow, leaving fading trails."""
+
+    def __init__(self, num_leds, num_bursts=5, burst_steps=20, fade=0.9, step_ms=50):
+        self.num_leds = num_leds
+        self.burst_steps = burst_steps  # Steps a burst grows for before starting over elsewhere
+        self.fade = fade  # Brightness the trails keep per step
+        self.step_ms = step_ms
+        # Position, hue and age in steps of each burst
+        self.bursts = [[randrange(num_leds) if num_leds else 0, randrange(360) / 360.0, randrange(burst_steps)]
+                       for _ in range(num_bursts)]
+
+    def render(self, canvas, context):
+        num_leds = self.num_leds
+        steps = context.every(self.step_ms)
+        if not num_leds or not steps:
+            return
+        pixels = canvas.pixels
+        scale = int(256 * self.fade ** min(steps, self.burst_steps))
+        for j in range(len(pixels)):
+            pixels[j] = pixels[j] * scale >> 8
+        canvas.mark_dirty()
+
+        burst_steps = self.burst_steps
+        for burst in self.bursts:
+            position, hue, age = burst
+            brightness = (burst_steps - age) / burst_steps
+            for i in range(-age, age + 1):
+                canvas.set_hsv((position + i) % num_leds, hue, 1.0, brightness)
+
+            burst[2] = age + steps
+            if burst[2] >= burst_steps:
+                burst[0] = randrange(num_leds)
+                burst[1] = randrange(360) / 360.0
+                burst[2] = 0
 
 def effect_56(hsv_values):
     """Colorful Fireworks Burst effect with expanding colorful bursts."""
-    num_fireworks = 5  # Number of fireworks bursts
-    burst_duration = 20  # Duration of each burst
-    fade_factor = 0.9  # Fading factor for the trails
-
-    # Initialize bursts with random positions and hues
-    bursts = [
-        {
-            "position": randrange(NUM_LEDS),
-            "hue": randrange(360) / 360.0,
-            "timer": randrange(burst_duration),
-            "speed": uniform(0.05, 0.15)
-        }
-        for _ in range(num_fireworks)
-    ]
-
-    start_time = time.ticks_ms()
-
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        # Fade the entire strip slightly to create trailing effects
-        for i in range(NUM_LEDS):
-            hsv_values[i] = (hsv_values[i][0], hsv_values[i][1], hsv_values[i][2] * fade_factor)
-
-        # Update and draw each firework burst
-        for burst in bursts:
-            burst_position = burst["position"]
-            burst_hue = burst["hue"]
-            burst_timer = burst["timer"]
-            brightness = max(0, (burst_duration - burst_timer) / burst_duration)
-
-            # Draw expanding burst
-            for i in range(-burst_timer, burst_timer + 1):
-                index = (burst_position + i) % NUM_LEDS
-                if 0 <= index < NUM_LEDS:
-                    hsv_values[index] = (burst_hue, 1.0, brightness)
-
-            burst["timer"] += 1
-
-            # Reset burst if it has completed its duration
-            if burst["timer"] >= burst_duration:
-                burst["position"] = randrange(NUM_LEDS)
-                burst["hue"] = randrange(360) / 360.0
-                burst["timer"] = 0
-
-        # Update the LED strip with the new HSV values
-        for i in range(NUM_LEDS):
-            led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
+    return play_frame_effect(ExpandingBurstsEffect, 20, hsv_values)
 
-        time.sleep(0.05)  # Control the speed of the effect
 
-    return hsv_values
+class LarsonScannerEffect:
+    """Larson scanner sweeping to the end of the LEDs and back, cycling through the hues unless given one."""
 
+    def __init__(self, num_leds, step_ms=50, hue=None):
+        self.num_leds = num_leds
+        self.step_ms = step_ms  # The eye moves one LED per step
+        self.hue = hue  # Fixed hue of the eye, otherwise it cycles as it sweeps
+
+    def draw(self, canvas, t):
+        """Draws step t of the sweep, which repeats every 2 * num_leds steps."""
+        num_leds = self.num_leds
+        position = t % num_leds if t < num_leds else num_leds - (t % num_leds) - 1
+        hue = t % 360 / 360.0 if self.hue is None else self.hue
+        for i in range(num_leds):
+            brightness = max(0, 1 - abs(i - position) / 10)
+            canvas.set_hsv(i, hue, 1.0, brightness)
+
+    def render(self, canvas, context):
+        if self.num_leds:
+            self.draw(canvas, context.t_ms // self.step_ms % (self.num_leds * 2))
 
 def effect_57(hsv_values):
     """Colorful Larson Scanner"""
-    start_time = time.ticks_ms()
-
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        for t in range(NUM_LEDS * 2):
-            position = t % NUM_LEDS if t < NUM_LEDS else NUM_LEDS - (t % NUM_LEDS) - 1
-            hue = t % 360 / 360.0
-            for i in range(NUM_LEDS):
-                brightness = max(0, 1 - abs(i - position) / 10)
-                hsv_values[i] = (hue, 1.0, brightness)
-                led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
-            time.sleep(0.05)
-    return hsv_values
+    scanner = LarsonScannerEffect(NUM_LEDS)
+    return play_periodic(f"effect_57_{NUM_LEDS}", NUM_LEDS * 2, lambda t: scanner.draw(framebuffer, t), 0.05, hsv_values)
 
 def effect_58(hsv_values):
     """Rapid Fireworks"""
-    start_time = time.ticks_ms()
+    return play_frame_effect(lambda num_leds: FlashBurstEffect(num_leds, 5, False, 50), 20, hsv_values)
 
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        for t in range(20):
-            burst_center = randrange(NUM_LEDS)
-            hue = randrange(360) / 360.0
-            for i in range(NUM_LEDS):
-                distance = abs(burst_center - i)
-                brightness = max(0, 1 - distance / 5)
-                hsv_values[i] = (hue, 1.0, brightness)
-                led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
-            time.sleep(0.05)
-    return hsv_values
+class RandomDotsEffect:
+    """Lights one random LED in a random hue every step, leaving the rest as they were.
+
+    level(step, num_leds) gives the brightness of the dot lit at each step.
+    """
+
+    def __init__(self, num_leds, level, step_ms=50):
+        self.num_leds = num_leds
+        self.level = level
+        self.step_ms = step_ms
+        self.steps = 0
+
+    def render(self, canvas, context):
+        num_leds = self.num_leds
+        if not num_leds:
+            return
+        for _ in range(min(context.every(self.step_ms), 5)):
+            canvas.set_hsv(randrange(num_leds), randrange(360) / 360.0, 1.0, self.level(self.steps, num_leds))
+            self.steps += 1
 
 def effect_59(hsv_values):
     """Starry Night"""
-    start_time = time.ticks_ms()
-
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        for _ in range(100):
-            index = randrange(NUM_LEDS)
-            hue = randrange(360) / 360.0
-            brightness = uniform(0.5, 1.0)
-            hsv_values[index] = (hue, 1.0, brightness)
-            led_strip.set_hsv(index, hsv_values[index][0], hsv_values[index][1], hsv_values[index][2])
-            time.sleep(0.1)
-    return hsv_values
+    return play_frame_effect(lambda num_leds: RandomDotsEffect(num_leds, lambda step, n: uniform(0.5, 1.0), 100), 20, hsv_values)
 
 def effect_60(hsv_values):
     """Meteor Shower"""
-    start_time = time.ticks_ms()
+    def render_frame(t):
+        for i in range(NUM_LEDS):
+            hue = 0.6
+            brightness = max(0, 1 - abs(t - i) / 10)
+            hsv_values[i] = (hue, 1.0, brightness)
+            framebuffer.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
 
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        for t in range(NUM_LEDS):
-            for i in range(NUM_LEDS):
-                hue = 0.6
-                brightness = max(0, 1 - abs(t - i) / 10)
-                hsv_values[i] = (hue, 1.0, brightness)
-                led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
-            time.sleep(0.05)
-    return hsv_values
+    return play_periodic(f"effect_60_{NUM_LEDS}", NUM_LEDS, render_frame, 0.05, hsv_values)
 
 def effect_61(hsv_values):
     """Random Sparkles"""
-    start_time = time.ticks_ms()
-
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        for _ in range(NUM_LEDS // 10):
-            index = randrange(NUM_LEDS)
-            hue = randrange(360) / 360.0
-            brightness = 1.0
-            hsv_values[index] = (hue, 1.0, brightness)
-            led_strip.set_hsv(index, hsv_values[index][0], hsv_values[index][1], hsv_values[index][2])
-            time.sleep(0.05)
-    return hsv_values
+    return play_frame_effect(lambda num_leds: RandomDotsEffect(num_leds, lambda step, n: 1.0), 20, hsv_values)
 
 def effect_62(hsv_values):
     """Fireflies"""
-    start_time = time.ticks_ms()
-
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        for t in range(NUM_LEDS):
-            index = randrange(NUM_LEDS)
-            hue = randrange(360) / 360.0
-            brightness = (1 + math.sin(t * 2 * math.pi / NUM_LEDS)) / 2
-            hsv_values[index] = (hue, 1.0, brightness)
-            led_strip.set_hsv(index, hsv_values[index][0], hsv_values[index][1], hsv_values[index][2])
-            time.sleep(0.05)
-    return hsv_values
+    # The fireflies brighten and dim over a cycle as many steps long as the strip
+    level = lambda step, n: (1 + math.sin(step % n * 2 * math.pi / n)) / 2
+    return play_frame_effect(lambda num_leds: RandomDotsEffect(num_leds, level), 20, hsv_values)
 
 def effect_63(hsv_values):
     """Pulsating Red and White effect with smooth transitions and breathing brightness."""
-    pulse_speed = 0.05  # Speed of the pulsing effect
-    move_speed = 0.1    # Speed at which the colors move across the strip
-
-    start_time = time.ticks_ms()
-
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        for t in range(NUM_LEDS):
-            # Alternate between red and white based on position
-            if t % 2 == 0:
-                hue = 0.33  # Red
-            else:
-                hue = 0.0  # White with lower saturation
-
-            # Pulsating brightness
-            brightness = (1 + math.sin(time.ticks_ms() * pulse_speed / 1000)) / 2
-
-            # Set HSV values, with saturation adjusted for white
-            if hue == 0.0 and t % 2 != 0:
-                hsv_values[t] = (hue, 0.0, brightness)  # White
-            else:
-                hsv_values[t] = (hue, 1.0, brightness)  # Red
-
-        # Update the LED strip with the new HSV values
-        for i in range(NUM_LEDS):
-            led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
-
-        time.sleep(0.02)  # Control the speed of the effect
-
-    return hsv_values
+    return play_frame_effect(lambda num_leds: PulseEffect(num_leds, 0.0, (1.0, 0.0), 0.0, 1.0, 0.00005), 50, hsv_values)
 
 
 def effect_64(hsv_values):
     """Colorful Snake"""
-    snake_length = 10
-    start_time = time.ticks_ms()
-
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        for t in range(NUM_LEDS * 2):
-            for i in range(NUM_LEDS):
-                hue = (i * 10) % 360 / 360.0
-                brightness = 1.0 if abs(i - t % NUM_LEDS) < snake_length else 0.0
-                hsv_values[i] = (hue, 1.0, brightness)
-                led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
-            time.sleep(0.05)
-    return hsv_values
+    return play_frame_effect(lambda num_leds: StreakEffect(num_leds, tapered=False), 20, hsv_values)
 
 def effect_65(hsv_values):
     """Comet Streak"""
-    comet_length = 15
-    start_time = time.ticks_ms()
-
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        for t in range(NUM_LEDS * 2):
-            for i in range(NUM_LEDS):
-                hue = (i * 10) % 360 / 360.0
-                brightness = max(0, 1 - abs(t % NUM_LEDS - i) / comet_length)
-                hsv_values[i] = (hue, 1.0, brightness)
-                led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
-            time.sleep(0.05)
-    return hsv_values
+    return play_frame_effect(lambda num_leds: StreakEffect(num_leds, 15), 20, hsv_values)
 
 def effect_66(hsv_values):
     """Twinkling Stars"""
-    start_time = time.ticks_ms()
+    # Every other step switches a random LED off instead
+    return play_frame_effect(lambda num_leds: RandomDotsEffect(num_leds, lambda step, n: 1.0 if step % 2 == 0 else 0.0), 20, hsv_values)
 
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        for t in range(NUM_LEDS):
-            index = randrange(NUM_LEDS)
-            hue = randrange(360) / 360.0
-            brightness = 1.0 if t % 2 == 0 else 0.0
-            hsv_values[index] = (hue, 1.0, brightness)
-            led_strip.set_hsv(index, hsv_values[index][0], hsv_values[index][1], hsv_values[index][2])
-            time.sleep(0.05)
-    return hsv_values
+class ThunderstormEffect:
+    """White lightning flickering on a random tenth of the LEDs every frame."""
+
+    def __init__(self, num_leds, flash_chance=0.1):
+        self.num_leds = num_leds
+        self.flashes = SparseSampler(flash_chance)
+        self.lit = None  # LEDs lit in the previous frame
+
+    def render(self, canvas, context):
+        if self.lit is None:
+            canvas.clear()
+        else:
+            for i in self.lit:
+                canvas.set_rgb(i, 0, 0, 0)
+        self.lit = list(self.flashes.indices(self.num_leds))
+        for i in self.lit:
+            canvas.set_rgb(i, 255, 255, 255)
 
 def effect_67(hsv_values):
     """Thunderstorm"""
-    start_time = time.ticks_ms()
+    return play_frame_effect(ThunderstormEffect, 20, hsv_values)
 
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        for t in range(NUM_LEDS):
-            brightness = 1.0 if randrange(100) < 10 else 0.0
-            hsv_values[t] = (0.0, 0.0, brightness)
-            led_strip.set_hsv(t, hsv_values[t][0], hsv_values[t][1], hsv_values[t][2])
-        time.sleep(0.05)
-    return hsv_values
+class CandleFlickerEffect:
+    """Every LED flickering at its own random brightness in a warm candle colour."""
+
+    def __init__(self, num_leds, hue=0.1, step_ms=50):
+        self.num_leds = num_leds
+        self.hue = hue
+        self.step_ms = step_ms
+
+    def render(self, canvas, context):
+        if not context.every(self.step_ms):
+            return
+        hue = self.hue
+        for i in range(self.num_leds):
+            canvas.set_hsv(i, hue, 1.0, uniform(0.7, 1.0))
 
 def effect_68(hsv_values):
     """Flickering Candle"""
-    start_time = time.ticks_ms()
+    return play_frame_effect(CandleFlickerEffect, 20, hsv_values)
 
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        for t in range(NUM_LEDS):
-            hue = 0.1
-            brightness = uniform(0.7, 1.0)
-            hsv_values[t] = (hue, 1.0, brightness)
-            led_strip.set_hsv(t, hsv_values[t][0], hsv_values[t][1], hsv_values[t][2])
-        time.sleep(0.05)
-    return hsv_values
+class SparklingWaterfallEffect:
+    """A slowly flowing blue wave with white sparkles flashing up on it."""
+
+    def __init__(self, num_leds, waterfall_speed=0.05, sparkle_rate=5.0, fade=0.9):
+        self.num_leds = num_leds
+        self.waterfall_speed = waterfall_speed  # Radians per second
+        self.sparkle_rate = sparkle_rate  # Sparkles per LED per second
+        self.fade = fade  # Dims the water under the sparkles
+        self.sparkles = SparseSampler(0)
+
+    def render(self, canvas, context):
+        num_leds = self.num_leds
+        phase = context.t_ms / 1000 * self.waterfall_speed
+        level = self.fade * self.fade
+        sparkles = self.sparkles
+        sparkles.set_probability(context.chance(self.sparkle_rate))
+        hits = sparkles.indices(num_leds)
+        next_sparkle = next(hits, num_leds)
+        for i in range(num_leds):
+            if i == next_sparkle:
+                canvas.set_hsv(i, 0.0, 0.0, 1.0)  # White sparkle
+                next_sparkle = next(hits, num_leds)
+            else:
+                brightness = (1 + math.sin(i * 2 * math.pi / 10.0 + phase)) / 2
+                canvas.set_hsv(i, 0.6, 1.0, brightness * level)
 
 def effect_69(hsv_values):
     """Sparkling Waterfall effect with dynamic blue hues and white sparkles."""
-    waterfall_speed = 0.05  # Speed of the waterfall movement
-    sparkle_chance = 0.1    # Probability of a sparkle occurring
-    fade_factor = 0.9       # How quickly the sparkles fade
-
-    start_time = time.ticks_ms()
-
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        for i in range(NUM_LEDS):
-            # Generate a blue hue with slight variations to simulate water
-            hue = 0.6  # Blue
-            brightness = (1 + math.sin(i * 2 * math.pi / 10.0 + time.ticks_ms() * waterfall_speed / 1000)) / 2
-            
-            # Apply the blue hue to the waterfall
-            hsv_values[i] = (hue, 1.0, brightness * fade_factor)
-
-            # Occasionally add a white sparkle
-            if uniform(0, 1) < sparkle_chance:
-                hsv_values[i] = (0.0, 0.0, 1.0)  # White sparkle
-
-            # Gradually fade the sparkles
-            else:
-                hsv_values[i] = (hsv_values[i][0], hsv_values[i][1], hsv_values[i][2] * fade_factor)
+    return play_frame_effect(SparklingWaterfallEffect, 50, hsv_values)
 
-        # Update the LED strip with the new HSV values
-        for j in range(NUM_LEDS):
-            led_strip.set_hsv(j, hsv_values[j][0], hsv_values[j][1], hsv_values[j][2])
 
-        time.sleep(0.02)  # Control the speed of the effect
+class ScrollingBarsEffect:
+    """Red and white bars scrolling towards the start of the strip."""
 
-    return hsv_values
+    def __init__(self, num_leds, bar_length=10, step_ms=50):
+        self.bar_length = bar_length  # Length of each colored bar
+        self.step_ms = step_ms  # The bars move one LED per step
+        self.num_leds = num_leds
+        self.scroll = ScrollBuffer(num_leds, towards_end=False)
+        self.position = 0  # Position in the bar pattern of the next LED to enter
+        for _ in range(num_leds):
+            self.step()
+
+    def step(self):
+        if self.position < self.bar_length:
+            self.scroll.push(255, 0, 0)  # Red bar
+        else:
+            self.scroll.push(255, 255, 255)  # White bar
+        self.position = (self.position + 1) % (2 * self.bar_length)
 
+    def render(self, canvas, context):
+        steps = min(context.every(self.step_ms), self.num_leds)
+        for _ in range(steps):
+            self.step()
+        if steps:
+            self.scroll.copy_to(canvas)
 
 def effect_70(hsv_values):
     """Scrolling Red and White Bars effect."""
-    BAR_LENGTH = 10  # Length of each colored bar
-    SCROLL_SPEED = 0.05  # Speed of the scrolling
-
-    # Colors (hue values in GRB format)
-    RED_HUE = 0.33  # Red
-    WHITE_HUE = 0.0  # White (hue = 0, saturation = 0)
-
-    start_time = time.ticks_ms()
+    return play_frame_effect(ScrollingBarsEffect, 20, hsv_values)
 
-    offset = 0  # Initialize offset for scrolling
-
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        for i in range(NUM_LEDS):
-            # Calculate the position with offset
-            position = (i + offset) % (2 * BAR_LENGTH)
-            if position < BAR_LENGTH:
-                hsv_values[i] = (RED_HUE, 1.0, 1.0)  # Red bar
-            else:
-                hsv_values[i] = (WHITE_HUE, 0.0, 1.0)  # White bar
 
-        # Update the LED strip with the new HSV values
-        for j in range(NUM_LEDS):
-            led_strip.set_hsv(j, hsv_values[j][0], hsv_values[j][1], hsv_values[j][2])
-
-        offset += 1  # Increment offset to scroll the pattern
-        time.sleep(SCROLL_SPEED)  # Control the speed of the scrolling effect
-
-    return hsv_values
+class TrailingLightsEffect:
+    """Dim white lights gliding back and forth between the ends of the strip, leaving fading trails."""
 
+    def __init__(self, num_leds, num_lights=5, brightness=0.5, min_speed=1.0, max_speed=4.0, fade=0.1):
+        self.num_leds = num_leds
+        self.level = int(brightness * 255)
+        self.fade = fade  # Fraction of a trail's brightness left after a second
+        self.engine = BounceEngine(num_leds, gravity=0)
+        for _ in range(num_lights if num_leds else 0):
+            speed = uniform(min_speed, max_speed) * choice([-1, 1])  # LEDs per second
+            self.engine.launch(0.0, uniform(0, num_leds - 1), speed, (self.level,) * 3)
+
+    def render(self, canvas, context):
+        if not self.num_leds:
+            return
+        pixels = canvas.pixels
+        scale = context.fade_scale(self.fade)
+        for j in range(len(pixels)):
+            pixels[j] = pixels[j] * scale >> 8
+        canvas.mark_dirty()
+
+        # Only the engine's positions are used, the trails are left to fade
+        engine = self.engine
+        t = context.t_ms / 1000
+        level = self.level
+        for ball in engine.balls:
+            draw_point(canvas, engine.position(ball, t), level, level, level)
 
 def effect_71(hsv_values):
-    NUM_LEDS_MOVING = 5  # Number of moving LEDs
-    TRAIL_LENGTH = 10
-    BRIGHTNESS = 0.5
-    fade_factor = 0.8
-
-    positions = [randrange(NUM_LEDS) for _ in range(NUM_LEDS_MOVING)]
-    directions = [choice([-1, 1]) for _ in range(NUM_LEDS_MOVING)]
-    speeds = [uniform(0.05, 0.2) for _ in range(NUM_LEDS_MOVING)]
-    brightness_levels = [0] * NUM_LEDS
-
-    start_time = time.ticks_ms()
-
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        for i in range(NUM_LEDS):
-            brightness_levels[i] *= fade_factor
-
-        for i in range(NUM_LEDS_MOVING):
-            if randrange(100) < 2:
-                hue = randrange(0, 360) / 360
-                hsv_values[int(positions[i])] = (hue, 1.0, BRIGHTNESS)
-            else:
-                brightness_levels[int(positions[i])] = BRIGHTNESS
-
-            positions[i] += directions[i] * speeds[i]
-            if positions[i] >= NUM_LEDS or positions[i] < 0:
-                directions[i] = -directions[i]
-                positions[i] = max(0, min(NUM_LEDS - 1, positions[i]))
-
-        for j in range(NUM_LEDS):
-            hsv_values[j] = (0.0, 0.0, brightness_levels[j])
-            led_strip.set_hsv(j, 0, 0, brightness_levels[j])
-
-        time.sleep(min(speeds))
-
-    return hsv_values
+    """Dim white lights gliding back and forth with fading trails."""
+    return play_frame_effect(TrailingLightsEffect, 50, hsv_values)
 
 
 
 # Effect 72: Glenn's Shooting Stars with Twinkling Starry Night
-def effect_72(hsv_values):
-    NUM_LEDS_MOVING = 5
-    BRIGHTNESS = 0.5
-    fade_factor = 0.8
-
-    positions = [randrange(NUM_LEDS) for _ in range(NUM_LEDS_MOVING)]
-    directions = [choice([-1, 1]) for _ in range(NUM_LEDS_MOVING)]
-    speeds = [uniform(0.05, 0.5) for _ in range(NUM_LEDS_MOVING)]
-    color_durations = [0 for _ in range(NUM_LEDS_MOVING)]
-    color_hues = [0 for _ in range(NUM_LEDS_MOVING)]
-    brightness_levels = [0.0] * NUM_LEDS
-
-    start_time = time.ticks_ms()
-
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        for i in range(NUM_LEDS):
-            brightness_levels[i] *= fade_factor
-
-        for i in range(NUM_LEDS_MOVING):
-            if color_durations[i] > 0:
-                color_durations[i] -= 1
-                hsv_values[positions[i]] = (color_hues[i], 1.0, BRIGHTNESS)
-            else:
-                if randrange(100) < 20:
-                    color_hues[i] = randrange(0, 360) / 360.0
-                    color_durations[i] = randrange(10, 30)
-                    hsv_values[positions[i]] = (color_hues[i], 1.0, BRIGHTNESS)
-                else:
-                    brightness_levels[positions[i]] = BRIGHTNESS
+class ShootingStarsEffect:
+    """Stars bouncing along the strip leaving fading trails, now and then taking on a colour for a while.
 
-            positions[i] += directions[i]
-            if positions[i] >= NUM_LEDS or positions[i] < 0:
-                directions[i] = -directions[i]
-                positions[i] += directions[i] * 2
+    The stars all move at one speed, re-picked at random now and then, so the sky speeds up and slows down.
+    """
 
-        for j in range(NUM_LEDS):
-            if brightness_levels[j] > 0.01:
-                hsv_values[j] = (hsv_values[j][0], hsv_values[j][1], brightness_levels[j])
+    def __init__(self, num_leds, num_stars=5, brightness=0.5, fade=0.8):
+        self.num_leds = num_leds
+        self.num_stars = num_stars
+        self.brightness = brightness
+        self.fade = fade  # Brightness the trails keep per step
+        self.positions = [randrange(num_leds) if num_leds else 0 for _ in range(num_stars)]
+        self.directions = [choice([-1, 1]) for _ in range(num_stars)]
+        self.color_steps = [0] * num_stars  # Steps each star has left in its colour
+        self.color_hues = [0.0] * num_stars
+        self.hues = [0.0] * num_leds
+        self.saturations = [0.0] * num_leds
+        self.levels = [0.0] * num_leds
+        self.pick_speed()
+        self.due = 1.0  # Steps owed, the first frame takes one
+
+    def pick_speed(self):
+        self.step_s = min(uniform(0.05, 0.5) for _ in range(self.num_stars))  # Seconds per step
+
+    def step(self):
+        num_leds = self.num_leds
+        levels = self.levels
+        fade = self.fade
+        for i in range(num_leds):
+            levels[i] *= fade
+
+        for s in range(self.num_stars):
+            position = self.positions[s] % num_leds
+            if self.color_steps[s] > 0:
+                self.color_steps[s] -= 1
+                self.hues[position] = self.color_hues[s]
+                self.saturations[position] = 1.0
+            elif randrange(100) < 20:
+                self.color_hues[s] = randrange(0, 360) / 360.0
+                self.color_steps[s] = randrange(10, 30)
+                self.hues[position] = self.color_hues[s]
+                self.saturations[position] = 1.0
             else:
-                hsv_values[j] = (0.0, 0.0, 0.0)
+                levels[position] = self.brightness
 
-            led_strip.set_hsv(j, hsv_values[j][0], hsv_values[j][1], hsv_values[j][2])
+            self.positions[s] += self.directions[s]
+            if self.positions[s] >= num_leds or self.positions[s] < 0:
+                self.directions[s] = -self.directions[s]  # Bounce off the ends
+                self.positions[s] += self.directions[s] * 2
 
         if randrange(100) < 10:
-            speeds = [uniform(0.05, 0.5) for _ in range(NUM_LEDS_MOVING)]
-
-        time.sleep(min(speeds))
+            self.pick_speed()
+
+    def render(self, canvas, context):
+        num_leds = self.num_leds
+        if not num_leds:
+            return
+        self.due += context.dt / self.step_s
+        steps = int(self.due)
+        if not steps:
+            return
+        self.due -= steps
+        for _ in range(min(steps, 5)):
+            self.step()
+
+        hues = self.hues
+        saturations = self.saturations
+        levels = self.levels
+        for i in range(num_leds):
+            if levels[i] > 0.01:
+                canvas.set_hsv(i, hues[i], saturations[i], levels[i])
+            else:
+                hues[i] = saturations[i] = 0.0  # A star passing here later starts out white
+                canvas.set_rgb(i, 0, 0, 0)
 
-    return hsv_values
+def effect_72(hsv_values):
+    """Shooting stars with fading trails that flash into colour now and then."""
+    return play_frame_effect(ShootingStarsEffect, 50, hsv_values)
 
 
 def effect_73(hsv_values):
     """Cascading ripple effect with fading trails."""
-    NUM_RIPPLES = 3  # Number of simultaneous ripples
-    TRAIL_LENGTH = 15  # Length of the trailing effect
-    FADE_FACTOR = 0.85  # Fading factor for the trails
-    hue_range = 0.1  # Restrict hue range to 10%
-
-    # Initialize positions for ripples
-    positions = [randrange(NUM_LEDS) for _ in range(NUM_RIPPLES)]
-    directions = [choice([-1, 1]) for _ in range(NUM_RIPPLES)]
-
-    start_time = time.ticks_ms()
-
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        # Dim all LEDs slightly to create fading trails
-        for i in range(NUM_LEDS):
-            hsv_values[i] = (hsv_values[i][0], hsv_values[i][1], hsv_values[i][2] * FADE_FACTOR)
-
-        # Move and light up ripples
-        for r in range(NUM_RIPPLES):
-            # Choose a hue for the ripple within the restricted range
-            base_hue = 0.8  # Central hue
-            hue = base_hue + uniform(-hue_range / 2, hue_range / 2)  # Restrict hue shift
-
-            for t in range(TRAIL_LENGTH):
-                index = (positions[r] + t * directions[r]) % NUM_LEDS
-                brightness = max(0, 1.0 - (t / TRAIL_LENGTH))
-                hsv_values[index] = (hue, 1.0, brightness)
-
-            # Update position of the ripple
-            positions[r] += directions[r]
-            if positions[r] >= NUM_LEDS or positions[r] < 0:
-                directions[r] = -directions[r]  # Reverse direction
-                positions[r] += directions[r] * 2  # Ensure we stay within bounds
-
-        # Update the LED strip with the new HSV values
-        for j in range(NUM_LEDS):
-            led_strip.set_hsv(j, hsv_values[j][0], hsv_values[j][1], hsv_values[j][2])
-
-        time.sleep(0.05)  # Adjust speed of the ripple effect
-
-    return hsv_values
+    # Purple ripples, their hue shifting within 10% of the spectrum
+    colors = [(0.8, 1.0)] * 3
+    return play_frame_effect(lambda num_leds: RipplesEffect(num_leds, colors=colors, hue_jitter=0.1), 20, hsv_values)
 
 
 
 def effect_74(hsv_values):
-    """Cascading ripple effect with GRB-corrected colors."""
-    NUM_RIPPLES = 3  # Number of simultaneous ripples
-    TRAIL_LENGTH = 15  # Length of the trailing effect
-    FADE_FACTOR = 0.85  # Fading factor for the trails
-    MIN_BRIGHTNESS = 0.05  # Minimum brightness to avoid complete darkness
-
-    # Initialize positions for ripples
-    positions = [randrange(NUM_LEDS) for _ in range(NUM_RIPPLES)]
-    directions = [choice([-1, 1]) for _ in range(NUM_RIPPLES)]
-
-    # Use GRB-corrected RGB values for white, cyan, and blue
-    colors = [
-        (0.0, 0.0, 1.0),  # White
-        (0.5, 1.0, 1.0),  # Cyan
-        (0.6, 1.0, 1.0)   # Blue
-    ]
-
-    start_time = time.ticks_ms()
-
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        # Dim all LEDs slightly to create fading trails
-        for i in range(NUM_LEDS):
-            hsv_values[i] = (
-                hsv_values[i][0],
-                hsv_values[i][1],
-                max(hsv_values[i][2] * FADE_FACTOR, MIN_BRIGHTNESS)
-            )
-
-        # Move and light up ripples
-        for r in range(NUM_RIPPLES):
-            color = colors[r % len(colors)]  # Cycle through the white, cyan, blue colors
-            for t in range(TRAIL_LENGTH):
-                index = (positions[r] + t * directions[r]) % NUM_LEDS
-                brightness = max(0, 1.0 - (t / TRAIL_LENGTH))
-                hsv_values[index] = (color[0], color[1], brightness)
-
-            # Update position of the ripple
-            positions[r] += directions[r]
-            if positions[r] >= NUM_LEDS or positions[r] < 0:
-                directions[r] = -directions[r]  # Reverse direction
-                positions[r] += directions[r] * 2  # Ensure we stay within bounds
-
-        # Update the LED strip with the new values
-        for i in range(NUM_LEDS):
-            led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
-
-        time.sleep(0.05)  # Adjust speed of the ripple effect
-
-    return hsv_values
+    """Cascading ripple effect with white, cyan and blue colors."""
+    colors = [(0.0, 0.0), (0.5, 1.0), (0.6, 1.0)]  # White, cyan and blue
+    # The trails never fade below 5%, to avoid complete darkness
+    return play_frame_effect(lambda num_leds: RipplesEffect(num_leds, colors=colors, floor=0.05), 20, hsv_values)
 
 
 
 # Effect 75: Randomized Pattern Generator
-def effect_75(hsv_values):
-    start_time = time.ticks_ms()
-
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        if not read_buttons():
-            break
+class RandomPatternEffect:
+    """Plays a random wave, sparkle, chase, pulse or rainbow pattern, then picks another at random."""
 
-        pattern_type = choice(['wave', 'sparkle', 'chase', 'pulse', 'rainbow'])
-        speed = uniform(0.01, 0.2)
-        hue_offset = randrange(0, 360) / 360.0
-        hue_shift = uniform(0.01, 0.1)
-        brightness_variation = uniform(0.5, 1.0)
-        fade_factor = uniform(0.8, 0.99)
-        direction = choice([-1, 1])
-
-        for t in range(NUM_LEDS * 10):
-            if time.ticks_diff(time.ticks_ms(), start_time) > TIMEOUT_DURATION:
-                break
+    PATTERNS = ('wave', 'sparkle', 'chase', 'pulse', 'rainbow')
 
-            for i in range(NUM_LEDS):
-                hue = (hue_offset + i * hue_shift) % 1.0
-                
-                if pattern_type == 'wave':
-                    brightness = (1 + math.sin(i * 2 * math.pi / NUM_LEDS + t * direction * speed)) / 2 * brightness_variation
-                elif pattern_type == 'sparkle':
-                    brightness = brightness_variation if randrange(100) < 10 else 0.0
-                elif pattern_type == 'chase':
-                    brightness = 1.0 if (i + int(t * speed * NUM_LEDS)) % NUM_LEDS < NUM_LEDS // 10 else 0.0
-                elif pattern_type == 'pulse':
-                    brightness = (1 + math.sin(t * direction * speed)) / 2 * brightness_variation
-                elif pattern_type == 'rainbow':
-                    hue = (i / NUM_LEDS + t * speed) % 1.0
-                    brightness = brightness_variation
-
-                hsv_values[i] = (hue, 1.0, brightness * fade_factor)
-                led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
-
-            time.sleep(speed)
-
-        hue_offset += uniform(0.01, 0.05)
-        direction = -direction if randrange(100) < 5 else direction
+    def __init__(self, num_leds):
+        self.num_leds = num_leds
+        self.pattern_start = None
+        self.t = -1
+        self.noise = bytearray(num_leds)
+
+    def choose_pattern(self, now):
+        self.pattern_type = choice(self.PATTERNS)
+        self.speed = uniform(0.01, 0.2)  # Seconds per step, also the step size of moving patterns
+        self.hue_offset = randrange(0, 360) / 360.0
+        self.hue_shift = uniform(0.01, 0.1)
+        self.brightness_variation = uniform(0.5, 1.0)
+        self.fade_factor = uniform(0.8, 0.99)
+        self.direction = choice([-1, 1])
+        self.pattern_start = now
+
+    def render(self, canvas, context):
+        num_leds = self.num_leds
+        if self.pattern_start is None:
+            self.choose_pattern(context.t_ms)
+        t = int((context.t_ms - self.pattern_start) / 1000 / self.speed)
+        if t >= num_leds * 10:
+            self.choose_pattern(context.t_ms)
+            t = 0
+        elif t == self.t:
+            return
+        self.t = t
+
+        pattern_type = self.pattern_type
+        speed = self.speed
+        hue_offset = self.hue_offset
+        hue_shift = self.hue_shift
+        brightness_variation = self.brightness_variation
+        fade_factor = self.fade_factor
+        direction = self.direction
+        noise = self.noise
+        if pattern_type == 'sparkle':
+            fast_random.fill(noise)
+
+        for i in range(num_leds):
+            hue = (hue_offset + i * hue_shift) % 1.0
+            if pattern_type == 'wave':
+                brightness = (1 + math.sin(i * 2 * math.pi / num_leds + t * direction * speed)) / 2 * brightness_variation
+            elif pattern_type == 'sparkle':
+                brightness = brightness_variation if noise[i] < 26 else 0.0  # 10%
+            elif pattern_type == 'chase':
+                brightness = 1.0 if (i + int(t * speed * num_leds)) % num_leds < num_leds // 10 else 0.0
+            elif pattern_type == 'pulse':
+                brightness = (1 + math.sin(t * direction * speed)) / 2 * brightness_variation
+            elif pattern_type == 'rainbow':
+                hue = (i / num_leds + t * speed) % 1.0
+                brightness = brightness_variation
+
+            canvas.set_hsv(i, hue, 1.0, brightness * fade_factor)
 
-    return hsv_values
+def effect_75(hsv_values):
+    """Random patterns with random hues and speeds."""
+    return play_frame_effect(RandomPatternEffect, 50, hsv_values)
 
 
 # Effect 76: Enhanced Randomized Pattern Generator
-def effect_76(hsv_values):
-    start_time = time.ticks_ms()
+class PatternMixEffect:
+    """Plays randomly chosen patterns with random palettes and speeds, one after the other."""
 
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        if not read_buttons():
-            break
-
-        pattern_type = choice([
-            'wave', 'sparkle', 'chase', 'pulse', 'subtle_rainbow',
-            'breathing', 'meteor_shower', 'rotating_comet', 'falling_stars',
-            'larson_scanner', 'color_fade', 'random_flash', 'twinkle', 
-            'rotating_bands', 'wave_pulsing', 'waterfall', 'spinning_wheel',
-            'color_bounce', 'sparkling_pulse', 'plasma_wave', 'cascading_ripples',
-            'expanding_circles', 'glowing_embers', 'flashing_comet', 'waving_rainbow'
-        ])
-        speed = uniform(0.01, 0.2)
-        hue_shift = uniform(0.01, 0.1)
-        brightness_variation = uniform(0.5, 1.0)
-        fade_factor = uniform(0.8, 0.99)
-        direction = choice([-1, 1])
-
-        num_hues = choice([1, 2, 3, 4, 360])
-        hues = sorted([randrange(360) / 360.0 for _ in range(num_hues)])
+    compute_fps = 20
+    PATTERNS = (
+        'wave', 'sparkle', 'chase', 'pulse', 'subtle_rainbow',
+        'breathing', 'meteor_shower', 'rotating_comet', 'falling_stars',
+        'larson_scanner', 'color_fade', 'random_flash', 'twinkle',
+        'rotating_bands', 'wave_pulsing', 'waterfall', 'spinning_wheel',
+        'color_bounce', 'sparkling_pulse', 'plasma_wave', 'cascading_ripples',
+        'expanding_circles', 'glowing_embers', 'flashing_comet', 'waving_rainbow'
+    )
 
-        for t in range(NUM_LEDS * 10):
-            if time.ticks_diff(time.ticks_ms(), start_time) > TIMEOUT_DURATION:
-                break
+    RANDOM_PATTERNS = ('sparkle', 'twinkle', 'sparkling_pulse')
 
-            for i in range(NUM_LEDS):
-                if num_hues == 360:
-                    hue = (i / NUM_LEDS + t * speed) % 1.0
+    def __init__(self, num_leds):
+        self.num_leds = num_leds
+        self.pattern_start = None
+        self.noise = bytearray(num_leds)
+        self.flashes = SparseSampler(0.05)
+
+    def choose_pattern(self, now):
+        self.pattern_type = choice(self.PATTERNS)
+        self.speed = uniform(0.01, 0.2)  # Seconds per step, also the step size of moving patterns
+        self.brightness_variation = uniform(0.5, 1.0)
+        self.fade_factor = uniform(0.8, 0.99)
+        self.direction = choice([-1, 1])
+        self.num_hues = choice([1, 2, 3, 4, 360])
+        self.hues = sorted([randrange(360) / 360.0 for _ in range(self.num_hues)])
+        self.pattern_start = now
+
+    def render(self, canvas, context):
+        num_leds = self.num_leds
+        if self.pattern_start is None:
+            self.choose_pattern(context.t_ms)
+        t = int((context.t_ms - self.pattern_start) / 1000 / self.speed)
+        if t >= num_leds * 10:
+            self.choose_pattern(context.t_ms)
+            t = 0
+
+        pattern_type = self.pattern_type
+        speed = self.speed
+        brightness_variation = self.brightness_variation
+        fade_factor = self.fade_factor
+        direction = self.direction
+        num_hues = self.num_hues
+        hues = self.hues
+        noise = self.noise
+        if pattern_type in self.RANDOM_PATTERNS:
+            fast_random.fill(noise)
+        elif pattern_type == 'random_flash':
+            flashes = self.flashes.indices(num_leds)
+            next_flash = next(flashes, num_leds)
+
+        for i in range(num_leds):
+            if num_hues == 360:
+                hue = (i / num_leds + t * speed) % 1.0
+            else:
+                index = int(i / num_leds * (num_hues - 1))
+                next_index = (index + 1) % num_hues
+                ratio = (i / num_leds * (num_hues - 1)) % 1.0
+                hue = hues[index] * (1 - ratio) + hues[next_index] * ratio
+
+            if pattern_type == 'wave':
+                brightness = (1 + math.sin(i * 2 * math.pi / num_leds + t * direction * speed)) / 2 * brightness_variation
+            elif pattern_type == 'sparkle':
+                brightness = brightness_variation if noise[i] < 26 else 0.0  # 10%
+            elif pattern_type == 'chase':
+                brightness = 1.0 if (i + int(t * speed * num_leds)) % num_leds < num_leds // 10 else 0.0
+            elif pattern_type == 'pulse':
+                brightness = (1 + math.sin(t * direction * speed)) / 2 * brightness_variation
+            elif pattern_type == 'subtle_rainbow':
+                hue = (i / num_leds + t * speed * 0.1) % 1.0
+                brightness = brightness_variation
+            elif pattern_type == 'breathing':
+                brightness = (1 + math.sin(t * speed)) / 2 * brightness_variation
+            elif pattern_type == 'meteor_shower':
+                brightness = max(0, 1 - abs(i - t % num_leds) / 10) * brightness_variation
+            elif pattern_type == 'rotating_comet':
+                comet_position = (t * speed) % num_leds
+                brightness = max(0, 1 - abs(i - comet_position) / 10) * brightness_variation
+            elif pattern_type == 'falling_stars':
+                brightness = brightness_variation if i == t % num_leds else 0.0
+            elif pattern_type == 'larson_scanner':
+                brightness = max(0, 1 - abs(i - t % num_leds) / 5) * brightness_variation
+            elif pattern_type == 'color_fade':
+                brightness = (1 + math.sin(i * 2 * math.pi / num_leds + t * speed)) / 2 * brightness_variation
+            elif pattern_type == 'random_flash':
+                if i == next_flash:
+                    brightness = brightness_variation
+                    next_flash = next(flashes, num_leds)
                 else:
-                    index = int(i / NUM_LEDS * (num_hues - 1))
-                    next_index = (index + 1) % num_hues
-                    ratio = (i / NUM_LEDS * (num_hues - 1)) % 1.0
-                    hue = hues[index] * (1 - ratio) + hues[next_index] * ratio
-
-                if pattern_type == 'wave':
-                    brightness = (1 + math.sin(i * 2 * math.pi / NUM_LEDS + t * direction * speed)) / 2 * brightness_variation
-                elif pattern_type == 'sparkle':
-                    brightness = brightness_variation if randrange(100) < 10 else 0.0
-                elif pattern_type == 'chase':
-                    brightness = 1.0 if (i + int(t * speed * NUM_LEDS)) % NUM_LEDS < NUM_LEDS // 10 else 0.0
-                elif pattern_type == 'pulse':
-                    brightness = (1 + math.sin(t * direction * speed)) / 2 * brightness_variation
-                elif pattern_type == 'subtle_rainbow':
-                    hue = (i / NUM_LEDS + t * speed * 0.1) % 1.0
+                    brightness = 0.0
+            elif pattern_type == 'twinkle':
+                brightness = brightness_variation if noise[i] < 51 else 0.0  # 20%
+            elif pattern_type == 'rotating_bands':
+                band_width = max(1, num_leds // 6)
+                brightness = 1.0 if (i // band_width + t // 10) % 2 == 0 else 0.5
+            elif pattern_type == 'wave_pulsing':
+                brightness = (1 + math.sin(i * 2 * math.pi / 100.0 + t * speed)) / 2 * brightness_variation
+            elif pattern_type == 'waterfall':
+                brightness = max(0, (1 + math.sin(i * 2 * math.pi / 100.0 - t * speed))) / 2 * brightness_variation
+            elif pattern_type == 'spinning_wheel':
+                brightness = (1 + math.sin((i + t) * speed)) / 2 * brightness_variation
+            elif pattern_type == 'color_bounce':
+                brightness = 1.0 if (abs(t % (num_leds * 2) - i) < num_leds // 5) else 0.0
+            elif pattern_type == 'sparkling_pulse':
+                brightness = brightness_variation * (1 + math.sin(i * 2 * math.pi / num_leds + t * speed)) / 2
+                if noise[i] < 13:
                     brightness = brightness_variation
-                elif pattern_type == 'breathing':
-                    brightness = (1 + math.sin(t * speed)) / 2 * brightness_variation
-                elif pattern_type == 'meteor_shower':
-                    brightness = max(0, 1 - abs(i - t % NUM_LEDS) / 10) * brightness_variation
-                elif pattern_type == 'rotating_comet':
-                    comet_position = (t * speed) % NUM_LEDS
-                    brightness = max(0, 1 - abs(i - comet_position) / 10) * brightness_variation
-                elif pattern_type == 'falling_stars':
-                    brightness = brightness_variation if i == t % NUM_LEDS else 0.0
-                elif pattern_type == 'larson_scanner':
-                    brightness = max(0, 1 - abs(i - t % NUM_LEDS) / 5) * brightness_variation
-                elif pattern_type == 'color_fade':
-                    brightness = (1 + math.sin(i * 2 * math.pi / NUM_LEDS + t * speed)) / 2 * brightness_variation
-                elif pattern_type == 'random_flash':
-                    brightness = brightness_variation if randrange(100) < 5 else 0.0
-                elif pattern_type == 'twinkle':
-                    brightness = brightness_variation if randrange(100) < 20 else 0.0
-                elif pattern_type == 'rotating_bands':
-                    band_width = NUM_LEDS // 6
-                    brightness = 1.0 if (i // band_width + t // 10) % 2 == 0 else 0.5
-                elif pattern_type == 'wave_pulsing':
-                    brightness = (1 + math.sin(i * 2 * math.pi / 100.0 + t * speed)) / 2 * brightness_variation
-                elif pattern_type == 'waterfall':
-                    brightness = max(0, (1 + math.sin(i * 2 * math.pi / 100.0 - t * speed))) / 2 * brightness_variation
-                elif pattern_type == 'spinning_wheel':
-                    brightness = (1 + math.sin((i + t) * speed)) / 2 * brightness_variation
-                elif pattern_type == 'color_bounce':
-                    brightness = 1.0 if (abs(t % (NUM_LEDS * 2) - i) < NUM_LEDS // 5) else 0.0
-                elif pattern_type == 'sparkling_pulse':
-                    brightness = brightness_variation * (1 + math.sin(i * 2 * math.pi / NUM_LEDS + t * speed)) / 2
-                    if randrange(100) < 5:
-                        brightness = brightness_variation
-                elif pattern_type == 'plasma_wave':
-                    brightness = (1 + math.sin(i * 2 * math.pi / NUM_LEDS + t * 0.05)) / 2 * brightness_variation
-                elif pattern_type == 'cascading_ripples':
-                    ripple_position = (t * speed) % NUM_LEDS
-                    brightness = max(0, 1 - abs(i - ripple_position) / 5) * brightness_variation
-                elif pattern_type == 'expanding_circles':
-                    brightness = max(0, 1 - abs(i - (t * speed) % NUM_LEDS) / 10) * brightness_variation
-                elif pattern_type == 'glowing_embers':
-                    brightness = max(0, brightness_variation * (1 + math.sin(t * speed + i * 0.1)))
-                elif pattern_type == 'flashing_comet':
-                    brightness = max(0, 1 - abs(i - t % NUM_LEDS) / 10) * brightness_variation
-                elif pattern_type == 'waving_rainbow':
-                    hue = (i / NUM_LEDS + t * speed) % 1.0
-                    brightness = max(0, (1 + math.sin(i * 2 * math.pi / NUM_LEDS + t * speed)) / 2) * brightness_variation
-
-                hsv_values[i] = (hue, 1.0, brightness * fade_factor)
-                led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
-
-            time.sleep(speed)
-
-        direction = -direction if randrange(100) < 5 else direction
-
-    return hsv_values
+            elif pattern_type == 'plasma_wave':
+                brightness = (1 + math.sin(i * 2 * math.pi / num_leds + t * 0.05)) / 2 * brightness_variation
+            elif pattern_type == 'cascading_ripples':
+                ripple_position = (t * speed) % num_leds
+                brightness = max(0, 1 - abs(i - ripple_position) / 5) * brightness_variation
+            elif pattern_type == 'expanding_circles':
+                brightness = max(0, 1 - abs(i - (t * speed) % num_leds) / 10) * brightness_variation
+            elif pattern_type == 'glowing_embers':
+                brightness = max(0, brightness_variation * (1 + math.sin(t * speed + i * 0.1)))
+            elif pattern_type == 'flashing_comet':
+                brightness = max(0, 1 - abs(i - t % num_leds) / 10) * brightness_variation
+            elif pattern_type == 'waving_rainbow':
+                hue = (i / num_leds + t * speed) % 1.0
+                brightness = max(0, (1 + math.sin(i * 2 * math.pi / num_leds + t * speed)) / 2) * brightness_variation
+
+            canvas.set_hsv(i, hue, 1.0, brightness * fade_factor)
 
+def effect_76(hsv_values):
+    """Random patterns with random palettes and speeds."""
+    return play_frame_effect(PatternMixEffect, 60, hsv_values)
 
 # Effect 77: Complex Mathematical Formulas
-def effect_77(hsv_values):
-    start_time = time.ticks_ms()
+class FormulaPatternEffect:
+    """Plays a brightness pattern picked at random from a set of formulas over a random palette, then picks another."""
 
-    while time.ticks_diff(time.ticks_ms(), start_time) < TIMEOUT_DURATION:
-        if not read_buttons():
-            break
-
-        speed = uniform(0.01, 0.2)
-        hue_shift = uniform(0.01, 0.1)
-        brightness_variation = uniform(0.5, 1.0)
-        fade_factor = uniform(0.8, 0.99)
+    def __init__(self, num_leds):
+        self.num_leds = num_leds
+        self.pattern_start = None
+        self.t = -1
+        self.noise = bytearray(num_leds)
+
+    def random_formula(self, i, t):
+        return self.noise[i] / 255
+
+    def choose_pattern(self, now):
+        num_leds = self.num_leds
+        self.speed = speed = uniform(0.01, 0.2)  # Seconds per step, also the step size of moving patterns
+        self.brightness_variation = uniform(0.5, 1.0)
+        self.fade_factor = uniform(0.8, 0.99)
         direction = choice([-1, 1])
-
-        num_hues = choice([1, 2, 3, 4, 360])
-        hues = sorted([randrange(360) / 360.0 for _ in range(num_hues)])
-
-        pattern_formula = choice([
-            lambda i, t: 0.5 + 0.5 * math.sin(i * 2 * math.pi / NUM_LEDS + t * direction * speed),
-            lambda i, t: 1.0 if (i + int(t * speed * NUM_LEDS)) % NUM_LEDS < NUM_LEDS // 2 else 0.0,
-            lambda i, t: 0.5 + 0.5 * math.sin(i * 2 * math.pi / NUM_LEDS) * (1 + math.sin(t * speed)),
-            lambda i, t: uniform(0.0, 1.0),
+        self.num_hues = choice([1, 2, 3, 4, 360])
+        self.hues = sorted([randrange(360) / 360.0 for _ in range(self.num_hues)])
+        self.pattern_formula = choice([
+            lambda i, t: 0.5 + 0.5 * math.sin(i * 2 * math.pi / num_leds + t * direction * speed),
+            lambda i, t: 1.0 if (i + int(t * speed * num_leds)) % num_leds < num_leds // 2 else 0.0,
+            lambda i, t: 0.5 + 0.5 * math.sin(i * 2 * math.pi / num_leds) * (1 + math.sin(t * speed)),
+            self.random_formula,
             lambda i, t: 0.5 + 0.5 * math.sin(i * math.pi / 25 + t * speed),
-            lambda i, t: max(0.0, 1 - abs(i - t % NUM_LEDS) / 10),
+            lambda i, t: max(0.0, 1 - abs(i - t % num_leds) / 10),
             lambda i, t: 0.5 + 0.5 * math.sin(t * direction * speed),
-            lambda i, t: 1.0 if abs(i - t % NUM_LEDS) < NUM_LEDS // 10 else 0.0,
+            lambda i, t: 1.0 if abs(i - t % num_leds) < num_leds // 10 else 0.0,
             lambda i, t: (i % 10) / 10.0,
-            lambda i, t: (1.0 - math.sin(i * 2 * math.pi / NUM_LEDS + t * speed * 0.1)) * 0.5
+            lambda i, t: (1.0 - math.sin(i * 2 * math.pi / num_leds + t * speed * 0.1)) * 0.5
         ])
+        self.pattern_start = now
+
+    def render(self, canvas, context):
+        num_leds = self.num_leds
+        if self.pattern_start is None:
+            self.choose_pattern(context.t_ms)
+        t = int((context.t_ms - self.pattern_start) / 1000 / self.speed)
+        if t >= num_leds * 10:
+            self.choose_pattern(context.t_ms)
+            t = 0
+        elif t == self.t:
+            return
+        self.t = t
+
+        pattern_formula = self.pattern_formula
+        if pattern_formula == self.random_formula:
+            fast_random.fill(self.noise)
+        speed = self.speed
+        level = self.brightness_variation * self.fade_factor
+        num_hues = self.num_hues
+        hues = self.hues
+        for i in range(num_leds):
+            if num_hues == 360:
+                hue = (i / num_leds + t * speed) % 1.0
+            else:
+                index = int(i / num_leds * (num_hues - 1))
+                next_index = (index + 1) % num_hues
+                ratio = (i / num_leds * (num_hues - 1)) % 1.0
+                hue = hues[index] * (1 - ratio) + hues[next_index] * ratio
 
-        for t in range(NUM_LEDS * 10):
-            if time.ticks_diff(time.ticks_ms(), start_time) > TIMEOUT_DURATION:
-                break
-
-            for i in range(NUM_LEDS):
-                if num_hues == 360:
-                    hue = (i / NUM_LEDS + t * speed) % 1.0
-                else:
-                    index = int(i / NUM_LEDS * (num_hues - 1))
-                    next_index = (index + 1) % num_hues
-                    ratio = (i / NUM_LEDS * (num_hues - 1)) % 1.0
-                    hue = hues[index] * (1 - ratio) + hues[next_index] * ratio
-
-                brightness = pattern_formula(i, t) * brightness_variation * fade_factor
+            canvas.set_hsv(i, hue, 1.0, pattern_formula(i, t) * level)
 
-                hsv_values[i] = (hue, 1.0, brightness)
-                led_strip.set_hsv(i, hsv_values[i][0], hsv_values[i][1], hsv_values[i][2])
+def effect_77(hsv_values):
+    """Random mathematical brightness formulas over random palettes."""
+    return play_frame_effect(FormulaPatternEffect, 50, hsv_values)
 
-            time.sleep(speed)
+def effect_78(hsv_values):
+    """Pre-rendered animation played back from flash."""
+    play_animation_file(ANIMATION_FILE, framebuffer, TIMEOUT_DURATION)
+    return hsv_values
 
-        direction = -direction if randrange(100) < 5 else direction
+# Segments played by effect_79: start LED, LED count, segment effect, frames per second
+SEGMENT_SPLIT = NUM_LEDS * 20 // 33  # Fire on 40 of every 66 LEDs, whatever the strip length
+SEGMENT_LAYOUT = [
+    (0, SEGMENT_SPLIT, FireEffect, 50),
+    (SEGMENT_SPLIT, NUM_LEDS - SEGMENT_SPLIT, TwinkleStarsEffect, 20),
+]
 
+def effect_79(hsv_values):
+    """Different effects on different ranges of the strip, from SEGMENT_LAYOUT."""
+    segments = [Segment(start, length, effect_class, fps) for start, length, effect_class, fps in SEGMENT_LAYOUT]
+    play_segments(segments, TIMEOUT_DURATION)
     return hsv_values
 
+def effect_80(hsv_values):
+    """Twinkling stars over rolling clouds."""
+    layers = [(CloudsEffect, "alpha", 1.0), (TwinkleStarsEffect, "max", 1.0)]
+    return play_frame_effect(lambda num_leds: Compositor(num_leds, layers), 20, hsv_values)
+
+def effect_81(hsv_values):
+    """A random segment effect mirrored about the centre of the strip."""
+    effect_class = choice([
+        FireEffect, TwinkleStarsEffect, CloudsEffect, MeteorShowerEffect, WaveBurstEffect,
+        LavaDripEffect, BouncingBallEffect, StarryTwinkleEffect, ThunderstormEffect,
+        CellularAutomatonEffect, ColorWipeEffect, WavesOfColorEffect, PlasmaStormEffect,
+        PatternMixEffect, LarsonScannerEffect, MatrixEffect, RainbowCometEffect, ScrollingBarsEffect,
+        PacManEffect, TetrisEffect, LavaLampEffect, RainEffect,
+        BouncingLightsEffect, TrailingLightsEffect
+    ])
+    return play_frame_effect(mirrored(effect_class), 60, hsv_values)
+
+def benchmark_playback(num_leds=300, num_frames=200, duration=5000):
+    """Measures sustained playback FPS of a pre-rendered animation from flash."""
+    path = "/benchmark.pfx"
+    frame = bytearray(num_leds * 3)
+    with open(path, "wb") as f:
+        write_animation_header(f, num_leds, 1000)
+        for t in range(num_frames):
+            for j in range(len(frame)):
+                frame[j] = (j + t) & 0xFF
+            f.write(frame)
+
+    target = FrameBuffer(num_leds, NullStrip())
+    frames_shown = play_animation_file(path, target, duration, throttle=False)
+    os.remove(path)
+    print(f"Playback: {num_leds} LEDs, {frames_shown * 1000 / duration:.1f} FPS sustained")
+
+def benchmark_power_limiter(led_counts=(66, 300), num_frames=100):
+    """Measures what the power limiter adds to a frame commit while it is dimming the strip."""
+    for num_leds in led_counts:
+        frame = bytearray(num_leds * 3)
+        times = []
+        # Unlimited, then a budget of a quarter of what the full-white strip would draw
+        for budget_ma in (10 ** 9, num_leds * (3 * MA_PER_CHANNEL + MA_IDLE_PER_LED) // 4):
+            target = FrameBuffer(num_leds, NullStrip(), power_budget_ma=budget_ma)
+            elapsed = 0
+            for t in range(num_frames):
+                for j in range(len(frame)):
+                    frame[j] = 128 + ((j + t * 3) & 0x7F)
+                target.pixels[:] = frame
+                target.mark_dirty()
+                start = time.ticks_us()
+                target.show()
+                elapsed += time.ticks_diff(time.ticks_us(), start)
+            times.append(elapsed / num_frames)
+        unlimited, limited = times
+        print(f"Power limiter: {num_leds} LEDs, {unlimited / 1000:.3f} ms per commit unlimited, "
+              f"{limited / 1000:.3f} ms dimmed to {target.output_scale}/256 "
+              f"(+{(limited - unlimited) * 100 / unlimited:.1f}%)")
+
+def benchmark_frame_sequence(effect_funcs=None, num_frames=100):
+    """Reports compression ratio and per-frame decode cost of captured effects."""
+    path = "/benchmark.pfx"
+    for effect_func in effect_funcs or (effect_3, effect_14, effect_60):
+        encoder = capture_effect(effect_func, path, num_frames)
+
+        target = FrameBuffer(NUM_LEDS, NullStrip())
+        with open(path, "rb") as f:
+            f.seek(struct.calcsize(ANIMATION_HEADER))
+            reader = FrameSequenceReader(f, NUM_LEDS, target)
+            start = time.ticks_us()
+            while reader.read_frame() is not None:
+                pass
+            elapsed = time.ticks_diff(time.ticks_us(), start)
+
+        os.remove(path)
+        print(f"Frame sequence: {encoder.compression_ratio():.1f}:1, {elapsed // max(1, encoder.frames)} us to decode a frame")
+
+def benchmark_udp_receiver(num_packets=500):
+    """Measures DDP and E1.31 packets/sec and send-to-frame latency against a sender on the board itself."""
+    ip = connect_wifi()
+    if not ip:
+        return
+    import socket
+
+    target = FrameBuffer(NUM_LEDS, NullStrip())
+    receiver = UdpReceiver(NUM_LEDS, ip, ddp_port=DDP_PORT + 1, e131_port=E131_PORT + 1)
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    ddp = bytearray(10 + NUM_LEDS * 3)
+    ddp[0] = 0x41  # Version 1, push
+    ddp[2] = 0x0B  # RGB, 8 bits per channel
+    ddp[3] = 1  # Default output
+    ddp[8] = NUM_LEDS * 3 >> 8
+    ddp[9] = NUM_LEDS * 3 & 0xFF
+
+    universe_channels = E131_PIXELS_PER_UNIVERSE * 3
+    e131 = bytearray(126 + universe_channels)
+    e131[1] = 0x10
+    e131[4:16] = b"ASC-E1.17\x00\x00\x00"
+    e131[113] = E131_UNIVERSE >> 8
+    e131[114] = E131_UNIVERSE & 0xFF
+    e131[123] = (universe_channels + 1) >> 8
+    e131[124] = (universe_channels + 1) & 0xFF
+
+    for name, packet, port in (("DDP", ddp, DDP_PORT + 1), ("E1.31", e131, E131_PORT + 1)):
+        address = socket.getaddrinfo(ip, port)[0][-1]
+        frames = 0
+        worst = 0
+        start = time.ticks_us()
+        packets_per_frame = 1
+        for n in range(num_packets):
+            sent = time.ticks_us()
+            if name == "DDP":
+                packet[1] = n % 15 + 1
+                sender.sendto(packet, address)
+            else:
+                # One packet per universe, the frame completes on the last one
+                packet[111] = n & 0xFF
+                packets_per_frame = receiver.last_universe - receiver.first_universe + 1
+                for universe in range(receiver.first_universe, receiver.last_universe + 1):
+                    packet[113] = universe >> 8
+                    packet[114] = universe & 0xFF
+                    sender.sendto(packet, address)
+            while time.ticks_diff(time.ticks_us(), sent) < 100000:
+                if receiver.read_frame(target):
+                    frames += 1
+                    worst = max(worst, time.ticks_diff(time.ticks_us(), sent))
+                    break
+        elapsed = time.ticks_diff(time.ticks_us(), start)
+        print(f"{name}: {frames} of {num_packets} frames, {frames * packets_per_frame * 1000000 / elapsed:.0f} packets/sec, "
+              f"{elapsed // max(1, frames)} us mean latency, {worst} us worst")
+
+    sender.close()
+    receiver.ddp.close()
+    receiver.e131.close()
+
+def benchmark_compositor(num_frames=50):
+    """Measures the cost of blending one extra layer in each mode at 66 and 600 LEDs."""
+    for num_leds in (66, 600):
+        src = bytearray(j & 0xFF for j in range(num_leds * 3))
+        for mode in BLEND_MODES:
+            dst = bytearray(num_leds * 3)
+            start = time.ticks_us()
+            for _ in range(num_frames):
+                blend_pixels(dst, src, mode, 128)
+            elapsed = time.ticks_diff(time.ticks_us(), start)
+            print(f"Compositor: {num_leds} LEDs, {mode} layer costs {elapsed / num_frames / 1000:.2f} ms per frame")
+
+def benchmark_interpolation(effect_classes=None, num_frames=120, fps=60):
+    """Compares the CPU time of rendering effects every output frame with interpolating their keyframes."""
+    if effect_classes is None:
+        effect_classes = [WavesOfColorEffect, PlasmaStormEffect, PatternMixEffect]
+    target = FrameBuffer(NUM_LEDS, NullStrip())
+    for effect_class in effect_classes:
+        results = []
+        for interpolate in (False, True):
+            effect = effect_class(NUM_LEDS)
+            if interpolate:
+                effect = KeyframeInterpolator(NUM_LEDS, effect, effect.compute_fps)
+            context = EffectContext()
+            context.reset(0, 1000 // fps)
+            elapsed = 0
+            for n in range(num_frames):
+                context.tick(n * 1000 // fps)  # Simulated clock, so the effect sees a steady frame rate
+                start = time.ticks_us()
+                effect.render(target, context)
+                elapsed += time.ticks_diff(time.ticks_us(), start)
+            results.append(elapsed / num_frames / 1000)
+        print(f"{effect_class.__name__}: {results[0]:.2f} ms per frame computed at {fps} FPS, "
+              f"{results[1]:.2f} ms interpolated from {effect_class.compute_fps} FPS keyframes")
+
+def benchmark_random(led_counts=(66, 1200), num_frames=20):
+    """Compares ways of picking a 10% sparkle for every LED of a frame."""
+    for num_leds in led_counts:
+        noise = bytearray(num_leds)
+        threshold = chance_threshold(0.1)
+        sampler = SparseSampler(0.1)
+        tests = [
+            ("uniform()", lambda: [uniform(0, 1) < 0.1 for _ in range(num_leds)]),
+            ("randrange()", lambda: [randrange(100) < 10 for _ in range(num_leds)]),
+            ("FastRandom", lambda: fast_random.fill(noise) or [noise[i] < threshold for i in range(num_leds)]),
+            ("SparseSampler", lambda: list(sampler.indices(num_leds))),
+        ]
+        for name, roll in tests:
+            start = time.ticks_us()
+            for _ in range(num_frames):
+                roll()
+            elapsed = time.ticks_diff(time.ticks_us(), start)
+            print(f"Random: {name} {elapsed / num_frames / 1000:.2f} ms per frame of {num_leds} LEDs")
+
+def benchmark_automaton(cell_counts=(66, 4000), num_generations=100):
+    """Measures generations per second of the cellular automaton engine with colour ages."""
+    for num_cells in cell_counts:
+        automaton = CellularAutomaton(num_cells, 110, age_bits=3)
+        automaton.seed_random()
+        start = time.ticks_us()
+        for _ in range(num_generations):
+            automaton.step()
+        elapsed = time.ticks_diff(time.ticks_us(), start)
+        print(f"Automaton: {num_cells} cells, {num_generations * 1000000 / elapsed:.0f} generations/sec")
+
+def benchmark_color_wipe(led_counts=(66, 300, 600)):
+    """Measures the frames and CPU time of one whole colour wipe (effect_2) for several strip lengths."""
+    for num_leds in led_counts:
+        target = FrameBuffer(num_leds, NullStrip())
+        wipe = ColorWipeEffect(num_leds)
+        context = EffectContext()
+        context.reset(0, wipe.step_ms)
+        frames = 2 * num_leds + 1
+        start = time.ticks_us()
+        for step in range(frames):
+            context.tick(step * wipe.step_ms)
+            wipe.render(target, context)
+        elapsed = time.ticks_diff(time.ticks_us(), start)
+        nested = num_leds * (num_leds - 1) // 2 + num_leds * num_leds  # set_hsv calls of the nested loops
+        print(f"Color wipe: {num_leds} LEDs, {frames} frames in {elapsed / 1000:.1f} ms, "
+              f"{elapsed / frames / 1000:.3f} ms per frame (the nested loops made {nested} set_hsv calls)")
+
+def benchmark_tetris(led_counts=(66, 1000)):
+    """Plays whole games of Tetris (effect_12) and reports the worst frame time."""
+    for num_leds in led_counts:
+        target = FrameBuffer(num_leds, NullStrip())
+        tetris = TetrisEffect(num_leds)
+        context = EffectContext()
+        context.reset(0, 50)
+        worst = total = frames = 0
+        now = 0
+        slid = False
+        while not (slid and tetris.state == "fall"):
+            slid = slid or tetris.state == "slide"
+            context.tick(now)
+            start = time.ticks_us()
+            tetris.render(target, context)
+            elapsed = time.ticks_diff(time.ticks_us(), start)
+            worst = max(worst, elapsed)
+            total += elapsed
+            frames += 1
+            now += 50
+        print(f"Tetris: {num_leds} LEDs, one game in {frames} frames, "
+              f"{total / frames / 1000:.3f} ms mean and {worst / 1000:.3f} ms worst frame time")
+
+def benchmark_lava_lamp(blob_counts=(3, 12, 36), frames=100):
+    """Measures the lava lamp (effect_10) frame time as the number of blobs grows."""
+    target = FrameBuffer(NUM_LEDS, NullStrip())
+    for num_blobs in blob_counts:
+        lamp = LavaLampEffect(NUM_LEDS, num_blobs)
+        context = EffectContext()
+        context.reset(0, 20)
+        start = time.ticks_us()
+        for frame in range(frames):
+            context.tick(frame * 20)
+            lamp.render(target, context)
+        elapsed = time.ticks_diff(time.ticks_us(), start)
+        print(f"Lava lamp: {num_blobs} blobs on {NUM_LEDS} LEDs, {elapsed / frames / 1000:.3f} ms per frame")
+
+def benchmark_fire(led_counts=(66, 1000), steps=100):
+    """Measures a fire step and a palette render (effect_15) at several strip lengths."""
+    for num_leds in led_counts:
+        target = FrameBuffer(num_leds, NullStrip())
+        fire = FireEffect(num_leds)
+        start = time.ticks_us()
+        for _ in range(steps):
+            fire.step()
+        stepped = time.ticks_diff(time.ticks_us(), start)
+        context = EffectContext()
+        context.reset(0)
+        start = time.ticks_us()
+        for _ in range(steps):
+            context.tick(0)
+            fire.render(target, context)
+        rendered = time.ticks_diff(time.ticks_us(), start)
+        print(f"Fire: {num_leds} cells, {stepped / steps / 1000:.3f} ms per step, "
+              f"{rendered / steps / 1000:.3f} ms per render")
+
+def benchmark_rain(led_counts=(66, 1000), frames=500):
+    """Measures the rain (effect_13) frame time against the 10 ms budget of 100 FPS."""
+    for num_leds in led_counts:
+        target = FrameBuffer(num_leds, NullStrip())
+        rain = RainEffect(num_leds)
+        context = EffectContext()
+        context.reset(0, 10)
+        worst = total = 0
+        for frame in range(frames):
+            context.tick(frame * 10)
+            start = time.ticks_us()
+            rain.render(target, context)
+            elapsed = time.ticks_diff(time.ticks_us(), start)
+            worst = max(worst, elapsed)
+            total += elapsed
+        print(f"Rain: {num_leds} LEDs, {len(rain.positions)} drops, {total / frames / 1000:.3f} ms mean "
+              f"and {worst / 1000:.3f} ms worst frame time")
+
+def benchmark_bounce(ball_counts=(1, 12, 48), frames=200):
+    """Measures the bounce engine (effects 23 and 40) frame time as the number of balls grows."""
+    target = FrameBuffer(NUM_LEDS, NullStrip())
+    for num_balls in ball_counts:
+        for gravity in (300.0, 0):
+            engine = BounceEngine(NUM_LEDS, gravity)
+            for k in range(num_balls):
+                engine.launch(0.0, NUM_LEDS - 1 - k % NUM_LEDS, 0.0 if gravity else 5.0 + k, (255, 128, 0))
+            start = time.ticks_us()
+            for frame in range(frames):
+                engine.render(target, frame / 100)
+            elapsed = time.ticks_diff(time.ticks_us(), start)
+            print(f"Bounce: {num_balls} balls {'with' if gravity else 'without'} gravity on {NUM_LEDS} LEDs, "
+                  f"{elapsed / frames / 1000:.3f} ms per frame")
+
 # tester
 '''effects = [
     effect_74
@@ -2404,14 +4460,54 @@ effects = [
     effect_61, effect_62, effect_63, effect_64, effect_65,
     effect_66, effect_67, effect_68, effect_69, effect_70,
     effect_71, effect_72, effect_73, effect_74, effect_75,
-    effect_76, effect_77
+    effect_76, effect_77, effect_78, effect_79, effect_80, effect_81
 ]
 
-# Initialize effect manager
-manager = EffectManager(NUM_LEDS)
+# Benchmarks run instead of the effects when BENCHMARK is True
+benchmarks = [
+    benchmark_playback,
+    benchmark_power_limiter,
+    benchmark_frame_sequence,
+    benchmark_udp_receiver,
+    benchmark_compositor,
+    benchmark_interpolation,
+    benchmark_random,
+    benchmark_automaton,
+    benchmark_color_wipe,
+    benchmark_tetris,
+    benchmark_lava_lamp,
+    benchmark_fire,
+    benchmark_rain,
+    benchmark_bounce
+]
+
+# Frame sources a host can take the strip over with
+sources = []
+if SERIAL_STREAMING:
+    try:
+        from tpm2 import SerialStream  # Shared with stream_host.py, which tests it over a pseudo terminal
+    except ImportError:
+        print("tpm2.py not found, serial streaming disabled")
+    else:
+        sources.append(SerialStream(NUM_LEDS))
+if UDP_RECEIVER:
+    ip = connect_wifi()
+    if ip:
+        sources.append(UdpReceiver(NUM_LEDS, ip))
 
-# Main loop to cycle through effects
-while True:
-    manager.select_next_effect()
-    manager.run_effect(effects[manager.current_effect])
+# Initialize effect manager
+manager = EffectManager(NUM_LEDS, sources)
+
+if BENCHMARK:
+    for benchmark in benchmarks:
+        benchmark()
+else:
+    # Main loop to cycle through effects, handing over to a host whenever one streams frames
+    while True:
+        source = manager.pending_source()
+        if source:
+            manager.run_stream(source)
+            continue
+        manager.select_next_effect()
+        manager.run_effect(effects[manager.current_effect])
 
@@ -0,0 +1,176 @@
+"""Streams frames to the Plasma 2040 over USB serial and measures throughput and latency.
+
+Runs on the host computer (CPython, standard library only):
+
+    python stream_host.py /dev/ttyACM0 --leds 66 --frames 500
+
+With --pty the board is replaced by a pseudo terminal read by the board's own receiver,
+SerialStream from tpm2.py, so the protocol, the receiver and the measurements can be checked on
+Linux without any hardware.
+"""
+import argparse
+import math
+import os
+import pty
+import termios
+import threading
+import time
+import tty
+
+from tpm2 import TPM2_ACK, TPM2_COMMAND, TPM2_DATA, TPM2_END, TPM2_START, SerialStream
+
+
+def packet(packet_type, payload=b""):
+    """Builds one TPM2 style packet."""
+    size = len(payload)
+    return bytes((TPM2_START, packet_type, size >> 8, size & 0xFF)) + payload + bytes((TPM2_END,))
+
+
+def rainbow_frame(num_leds, t):
+    """Returns a scrolling rainbow as canonical RGB bytes."""
+    frame = bytearray(num_leds * 3)
+    for i in range(num_leds):
+        phase = (i + t) * 2 * math.pi / num_leds
+        frame[i * 3] = int(127.5 + 127.5 * math.sin(phase))
+        frame[i * 3 + 1] = int(127.5 + 127.5 * math.sin(phase + 2.094))
+        frame[i * 3 + 2] = int(127.5 + 127.5 * math.sin(phase + 4.189))
+    return bytes(frame)
+
+
+def open_port(path):
+    fd = os.open(path, os.O_RDWR | os.O_NOCTTY)
+    tty.setraw(fd)
+    return fd
+
+
+def wait_for_ack(fd, timeout):
+    """Reads until an acknowledgement arrives, skipping text the board prints. Returns False on timeout."""
+    deadline = time.monotonic() + timeout
+    attrs = termios.tcgetattr(fd)
+    attrs[6][termios.VMIN] = 0
+    attrs[6][termios.VTIME] = 1  # Tenths of a second per read
+    termios.tcsetattr(fd, termios.TCSANOW, attrs)
+    while time.monotonic() < deadline:
+        if TPM2_ACK in os.read(fd, 64):
+            return True
+    return False
+
+
+class PtyStream:
+    """Board side of a pseudo terminal, reading like MicroPython's stdin: readinto() fills the whole buffer."""
+
+    def __init__(self, fd):
+        self.fd = fd
+
+    def fileno(self):
+        return self.fd
+
+    def readinto(self, buffer):
+        view = memoryview(buffer)
+        got = 0
+        while got < len(view):
+            got += os.readv(self.fd, [view[got:]])
+        return got
+
+    def write(self, data):
+        os.write(self.fd, data)
+
+
+class PixelSink:
+    """Stands in for the board's framebuffer, counting the frames SerialStream delivers."""
+
+    def __init__(self, num_leds):
+        self.pixels = bytearray(num_leds * 3)
+        self.frames = 0
+
+    def mark_dirty(self, start=0, end=None):
+        self.frames += 1
+
+
+def board_receiver(fd, num_leds, sink, stop):
+    """Runs SerialStream from tpm2.py on the board side of the pseudo terminal, as main.py does."""
+    port = PtyStream(fd)
+    receiver = SerialStream(num_leds, port, port)
+    while not stop.is_set():
+        try:
+            if not receiver.read_frame(sink):
+                time.sleep(0.001)
+        except OSError:
+            return
+
+
+def stream(fd, num_leds, num_frames, timeout=2.0):
+    """Sends frames one at a time, waiting for each acknowledgement, and prints the measurements.
+
+    Returns the frames sent and the last one, or None when the board did not answer.
+    """
+    os.write(fd, packet(TPM2_COMMAND))  # Wake the board up, it stops the running effect
+    if not wait_for_ack(fd, timeout):
+        print("No answer, is main.py running with SERIAL_STREAMING = True?")
+        return None
+
+    frames = [rainbow_frame(num_leds, t) for t in range(num_leds)]
+    latencies = []
+    sent_frames = 0
+    start = time.monotonic()
+    for t in range(num_frames):
+        sent = time.monotonic()
+        os.write(fd, packet(TPM2_DATA, frames[t % num_leds]))
+        if not wait_for_ack(fd, timeout):
+            print(f"Frame {t} was not acknowledged")
+            break
+        latencies.append(time.monotonic() - sent)
+        sent_frames += 1
+    elapsed = time.monotonic() - start
+
+    if latencies:
+        latencies.sort()
+        frame_bytes = num_leds * 3 + 5
+        print(f"{len(latencies)} frames of {num_leds} LEDs in {elapsed:.2f} s")
+        print(f"Throughput: {len(latencies) / elapsed:.1f} FPS, {len(latencies) * frame_bytes / elapsed / 1024:.1f} KiB/s")
+        print(f"Latency: median {latencies[len(latencies) // 2] * 1000:.2f} ms, max {latencies[-1] * 1000:.2f} ms")
+    return sent_frames, frames[(sent_frames - 1) % num_leds] if sent_frames else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("port", nargs="?", help="serial port of the board, e.g. /dev/ttyACM0")
+    parser.add_argument("--leds", type=int, default=66)
+    parser.add_argument("--frames", type=int, default=500)
+    parser.add_argument("--pty", action="store_true", help="stream to a stand-in receiver on a pseudo terminal")
+    args = parser.parse_args()
+
+    if args.pty:
+        board_fd, host_fd = pty.openpty()
+        tty.setraw(board_fd)
+        tty.setraw(host_fd)
+        stop = threading.Event()
+        sink = PixelSink(args.leds)
+        threading.Thread(target=board_receiver, args=(board_fd, args.leds, sink, stop), daemon=True).start()
+        try:
+            result = stream(host_fd, args.leds, args.frames)
+            # The receiver acknowledges a packet before copying it, give it a moment to finish
+            deadline = time.monotonic() + 1.0
+            while result and sink.frames < result[0] and time.monotonic() < deadline:
+                time.sleep(0.001)
+        finally:
+            stop.set()
+        if result:
+            # Check what the receiver made of the packets, not just that it acknowledged them
+            sent_frames, last_frame = result
+            ok = sink.frames == sent_frames and bytes(sink.pixels) == last_frame
+            print(f"Receiver: {sink.frames} of {sent_frames} frames, last frame {'intact' if ok else 'CORRUPTED'}")
+            if not ok:
+                raise SystemExit(1)
+    elif args.port:
+        fd = open_port(args.port)
+        try:
+            stream(fd, args.leds, args.frames)
+        finally:
+            os.close(fd)
+    else:
+        parser.error("give the serial port of the board, or --pty")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""TPM2 style frame packets from a host, shared by main.py on the board and stream_host.py on the host.
+
+A packet is TPM2_START, a type byte, a big-endian payload size, the payload and TPM2_END. Only uses
+sys and select, so the same receiver runs under MicroPython and CPython.
+"""
+import sys
+import select
+
+TPM2_START = 0xC9
+TPM2_DATA = 0xDA  # Packet carrying pixel data, canonical RGB
+TPM2_COMMAND = 0xC0  # Any other packet, a host sends one to wake the board up before streaming
+TPM2_END = 0x36
+TPM2_ACK = b"\xac"  # Sent back for every packet, lets the host measure latency
+
+
+# Receiver states while a packet arrives
+WAIT_START = 0
+READ_HEADER = 1
+READ_PAYLOAD = 2
+READ_END = 3
+
+
+class SerialStream:
+    """Receives TPM2 style frame packets from a host over USB serial.
+
+    Bytes are only read while the stream has some waiting, one at a time, so a packet cut short or a
+    stray start byte never blocks: the packet carries on with the next call, or fails its end byte and
+    the receiver resynchronises on the next start byte. Packets larger than the strip are dropped
+    without reading their payload. Every complete packet is acknowledged with TPM2_ACK.
+    """
+
+    def __init__(self, num_leds, stream=None, ack=None):
+        self.stream = stream or sys.stdin.buffer
+        self.ack = ack or sys.stdout.buffer
+        self.poller = select.poll()
+        self.poller.register(stream or sys.stdin, select.POLLIN)
+        self.byte = bytearray(1)
+        self.header = bytearray(3)  # Type, size high, size low
+        self.payload = bytearray(num_leds * 3)
+        self.payload_view = memoryview(self.payload)
+        self.max_bytes = 2 * (len(self.payload) + 5)  # Read per call, about two packets
+        self.state = WAIT_START
+        self.count = 0  # Bytes of the header or payload received so far
+        self.size = 0
+
+    def available(self):
+        return bool(self.poller.poll(0))
+
+    def read_frame(self, target):
+        """Reads the bytes waiting, copying pixel data into target. Returns True once a frame arrived.
+
+        Returns False once the stream runs dry or max_bytes were read without completing a frame,
+        so a host sending garbage can't keep the caller here.
+        """
+        stream = self.stream
+        poll = self.poller.poll
+        byte = self.byte
+        payload = self.payload
+        for _ in range(self.max_bytes):
+            if not poll(0):
+                break
+            stream.readinto(byte)
+            value = byte[0]
+            state = self.state
+            if state == READ_PAYLOAD:
+                payload[self.count] = value
+                self.count += 1
+                if self.count == self.size:
+                    self.state = READ_END
+            elif state == WAIT_START:
+                if value == TPM2_START:
+                    self.state = READ_HEADER
+                    self.count = 0
+            elif state == READ_HEADER:
+                self.header[self.count] = value
+                self.count += 1
+                if self.count == 3:
+                    self.size = self.header[1] << 8 | self.header[2]
+                    self.count = 0
+                    if self.size > len(payload):
+                        self.state = WAIT_START  # Larger than the strip, resynchronise
+                    else:
+                        self.state = READ_PAYLOAD if self.size else READ_END
+            else:
+                self.state = WAIT_START
+                if value != TPM2_END:
+                    continue
+                self.ack.write(TPM2_ACK)
+                if self.header[0] == TPM2_DATA:
+                    keep = min(self.size, len(target.pixels)) // 3 * 3
+                    target.pixels[:keep] = self.payload_view[:keep]
+                    target.mark_dirty(0, keep // 3)
+                    return True
+        return False